@@ -57,6 +57,38 @@ supported_languages = {
     '🇺🇸 American English': 'a',
 }
 
+# Text-to-speech settings
+TTS_MODEL = "Kokoro 80M"
+TTS_VOICE = 'af_heart'
+TTS_WARMUP_TEXT = "Welcome to the podcast."
+
+# Resident Kokoro pipelines, one per language code, loaded once and reused across files
+tts_pipelines = {}
+
+def get_tts_pipeline(lang_code, input_file_name="startup"):
+    """Return the resident Kokoro pipeline for a language, loading it on first use."""
+    if lang_code not in tts_pipelines:
+        load_start = datetime.now()
+        tts_pipelines[lang_code] = KPipeline(lang_code=lang_code)
+        load_end = datetime.now()
+        load_duration = (load_end - load_start).total_seconds()
+        log_message(f"Loaded Kokoro pipeline for '{lang_code}' in {load_duration:.3f} seconds")
+        save_runtime_metric(input_file_name, "tts_load", load_start, load_end, load_duration, TTS_MODEL)
+    return tts_pipelines[lang_code]
+
+def warm_up_tts():
+    """Load the pipeline of every supported language and synthesize a short phrase,
+    so the first file does not pay for loading the weights and the voice."""
+    for language_name, lang_code in supported_languages.items():
+        pipeline = get_tts_pipeline(lang_code)
+        warmup_start = datetime.now()
+        for _ in pipeline(TTS_WARMUP_TEXT, voice=TTS_VOICE):
+            pass
+        warmup_end = datetime.now()
+        warmup_duration = (warmup_end - warmup_start).total_seconds()
+        log_message(f"Warmed up {language_name} TTS in {warmup_duration:.3f} seconds")
+        save_runtime_metric("startup", "tts_warmup", warmup_start, warmup_end, warmup_duration, TTS_MODEL)
+
 # summary_template = """
 # Summarize the following text by highlighting the key points.
 # Maintain a conversational tone and keep the summary easy to follow for a general audience.
@@ -146,12 +178,16 @@ def clean_text(text):
     
     return cleaned_text.strip()
 
-def generate_audio(text, lang_code, output_path):
-    """Generate audio for given text and language."""
+def generate_audio(text, lang_code, output_path, input_file_name=None):
+    """Generate audio for given text and language with the resident pipeline."""
     print(f"Generating audio for {os.path.basename(output_path)}...")
+    input_file_name = input_file_name or os.path.basename(output_path)
+    
+    pipeline = get_tts_pipeline(lang_code, input_file_name)
     
-    pipeline = KPipeline(lang_code=lang_code)
-    generator = pipeline(text, voice='af_heart')
+    # Time synthesis on its own; model loading is recorded as tts_load
+    synthesis_start = datetime.now()
+    generator = pipeline(text, voice=TTS_VOICE)
     chunks = []
 
     for i, (gs, ps, audio) in enumerate(generator):
@@ -159,6 +195,10 @@ def generate_audio(text, lang_code, output_path):
 
     # Concatenate all audio chunks
     full_audio = np.concatenate(chunks, axis=0)
+    synthesis_end = datetime.now()
+    synthesis_duration = (synthesis_end - synthesis_start).total_seconds()
+    log_message(f"Synthesized {len(full_audio) / 24000:.1f} seconds of audio in {synthesis_duration:.3f} seconds")
+    save_runtime_metric(input_file_name, "tts_synthesis", synthesis_start, synthesis_end, synthesis_duration, TTS_MODEL)
     
     # Ensure output directory exists
     os.makedirs(os.path.dirname(output_path), exist_ok=True)
@@ -304,7 +344,7 @@ def step2_generate_audio_from_text(text_file_path, output_folder):
         audio_path = os.path.join(audio_folder, audio_filename)
         
         try:
-            output_path = generate_audio(text_content, lang_code, audio_path)
+            output_path = generate_audio(text_content, lang_code, audio_path, input_file_name)
             output_files.append((language_name, output_path))
             log_message(f"✓ {language_name}: {audio_filename}")
         except Exception as e:
@@ -318,7 +358,7 @@ def step2_generate_audio_from_text(text_file_path, output_folder):
     log_message(f"✅ Step 2 completed: {len(output_files)} audio files generated")
     
     # Save runtime metric
-    save_runtime_metric(input_file_name, "step_2", step2_start, step2_end, step2_duration, "Kokoro 80M")
+    save_runtime_metric(input_file_name, "step_2", step2_start, step2_end, step2_duration, TTS_MODEL)
     
     return len(output_files)
 
@@ -526,6 +566,13 @@ def main():
     print(f"Processing mode: {step_descriptions[args.step]}")
     log_message(f"Processing mode: {step_descriptions[args.step]}")
     
+    # Load the TTS pipelines once, before the first file
+    if args.step in ['2', 'all']:
+        try:
+            warm_up_tts()
+        except Exception as e:
+            log_message(f"TTS warm-up failed, pipelines will be loaded on first use: {e}")
+    
     # Determine input mode
     if args.input_file:
         print("DEBUG: Single file mode detected")
@@ -0,0 +1,114 @@
+"""
+Benchmark rendering a page of image search results.
+
+Renders a page of result cards with the previous create_image_card
+implementation (full decode and thumbnail on every render, time-based widget
+keys) and with the current one (cached thumbnails, stable keys), using
+Streamlit's AppTest harness. Reports the first render, the average rerun
+time, and whether a click on a card's Zoom button is registered.
+
+    python benchmark_render.py --results 50 --reruns 5
+"""
+import argparse
+import os
+import tempfile
+import time
+
+from PIL import Image
+from streamlit.testing.v1 import AppTest
+
+
+def legacy_results_page(image_paths):
+    """Result page rendered the way create_image_card used to work."""
+    import time
+    import streamlit as st
+    from PIL import Image
+
+    for i, image_path in enumerate(image_paths):
+        doc_id = f"doc-{i}"
+        col1, col2 = st.columns([1, 2])
+        with col1:
+            image = Image.open(image_path)
+            image.thumbnail((300, 300))
+            st.image(image, use_container_width=True)
+            if st.button("🔍 Zoom", key=f"zoom_{doc_id}_{time.time()}"):
+                st.image(Image.open(image_path))
+        with col2:
+            st.write(f"**Description:** result {i}")
+            col_a, col_b, col_c = st.columns(3)
+            with col_a:
+                st.button("⭐ Favorite", key=f"fav_{doc_id}_{time.time()}")
+            with col_b:
+                st.button("📋 Copy", key=f"copy_{doc_id}_{time.time()}")
+            with col_c:
+                st.button("📤 Share", key=f"share_{doc_id}_{time.time()}")
+
+
+def current_results_page(image_paths):
+    """Result page rendered with UIComponents.create_image_card."""
+    from ui_components import UIComponents
+
+    for i, image_path in enumerate(image_paths):
+        UIComponents.create_image_card(image_path, caption=f"result {i}", doc_id=f"doc-{i}")
+
+
+def make_images(directory, count, size):
+    """Write count distinct JPEG images with the given longest edge."""
+    paths = []
+    for i in range(count):
+        image = Image.new("RGB", (size, size * 2 // 3), color=(i * 5 % 256, 80, 160))
+        path = os.path.join(directory, f"result-{i}.jpg")
+        image.save(path, quality=90)
+        paths.append(path)
+    return paths
+
+
+def benchmark(page, image_paths, reruns):
+    app = AppTest.from_function(page, args=(image_paths,), default_timeout=120)
+
+    start = time.perf_counter()
+    app.run()
+    first_render = time.perf_counter() - start
+
+    rerun_times = []
+    for _ in range(reruns):
+        start = time.perf_counter()
+        app.run()
+        rerun_times.append(time.perf_counter() - start)
+
+    # A click only registers if the button keeps its key across reruns
+    images_before = len(app.get("image"))
+    app.button[0].click().run()
+    click_registered = len(app.get("image")) > images_before
+
+    return {
+        "first_render": first_render,
+        "rerun": sum(rerun_times) / len(rerun_times),
+        "click_registered": click_registered,
+        "exceptions": len(app.exception),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark rendering a page of image result cards.")
+    parser.add_argument("--results", type=int, default=50, help="Number of result cards on the page")
+    parser.add_argument("--reruns", type=int, default=5, help="Reruns to average after the first render")
+    parser.add_argument("--image-size", type=int, default=3000, help="Longest edge of the test images in pixels")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        image_paths = make_images(directory, args.results, args.image_size)
+        print(f"{args.results} results, {args.image_size}px images, {args.reruns} reruns")
+        print(f"{'Implementation':<16}{'First render':>14}{'Rerun (avg)':>14}{'Click works':>13}")
+        for name, page in (("before", legacy_results_page), ("after", current_results_page)):
+            result = benchmark(page, image_paths, args.reruns)
+            if result["exceptions"]:
+                print(f"{name}: page raised {result['exceptions']} exception(s)")
+            print(
+                f"{name:<16}{result['first_render']:>13.3f}s{result['rerun']:>13.3f}s"
+                f"{'yes' if result['click_registered'] else 'no':>13}"
+            )
+
+
+if __name__ == "__main__":
+    main()
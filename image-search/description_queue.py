@@ -0,0 +1,182 @@
+import json
+import os
+import sqlite3
+import time
+import uuid
+from contextlib import closing
+from typing import Any, Dict, Iterable, List, Optional
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    doc_id TEXT NOT NULL UNIQUE,
+    file_name TEXT NOT NULL,
+    image_path TEXT NOT NULL,
+    metadata TEXT NOT NULL,
+    status TEXT NOT NULL DEFAULT 'pending',
+    worker_id TEXT,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    description TEXT,
+    embedding TEXT,
+    error TEXT,
+    completed_seq INTEGER,
+    created_at REAL NOT NULL,
+    updated_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS jobs_status ON jobs (status, id);
+CREATE INDEX IF NOT EXISTS jobs_completed_seq ON jobs (completed_seq);
+CREATE TABLE IF NOT EXISTS workers (
+    worker_id TEXT PRIMARY KEY,
+    pid INTEGER NOT NULL,
+    heartbeat REAL NOT NULL
+);
+"""
+
+JOB_STATUSES = ["pending", "running", "done", "failed"]
+
+
+class DescriptionQueue:
+    """
+    Persistent SQLite queue of images waiting for a description and embedding.
+
+    The Streamlit app enqueues uploads and a separate worker process
+    (description_worker.py) claims jobs, stores the description and embedding,
+    and marks them done. Completed jobs get an increasing sequence number so
+    the app can pick up new results incrementally. Because the queue lives on
+    disk, a batch interrupted by a restart carries on where it stopped.
+    """
+
+    def __init__(self, db_path: str = "./data/image-jobs.sqlite"):
+        self.db_path = db_path
+        os.makedirs(os.path.dirname(self.db_path) or ".", exist_ok=True)
+        with closing(self._connect()) as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.executescript(SCHEMA)
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.db_path, timeout=30, isolation_level=None)
+        conn.row_factory = sqlite3.Row
+        return conn
+
+    def enqueue(self, file_name: str, image_path: str, metadata: Dict[str, Any]) -> Dict[str, Any]:
+        """Add a job for an image already saved to image_path."""
+        now = time.time()
+        doc_id = str(uuid.uuid4())
+        with closing(self._connect()) as conn:
+            cursor = conn.execute(
+                "INSERT INTO jobs (doc_id, file_name, image_path, metadata, created_at, updated_at) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                (doc_id, file_name, image_path, json.dumps(metadata), now, now),
+            )
+            return {"id": cursor.lastrowid, "doc_id": doc_id, "file_name": file_name, "status": "pending"}
+
+    def claim_next(self, worker_id: str) -> Optional[Dict[str, Any]]:
+        """Atomically take the oldest pending job, or return None if there is none."""
+        with closing(self._connect()) as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            row = conn.execute(
+                "SELECT * FROM jobs WHERE status = 'pending' ORDER BY id LIMIT 1"
+            ).fetchone()
+            if row is None:
+                conn.execute("COMMIT")
+                return None
+            conn.execute(
+                "UPDATE jobs SET status = 'running', worker_id = ?, attempts = attempts + 1, updated_at = ? "
+                "WHERE id = ?",
+                (worker_id, time.time(), row["id"]),
+            )
+            conn.execute("COMMIT")
+            return self._job(row)
+
+    def complete(self, job_id: int, description: str, embedding: List[float]):
+        """Store a job's result and make it visible to completed_since."""
+        with closing(self._connect()) as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            conn.execute(
+                "UPDATE jobs SET status = 'done', description = ?, embedding = ?, error = NULL, "
+                "completed_seq = (SELECT COALESCE(MAX(completed_seq), 0) + 1 FROM jobs), updated_at = ? "
+                "WHERE id = ?",
+                (description, json.dumps(embedding), time.time(), job_id),
+            )
+            conn.execute("COMMIT")
+
+    def fail(self, job_id: int, error: str, max_attempts: int = 3):
+        """Record a failure; the job is retried until it has failed max_attempts times."""
+        with closing(self._connect()) as conn:
+            conn.execute(
+                "UPDATE jobs SET status = CASE WHEN attempts >= ? THEN 'failed' ELSE 'pending' END, "
+                "error = ?, updated_at = ? WHERE id = ?",
+                (max_attempts, error, time.time(), job_id),
+            )
+
+    def completed_since(self, seq: int) -> List[Dict[str, Any]]:
+        """Jobs completed after the given sequence number, in completion order."""
+        with closing(self._connect()) as conn:
+            rows = conn.execute(
+                "SELECT * FROM jobs WHERE completed_seq > ? ORDER BY completed_seq", (seq,)
+            ).fetchall()
+        return [self._job(row) for row in rows]
+
+    def jobs(self, job_ids: Iterable[int]) -> List[Dict[str, Any]]:
+        """Current state of the given jobs (without their embeddings)."""
+        job_ids = list(job_ids)
+        if not job_ids:
+            return []
+        placeholders = ",".join("?" * len(job_ids))
+        with closing(self._connect()) as conn:
+            rows = conn.execute(
+                f"SELECT id, doc_id, file_name, status, description, error FROM jobs "
+                f"WHERE id IN ({placeholders}) ORDER BY id",
+                job_ids,
+            ).fetchall()
+        return [dict(row) for row in rows]
+
+    def counts(self) -> Dict[str, int]:
+        """Number of jobs in each status."""
+        with closing(self._connect()) as conn:
+            rows = conn.execute("SELECT status, COUNT(*) FROM jobs GROUP BY status").fetchall()
+        counts = {status: 0 for status in JOB_STATUSES}
+        counts.update({status: count for status, count in rows})
+        return counts
+
+    def retry_failed(self) -> int:
+        """Put all failed jobs back in the queue. Returns how many were requeued."""
+        with closing(self._connect()) as conn:
+            cursor = conn.execute(
+                "UPDATE jobs SET status = 'pending', attempts = 0, updated_at = ? WHERE status = 'failed'",
+                (time.time(),),
+            )
+            return cursor.rowcount
+
+    def heartbeat(self, worker_id: str):
+        with closing(self._connect()) as conn:
+            conn.execute(
+                "INSERT INTO workers (worker_id, pid, heartbeat) VALUES (?, ?, ?) "
+                "ON CONFLICT (worker_id) DO UPDATE SET heartbeat = excluded.heartbeat",
+                (worker_id, os.getpid(), time.time()),
+            )
+
+    def has_live_worker(self, timeout: float = 15.0) -> bool:
+        with closing(self._connect()) as conn:
+            row = conn.execute(
+                "SELECT 1 FROM workers WHERE heartbeat > ? LIMIT 1", (time.time() - timeout,)
+            ).fetchone()
+        return row is not None
+
+    def requeue_abandoned(self, timeout: float = 15.0) -> int:
+        """Return running jobs whose worker stopped sending heartbeats to the queue."""
+        with closing(self._connect()) as conn:
+            cursor = conn.execute(
+                "UPDATE jobs SET status = 'pending', updated_at = ? WHERE status = 'running' AND "
+                "worker_id NOT IN (SELECT worker_id FROM workers WHERE heartbeat > ?)",
+                (time.time(), time.time() - timeout),
+            )
+            return cursor.rowcount
+
+    @staticmethod
+    def _job(row: sqlite3.Row) -> Dict[str, Any]:
+        job = dict(row)
+        job["metadata"] = json.loads(job["metadata"])
+        if job.get("embedding"):
+            job["embedding"] = json.loads(job["embedding"])
+        return job
@@ -0,0 +1,91 @@
+"""
+Background worker that describes and embeds queued image uploads.
+
+Started automatically by ImageStore.ensure_worker, or by hand with:
+
+    python description_worker.py
+
+Run it from the image-search directory so it shares the images/, data/ and
+logs/ directories with the app.
+"""
+import argparse
+import os
+import threading
+import time
+import uuid
+
+# Keep this process's log and latency files apart from the app's
+os.environ.setdefault("IMAGE_SEARCH_LOG_NAME", "image-search-worker")
+
+from image_store import ImageStore
+from logger import app_logger
+
+HEARTBEAT_INTERVAL = 5.0
+
+
+@app_logger.profile_function("image_description_job")
+def describe_job(job):
+    """Describe and embed the image of a claimed job."""
+    with open(job["image_path"], "rb") as f:
+        buffer = memoryview(f.read())
+    description = ImageStore._describe_image(ImageStore._encode_buffer(buffer), label=job["file_name"])
+    embedding = ImageStore.embeddings.embed_documents([description])[0]
+    return description, embedding
+
+
+def run_worker(poll_interval: float = 1.0, idle_timeout: float = 300.0):
+    """
+    Process queued jobs until the queue has been empty for idle_timeout seconds.
+
+    A heartbeat thread marks the worker as alive so the app does not start a
+    second one, and so jobs left running by a crashed worker can be requeued.
+    """
+    queue = ImageStore.job_queue
+    worker_id = f"{os.getpid()}-{uuid.uuid4().hex[:8]}"
+    stopped = threading.Event()
+
+    def heartbeat():
+        while True:
+            queue.heartbeat(worker_id)
+            if stopped.wait(HEARTBEAT_INTERVAL):
+                return
+
+    threading.Thread(target=heartbeat, name="WorkerHeartbeat", daemon=True).start()
+
+    requeued = queue.requeue_abandoned()
+    app_logger.log_info(f"Description worker {worker_id} started, requeued {requeued} abandoned job(s)")
+
+    idle_since = time.time()
+    try:
+        while True:
+            job = queue.claim_next(worker_id)
+            if job is None:
+                if time.time() - idle_since > idle_timeout:
+                    break
+                time.sleep(poll_interval)
+                continue
+
+            # Settings applied in the app's Profiling tab take effect from the next job
+            app_logger.sync_profiling_settings()
+
+            start_time = time.time()
+            try:
+                description, embedding = describe_job(job)
+                queue.complete(job["id"], description, embedding)
+                app_logger.log_upload_operation(job["file_name"], time.time() - start_time, success=True)
+            except Exception as e:
+                queue.fail(job["id"], str(e))
+                app_logger.log_upload_operation(job["file_name"], time.time() - start_time, success=False)
+                app_logger.log_error(f"Description job {job['id']} failed for {job['file_name']}", e)
+            idle_since = time.time()
+    finally:
+        stopped.set()
+        app_logger.log_info(f"Description worker {worker_id} stopped")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Describe and embed queued image uploads.")
+    parser.add_argument("--poll-interval", type=float, default=1.0, help="Seconds between queue polls when idle")
+    parser.add_argument("--idle-timeout", type=float, default=300.0, help="Exit after this many idle seconds")
+    args = parser.parse_args()
+    run_worker(poll_interval=args.poll_interval, idle_timeout=args.idle_timeout)
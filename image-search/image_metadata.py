@@ -0,0 +1,241 @@
+import io
+import os
+import threading
+import time
+from collections import Counter
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Any, Dict, Iterable, List, Optional, Set, Tuple
+
+import numpy as np
+from PIL import Image
+
+# EXIF tags holding the capture date
+EXIF_IFD = 0x8769
+EXIF_DATETIME_ORIGINAL = 36867
+EXIF_DATETIME = 306
+
+
+@dataclass(frozen=True)
+class MetadataFilter:
+    """
+    Structured constraints applied before ranking search results.
+
+    Multi-valued fields match any of the given values, except tags, which must
+    all be present. Dates are Unix timestamps. Instances are hashable so they
+    can be part of a cache key.
+    """
+    file_types: Tuple[str, ...] = ()
+    folders: Tuple[str, ...] = ()
+    tags: Tuple[str, ...] = ()
+    min_width: Optional[int] = None
+    min_height: Optional[int] = None
+    max_file_size: Optional[int] = None
+    uploaded_after: Optional[float] = None
+    uploaded_before: Optional[float] = None
+    taken_after: Optional[float] = None
+    taken_before: Optional[float] = None
+
+    def is_empty(self) -> bool:
+        return self == MetadataFilter()
+
+
+def extract_image_metadata(buffer, name: str) -> Dict[str, Any]:
+    """Read file size, dimensions, type and EXIF capture date from an encoded image."""
+    image = Image.open(io.BytesIO(buffer))
+    width, height = image.size
+
+    taken_at = None
+    exif = image.getexif()
+    raw_date = exif.get_ifd(EXIF_IFD).get(EXIF_DATETIME_ORIGINAL) or exif.get(EXIF_DATETIME)
+    if raw_date:
+        try:
+            taken_at = datetime.strptime(str(raw_date).strip(), "%Y:%m:%d %H:%M:%S").timestamp()
+        except ValueError:
+            taken_at = None
+
+    extension = os.path.splitext(name)[1].lstrip(".").lower()
+    return {
+        "file_size": len(buffer),
+        "width": width,
+        "height": height,
+        "file_type": extension or (image.format or "").lower(),
+        "folder": os.path.dirname(name),
+        "uploaded_at": time.time(),
+        "taken_at": taken_at,
+    }
+
+
+class _Column:
+    """Growable numpy column with amortised O(1) appends; rows may be vectors of row_shape."""
+
+    def __init__(self, dtype, capacity: int = 64, row_shape: Tuple[int, ...] = ()):
+        self._data = np.empty((capacity, *row_shape), dtype=dtype)
+        self._size = 0
+
+    def append(self, value):
+        if self._size == len(self._data):
+            grown = np.empty((len(self._data) * 2, *self._data.shape[1:]), dtype=self._data.dtype)
+            grown[:self._size] = self._data[:self._size]
+            self._data = grown
+        self._data[self._size] = value
+        self._size += 1
+
+    def values(self) -> np.ndarray:
+        return self._data[:self._size]
+
+
+class MetadataColumns:
+    """
+    Per-image metadata stored column by column, one row per document.
+
+    Filters are evaluated as vectorised boolean masks over the columns, so a
+    filtered search can narrow the candidate set before any vector scoring.
+    Categorical values (file type, folder) are dictionary-encoded and tags are
+    kept in an inverted index of rows. Description embeddings are kept in a
+    matrix of unit vectors aligned with the rows, so search() scores only the
+    rows a mask lets through.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.doc_ids: List[str] = []
+        self.rows: Dict[str, int] = {}
+        self.file_size = _Column(np.int64)
+        self.width = _Column(np.int32)
+        self.height = _Column(np.int32)
+        self.uploaded_at = _Column(np.float64)
+        self.taken_at = _Column(np.float64)  # NaN when unknown
+        self.file_type = _Column(np.int32)
+        self.folder = _Column(np.int32)
+        self._codes: Dict[str, Dict[str, int]] = {"file_type": {}, "folder": {}}
+        self.tag_rows: Dict[str, List[int]] = {}
+        self.vectors: Optional[_Column] = None  # Created on the first add, once the dimension is known
+
+    def __len__(self) -> int:
+        return len(self.doc_ids)
+
+    def _encode(self, column: str, value: str) -> int:
+        codes = self._codes[column]
+        if value not in codes:
+            codes[value] = len(codes)
+        return codes[value]
+
+    def add(self, doc_id: str, metadata: Dict[str, Any], tags: Iterable[str], embedding: Iterable[float]) -> int:
+        """Append a row for a document and its description embedding, and return its row number."""
+        vector = np.asarray(embedding, dtype=np.float32)
+        norm = np.linalg.norm(vector)
+        if norm:
+            vector = vector / norm
+        with self._lock:
+            if self.vectors is None:
+                self.vectors = _Column(np.float32, row_shape=vector.shape)
+            self.vectors.append(vector)
+            row = len(self.doc_ids)
+            self.doc_ids.append(doc_id)
+            self.rows[doc_id] = row
+            self.file_size.append(metadata["file_size"])
+            self.width.append(metadata["width"])
+            self.height.append(metadata["height"])
+            self.uploaded_at.append(metadata["uploaded_at"])
+            taken_at = metadata.get("taken_at")
+            self.taken_at.append(np.nan if taken_at is None else taken_at)
+            self.file_type.append(self._encode("file_type", metadata["file_type"]))
+            self.folder.append(self._encode("folder", metadata["folder"]))
+            for tag in set(tags):
+                self.tag_rows.setdefault(tag, []).append(row)
+            return row
+
+    def mask(self, metadata_filter: Optional[MetadataFilter]) -> np.ndarray:
+        """Boolean mask of the rows that satisfy the filter."""
+        with self._lock:
+            mask = np.ones(len(self.doc_ids), dtype=bool)
+            if metadata_filter is None:
+                return mask
+
+            f = metadata_filter
+            if f.file_types:
+                mask &= self._isin("file_type", self.file_type, f.file_types)
+            if f.folders:
+                mask &= self._isin("folder", self.folder, f.folders)
+            if f.min_width is not None:
+                mask &= self.width.values() >= f.min_width
+            if f.min_height is not None:
+                mask &= self.height.values() >= f.min_height
+            if f.max_file_size is not None:
+                mask &= self.file_size.values() <= f.max_file_size
+            if f.uploaded_after is not None:
+                mask &= self.uploaded_at.values() >= f.uploaded_after
+            if f.uploaded_before is not None:
+                mask &= self.uploaded_at.values() <= f.uploaded_before
+            # Comparisons with NaN are False, so images without a date are excluded
+            if f.taken_after is not None:
+                mask &= self.taken_at.values() >= f.taken_after
+            if f.taken_before is not None:
+                mask &= self.taken_at.values() <= f.taken_before
+            for tag in f.tags:
+                tag_mask = np.zeros(len(self.doc_ids), dtype=bool)
+                tag_mask[self.tag_rows.get(tag, [])] = True
+                mask &= tag_mask
+            return mask
+
+    def _isin(self, column: str, values: _Column, wanted: Iterable[str]) -> np.ndarray:
+        codes = [self._codes[column][value] for value in wanted if value in self._codes[column]]
+        return np.isin(values.values(), codes)
+
+    def allowed_ids(self, metadata_filter: MetadataFilter) -> Set[str]:
+        """Document ids that satisfy the filter."""
+        return self.ids_in(self.mask(metadata_filter))
+
+    def ids_in(self, mask: np.ndarray) -> Set[str]:
+        """Document ids of the rows selected by a mask."""
+        return {self.doc_ids[row] for row in np.flatnonzero(mask)}
+
+    def search(self, query_embedding: Iterable[float], k: int,
+               mask: Optional[np.ndarray] = None) -> List[Tuple[str, float]]:
+        """
+        Return up to k (doc_id, cosine_similarity) pairs, best first.
+
+        With a mask, only the selected rows are scored, so a selective filter
+        makes the scan cheaper instead of adding a pass over every document.
+        """
+        query = np.asarray(query_embedding, dtype=np.float32)
+        norm = np.linalg.norm(query)
+        if norm:
+            query = query / norm
+        with self._lock:
+            if self.vectors is None or k <= 0:
+                return []
+            vectors = self.vectors.values()
+            if mask is None:
+                rows = None
+                scores = vectors @ query
+            else:
+                rows = np.flatnonzero(mask[:len(vectors)])
+                scores = vectors[rows] @ query
+            if len(scores) > k:
+                top = np.argpartition(-scores, k - 1)[:k]
+            else:
+                top = np.arange(len(scores))
+            top = top[np.argsort(-scores[top], kind="stable")]
+            return [
+                (self.doc_ids[top_row if rows is None else rows[top_row]], float(scores[top_row]))
+                for top_row in top
+            ]
+
+    def facets(self, mask: Optional[np.ndarray] = None, max_tags: int = 20) -> Dict[str, Dict[str, int]]:
+        """Value counts for file types, folders and the most common tags."""
+        with self._lock:
+            if mask is None:
+                mask = np.ones(len(self.doc_ids), dtype=bool)
+
+            facets = {}
+            for column, values in (("file_type", self.file_type), ("folder", self.folder)):
+                counts = np.bincount(values.values()[mask], minlength=len(self._codes[column]))
+                facets[column] = {
+                    value: int(counts[code]) for value, code in self._codes[column].items() if counts[code]
+                }
+
+            tag_counts = Counter({tag: int(mask[rows].sum()) for tag, rows in self.tag_rows.items()})
+            facets["tags"] = {tag: count for tag, count in tag_counts.most_common(max_tags) if count}
+            return facets
@@ -1,5 +1,7 @@
 import streamlit as st
 import time
+from datetime import datetime, time as dt_time
+from image_metadata import MetadataFilter
 from image_store import ImageStore
 from ui_components import UIComponents
 from logger import app_logger
@@ -7,6 +9,9 @@ from logger import app_logger
 # Add breadcrumb navigation
 UIComponents.show_breadcrumb(["Home", "Image Search"])
 
+# Make images described by the background worker searchable
+ImageStore.sync_completed_jobs()
+
 st.title("🔍 Image Search")
 st.markdown("Search your image collection using natural language descriptions.")
 
@@ -24,6 +29,35 @@ with col2:
     # Search options
     num_results = st.selectbox("Results to show:", [1, 3, 5, 10], index=0)
 
+# Metadata filters, built from the facets of the current collection
+with st.expander("🎛️ Filters"):
+    facets = ImageStore.facets()
+    filter_col1, filter_col2 = st.columns(2)
+    
+    with filter_col1:
+        file_types = st.multiselect(
+            "File type:",
+            [f"{value} ({count})" for value, count in sorted(facets["file_type"].items())]
+        )
+        tags = st.multiselect(
+            "Must mention:",
+            [f"{value} ({count})" for value, count in facets["tags"].items()],
+            help="Tags are extracted from the image descriptions"
+        )
+    
+    with filter_col2:
+        min_width = st.number_input("Minimum width (px):", min_value=0, value=0, step=100)
+        min_height = st.number_input("Minimum height (px):", min_value=0, value=0, step=100)
+        uploaded_since = st.date_input("Uploaded since:", value=None)
+    
+    search_filters = MetadataFilter(
+        file_types=tuple(option.rsplit(" (", 1)[0] for option in file_types),
+        tags=tuple(option.rsplit(" (", 1)[0] for option in tags),
+        min_width=min_width or None,
+        min_height=min_height or None,
+        uploaded_after=datetime.combine(uploaded_since, dt_time.min).timestamp() if uploaded_since else None,
+    )
+
 # Quick search suggestions
 st.markdown("### Quick Searches")
 quick_searches = ["animals", "fruits", "people", "nature", "buildings", "vehicles"]
@@ -55,7 +89,7 @@ if query:
         search_start_time = time.time()
         try:
             # Update the retrieve function to return more results
-            retrieved_docs = ImageStore.retrieve_docs_by_query(query, k=num_results)
+            retrieved_docs = ImageStore.retrieve_docs_by_query(query, k=num_results, filters=search_filters)
             search_execution_time = time.time() - search_start_time
             
             if retrieved_docs:
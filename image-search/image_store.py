@@ -1,53 +1,222 @@
+import base64
+import io
+import os
+import subprocess
+import sys
+import threading
 import ollama
+from PIL import Image
 from langchain_ollama import OllamaEmbeddings
-from langchain_core.vectorstores import InMemoryVectorStore
 from langchain_core.documents import Document
 import time
-from logger import app_logger
+from description_queue import DescriptionQueue
+from image_metadata import MetadataColumns, extract_image_metadata
+from keyword_index import KeywordIndex, tokenize
+from search_cache import LRUCache
+from logger import WORKER_LOG_NAME, app_logger
+
+class _BufferReader(io.RawIOBase):
+    """Seekable read-only file over a bytes-like buffer that reads it in place."""
+
+    def __init__(self, buffer):
+        self._buffer = memoryview(buffer).cast("B")
+        self._position = 0
+
+    def readable(self):
+        return True
+
+    def seekable(self):
+        return True
+
+    def readinto(self, b):
+        data = self._buffer[self._position:self._position + len(b)]
+        b[:len(data)] = data
+        self._position += len(data)
+        return len(data)
+
+    def seek(self, offset, whence=io.SEEK_SET):
+        base = {io.SEEK_SET: 0, io.SEEK_CUR: self._position, io.SEEK_END: len(self._buffer)}[whence]
+        self._position = max(0, base + offset)
+        return self._position
+
+    def tell(self):
+        return self._position
+
 
 class ImageStore:
 
     embeddings = OllamaEmbeddings(model="llama3.2")
-    vector_store = InMemoryVectorStore(embedding=embeddings)
 
     document_ids_to_images = {}
     document_ids_to_documents = {}
 
+    # Structured per-image metadata and description embeddings; filters
+    # mask the embedding matrix before vector scoring
+    metadata_columns = MetadataColumns()
+
+    # BM25 index over the same descriptions, for exact-term matches
+    keyword_index = KeywordIndex()
+    # Weight of vector similarity in hybrid scores; the rest goes to BM25
+    hybrid_vector_weight = 0.6
+    # Single-term queries whose term is in at most this fraction of the
+    # descriptions skip the embedding call, if the term alone fills k results
+    keyword_fast_path_max_df_ratio = 0.1
+
+    # Query embeddings never go stale; search results are keyed by the index
+    # version, which is bumped whenever an image is added
+    query_embedding_cache = LRUCache(maxsize=256)
+    result_cache = LRUCache(maxsize=128)
+    index_version = 0
+
     images_directory = 'images/'
 
+    # Uploads are described and embedded by a background worker process
+    # (description_worker.py). Finished jobs are pulled into the indexes by
+    # sync_completed_jobs; synced_job_seq is the last completion seen.
+    job_queue = DescriptionQueue()
+    synced_job_seq = 0
+    worker_process = None
+    worker_script = os.path.join(os.path.dirname(os.path.abspath(__file__)), "description_worker.py")
+    _jobs_lock = threading.Lock()
+
+    # Longest edge the llava vision encoder works at; larger images are
+    # downscaled before encoding since the model would resize them anyway.
+    model_input_size = 672
+    downscale_images = True
+
     @classmethod
-    @app_logger.profile_function("image_upload")
-    def upload_image(cls, file):
-        app_logger.log_info(f"Starting image upload for file: {file.name}")
-        
-        start_time = time.time()
-        try:
-            with open(cls.images_directory + file.name, "wb") as f:
-                f.write(file.getbuffer())
+    def _add_described_image(cls, doc_id, file_name, description, embedding, metadata):
+        """
+        Add an already described and embedded image to the indexes.
 
-            description = cls._describe_image(cls.images_directory + file.name)
-            document = Document(page_content=description)
-            document_id = cls.vector_store.add_documents([document])[0]
-            cls.document_ids_to_images[document_id] = file.name
-            cls.document_ids_to_documents[document_id] = document
+        The embedding may have been computed by the worker process, so it is
+        stored as is in the metadata columns' embedding matrix.
+        """
+        tags = sorted(set(tokenize(description)))
+        document = Document(id=doc_id, page_content=description, metadata={**metadata, 'tags': tags})
+        cls.document_ids_to_images[doc_id] = file_name
+        cls.document_ids_to_documents[doc_id] = document
+        cls.keyword_index.add_document(doc_id, description)
+        cls.metadata_columns.add(doc_id, metadata, tags, embedding)
 
-            execution_time = time.time() - start_time
-            app_logger.log_upload_operation(file.name, execution_time, success=True)
-            app_logger.log_info(f"Successfully uploaded image: {file.name} with document ID: {document_id}")
-            
-            return document_id
-            
-        except Exception as e:
-            execution_time = time.time() - start_time
-            app_logger.log_upload_operation(file.name, execution_time, success=False)
-            app_logger.log_error(f"Failed to upload image: {file.name}", e)
-            raise e
+    @classmethod
+    @app_logger.profile_function("image_enqueue")
+    def enqueue_image(cls, file):
+        """
+        Save an uploaded image and queue it for description by the worker.
+
+        Returns immediately with the pending job; the image becomes searchable
+        once the job completes and sync_completed_jobs has picked it up.
+        """
+        image_path = cls.images_directory + file.name
+        with open(image_path, "wb") as f:
+            f.write(file.getbuffer())
+
+        metadata = extract_image_metadata(file.getbuffer(), file.name)
+        job = cls.job_queue.enqueue(file.name, image_path, metadata)
+        app_logger.log_info(f"Queued image {file.name} for description as job {job['id']}")
+        cls.ensure_worker()
+        return job
+
+    @classmethod
+    def sync_completed_jobs(cls):
+        """
+        Add images the worker finished since the last sync to the search indexes.
+
+        On a fresh process this loads every completed job, so the collection
+        survives app restarts. Also restarts the worker if jobs are waiting.
+        Returns the number of images added.
+        """
+        with cls._jobs_lock:
+            jobs = cls.job_queue.completed_since(cls.synced_job_seq)
+            added = 0
+            for job in jobs:
+                if job['doc_id'] not in cls.document_ids_to_documents:
+                    cls._add_described_image(
+                        job['doc_id'], job['file_name'], job['description'], job['embedding'], job['metadata']
+                    )
+                    added += 1
+                cls.synced_job_seq = job['completed_seq']
+            if added:
+                cls.index_version += 1
+                cls.result_cache.clear()
+                app_logger.log_info(f"Added {added} described image(s) from the job queue")
+
+        counts = cls.job_queue.counts()
+        if counts['pending'] or counts['running']:
+            cls.ensure_worker()
+        return added
+
+    @classmethod
+    def ensure_worker(cls):
+        """Start the description worker process unless one is already alive."""
+        with cls._jobs_lock:
+            if cls.worker_process is not None and cls.worker_process.poll() is None:
+                return
+            if cls.job_queue.has_live_worker():
+                return
+
+            # The worker writes its own log and latency files; see logger.py
+            env = {**os.environ, "IMAGE_SEARCH_LOG_NAME": WORKER_LOG_NAME}
+            cls.worker_process = subprocess.Popen(
+                [sys.executable, cls.worker_script],
+                env=env,
+                stdout=subprocess.DEVNULL,
+                stderr=subprocess.DEVNULL,
+            )
+            app_logger.log_info(f"Started description worker (pid {cls.worker_process.pid})")
 
+    @classmethod
+    def _encode_image(cls, file):
+        """
+        Base64-encode an uploaded image straight from its in-memory buffer.
+
+        The upload buffer is passed on as a memoryview rather than copied to
+        bytes or read back from the images directory. When downscaling is
+        enabled, images larger than the model input size are shrunk first.
+        """
+        return cls._encode_buffer(memoryview(file.getbuffer()))
+
+    @classmethod
+    def _encode_buffer(cls, buffer):
+        """Base64-encode image bytes, downscaling them first if enabled."""
+        if cls.downscale_images:
+            buffer = cls._downscale_image(buffer, cls.model_input_size)
+        return base64.b64encode(buffer).decode("ascii")
+
+    @staticmethod
+    def _downscale_image(buffer, max_size):
+        """
+        Shrink an encoded image so its longest edge is at most max_size pixels.
+
+        The size is read from the image header through a reader over the
+        buffer itself, so images that are already small enough are returned
+        without any copy; only larger ones are decoded.
+        """
+        image = Image.open(_BufferReader(buffer))
+        if max(image.size) <= max_size:
+            return buffer
+
+        image.thumbnail((max_size, max_size))
+        if image.mode not in ("RGB", "L"):
+            image = image.convert("RGB")
+
+        output = io.BytesIO()
+        image.save(output, format="JPEG", quality=90)
+        return output.getbuffer()
 
     @classmethod
     @app_logger.profile_function("image_description_generation")
-    def _describe_image(cls, image_path):
-        app_logger.log_info(f"Generating description for image: {image_path}")
+    def _describe_image(cls, image, label=None):
+        """
+        Generate a one-sentence description of an image.
+
+        Args:
+            image: Path to an image file or a base64-encoded image
+            label: Name used in log messages (defaults to the image path)
+        """
+        label = label or image
+        app_logger.log_info(f"Generating description for image: {label}")
         
         try:
             res = ollama.chat(
@@ -56,34 +225,61 @@ class ImageStore:
                     {
                         'role': 'user',
                         'content': 'Tell me what do you see in this picture in only one sentence. Be concise.',
-                        'images': [image_path]
+                        'images': [image]
                     }
                 ],
                 options={'temperature': 0}
             )
 
             description = res['message']['content']
-            app_logger.log_info(f"Generated description for {image_path}: {description}")
+            app_logger.log_info(f"Generated description for {label}: {description}")
             return description
             
         except Exception as e:
-            app_logger.log_error(f"Failed to generate description for image: {image_path}", e)
+            app_logger.log_error(f"Failed to generate description for image: {label}", e)
             raise e
 
     @classmethod
     @app_logger.profile_function("image_search_by_query")
-    def retrieve_docs_by_query(cls, query, k=1):
-        app_logger.log_info(f"Starting image search for query: '{query}' with k={k}")
+    def retrieve_docs_by_query(cls, query, k=1, filters=None):
+        """
+        Search images by description.
+        
+        Args:
+            query: Natural language query
+            k: Number of results to return
+            filters: Optional MetadataFilter applied before ranking
+        """
+        app_logger.log_info(f"Starting image search for query: '{query}' with k={k}, filters={filters}")
         
         start_time = time.time()
+        cache_key = (query, k, filters, cls.index_version)
+        cached_docs = cls.result_cache.get(cache_key)
+        if cached_docs is not None:
+            execution_time = time.time() - start_time
+            app_logger.log_search_operation(query, k, execution_time, len(cached_docs))
+            app_logger.log_info(f"Search served from cache. Found {len(cached_docs)} results for query: '{query}'")
+            return list(cached_docs)
+
+        # Metadata filters narrow the candidates before any scoring
+        mask = None
+        if filters is not None and not filters.is_empty():
+            mask = cls.metadata_columns.mask(filters)
+
         try:
-            results = cls.vector_store.similarity_search_with_score(query, k=k)
-            # Add similarity scores to documents
-            docs_with_scores = []
-            for doc, score in results:
-                doc.metadata = doc.metadata or {}
-                doc.metadata['score'] = score
-                docs_with_scores.append(doc)
+            docs_with_scores = None
+            if mask is not None and not mask.any():
+                docs_with_scores = []
+            elif cls._can_answer_from_keywords(query):
+                docs_with_scores = cls._keyword_search(query, k, cls._allowed_ids(mask))
+                if len(docs_with_scores) < k:
+                    # Too few literal matches: related descriptions come from the vector search
+                    docs_with_scores = None
+                else:
+                    app_logger.log_info(f"Answered query '{query}' from the keyword index")
+            if docs_with_scores is None:
+                docs_with_scores = cls._hybrid_search(query, k, mask)
+            cls.result_cache.put(cache_key, list(docs_with_scores))
             
             execution_time = time.time() - start_time
             app_logger.log_search_operation(query, k, execution_time, len(docs_with_scores))
@@ -92,10 +288,13 @@ class ImageStore:
             return docs_with_scores
             
         except Exception as e:
-            # Fallback to regular search if similarity_search_with_score is not available
-            app_logger.log_warning(f"similarity_search_with_score failed, falling back to regular search: {str(e)}")
+            # Fallback to regular search if the hybrid search is not available
+            app_logger.log_warning(f"Hybrid search failed, falling back to regular search: {str(e)}")
             try:
-                results = cls.vector_store.similarity_search(query, k=k)
+                results = [
+                    cls._result_document(doc_id, score)
+                    for doc_id, score in cls.metadata_columns.search(cls._embed_query(query), k, mask)
+                ]
                 execution_time = time.time() - start_time
                 app_logger.log_search_operation(query, k, execution_time, len(results))
                 app_logger.log_info(f"Fallback search completed. Found {len(results)} results for query: '{query}'")
@@ -105,18 +304,104 @@ class ImageStore:
                 app_logger.log_error(f"Both search methods failed for query: '{query}'", fallback_error)
                 raise fallback_error
 
+    @classmethod
+    def _can_answer_from_keywords(cls, query):
+        """
+        A query may skip the vector scan when it is a single indexed term that
+        few descriptions contain. The caller still needs k keyword matches.
+        """
+        terms = tokenize(query)
+        if len(terms) != 1:
+            return False
+        df = cls.keyword_index.document_frequency(terms[0])
+        return 0 < df <= cls.keyword_fast_path_max_df_ratio * len(cls.keyword_index)
+
+    @classmethod
+    def _keyword_search(cls, query, k, allowed=None):
+        """Rank documents by BM25 only, with scores normalised to the best match."""
+        results = cls.keyword_index.search(query, k=k, allowed=allowed)
+        if not results:
+            return []
+        top_score = results[0][1]
+        return [cls._result_document(doc_id, score / top_score) for doc_id, score in results]
+
+    @classmethod
+    def _hybrid_search(cls, query, k, mask=None):
+        """
+        Rank documents by a weighted blend of vector similarity and BM25.
+
+        Both searches fetch a wider candidate pool than k so that documents
+        ranked highly by only one of them can still make it into the results.
+        A metadata mask restricts both to the rows it selects.
+        """
+        fetch_k = max(k * 4, 20)
+        vector_scores = dict(cls.metadata_columns.search(cls._embed_query(query), fetch_k, mask))
+
+        keyword_results = cls.keyword_index.search(query, k=fetch_k, allowed=cls._allowed_ids(mask))
+        if not keyword_results:
+            combined = vector_scores
+        else:
+            top_score = keyword_results[0][1]
+            keyword_scores = {doc_id: score / top_score for doc_id, score in keyword_results}
+            weight = cls.hybrid_vector_weight
+            combined = {
+                doc_id: weight * vector_scores.get(doc_id, 0.0) + (1 - weight) * keyword_scores.get(doc_id, 0.0)
+                for doc_id in vector_scores.keys() | keyword_scores.keys()
+            }
+
+        ranked = sorted(combined.items(), key=lambda item: item[1], reverse=True)[:k]
+        return [cls._result_document(doc_id, score) for doc_id, score in ranked]
+
+    @classmethod
+    def _allowed_ids(cls, mask):
+        """Document ids selected by a metadata mask, or None when unfiltered."""
+        if mask is None:
+            return None
+        return cls.metadata_columns.ids_in(mask)
+
+    @classmethod
+    def facets(cls, filters=None):
+        """Counts of file types, folders and tags, optionally within a filter."""
+        mask = cls.metadata_columns.mask(filters) if filters is not None else None
+        return cls.metadata_columns.facets(mask)
+
+    @classmethod
+    def _embed_query(cls, query):
+        """Embed a search query, reusing the embedding of a previously seen query."""
+        embedding = cls.query_embedding_cache.get(query)
+        if embedding is None:
+            embedding = cls.embeddings.embed_query(query)
+            cls.query_embedding_cache.put(query, embedding)
+        return embedding
+
+    @classmethod
+    def cache_stats(cls):
+        """Hit/miss statistics for the query embedding and search result caches."""
+        return {
+            "query_embeddings": cls.query_embedding_cache.stats(),
+            "search_results": cls.result_cache.stats(),
+            "index_version": cls.index_version,
+        }
+
+    @classmethod
+    def _result_document(cls, doc_id, score):
+        """Build a search result for a stored document, carrying its id and score."""
+        document = cls.document_ids_to_documents[doc_id]
+        metadata = dict(document.metadata or {})
+        metadata['score'] = score
+        return Document(id=doc_id, page_content=document.page_content, metadata=metadata)
+
     @classmethod
     @app_logger.profile_function("reverse_image_search")
-    def retrieve_docs_by_image(cls, image, k=1):
+    def retrieve_docs_by_image(cls, image, k=1, filters=None):
         app_logger.log_info(f"Starting reverse image search for image: {image.name}")
         
         start_time = time.time()
         try:
-            with open(cls.images_directory + image.name, "wb") as f:
-                f.write(image.getbuffer())
-
-            description = cls._describe_image(cls.images_directory + image.name)
-            results = cls.retrieve_docs_by_query(description, k=k)
+            # Query images are described from memory and never written to the
+            # collection directory, so they cannot overwrite stored images
+            description = cls._describe_image(cls._encode_image(image), label=image.name)
+            results = cls.retrieve_docs_by_query(description, k=k, filters=filters)
             
             execution_time = time.time() - start_time
             app_logger.log_reverse_search_operation(image.name, execution_time, len(results))
@@ -0,0 +1,95 @@
+import math
+import re
+from collections import Counter, defaultdict
+from typing import Dict, List, Optional, Set, Tuple
+
+# Words that carry no meaning for matching image descriptions
+STOPWORDS = {
+    "a", "an", "and", "are", "as", "at", "be", "by", "for", "from", "has", "in",
+    "is", "it", "its", "of", "on", "or", "that", "the", "this", "to", "with",
+    "there", "image", "picture", "photo", "shows", "see", "i",
+}
+
+
+def tokenize(text: str) -> List[str]:
+    """Lowercase text, split it into words and drop stopwords and plural endings."""
+    tokens = []
+    for word in re.findall(r"[a-z0-9]+", text.lower()):
+        if word in STOPWORDS:
+            continue
+        # Light stemming so that "tigers" matches "tiger"
+        if len(word) > 3 and word.endswith("s") and not word.endswith("ss"):
+            word = word[:-1]
+        tokens.append(word)
+    return tokens
+
+
+class KeywordIndex:
+    """
+    BM25 inverted index over image descriptions.
+    """
+
+    def __init__(self, k1: float = 1.5, b: float = 0.75):
+        self.k1 = k1
+        self.b = b
+        self.postings: Dict[str, Dict[str, int]] = defaultdict(dict)
+        self.doc_lengths: Dict[str, int] = {}
+        self.total_length = 0
+
+    def __len__(self) -> int:
+        return len(self.doc_lengths)
+
+    def add_document(self, doc_id: str, text: str):
+        """Index a document's text under the given id."""
+        if doc_id in self.doc_lengths:
+            self.remove_document(doc_id)
+
+        tokens = tokenize(text)
+        for term, count in Counter(tokens).items():
+            self.postings[term][doc_id] = count
+        self.doc_lengths[doc_id] = len(tokens)
+        self.total_length += len(tokens)
+
+    def remove_document(self, doc_id: str):
+        """Remove a document from the index."""
+        if doc_id not in self.doc_lengths:
+            return
+
+        for term in list(self.postings):
+            postings = self.postings[term]
+            if postings.pop(doc_id, None) is not None and not postings:
+                del self.postings[term]
+        self.total_length -= self.doc_lengths.pop(doc_id)
+
+    def document_frequency(self, term: str) -> int:
+        """Number of indexed documents that contain a term."""
+        return len(self.postings.get(term, {}))
+
+    def idf(self, term: str) -> float:
+        """Inverse document frequency of a term (0 if the term is not indexed)."""
+        df = len(self.postings.get(term, {}))
+        if df == 0:
+            return 0.0
+        n = len(self.doc_lengths)
+        return math.log(1 + (n - df + 0.5) / (df + 0.5))
+
+    def search(self, query: str, k: int = 10, allowed: Optional[Set[str]] = None) -> List[Tuple[str, float]]:
+        """Return up to k (doc_id, bm25_score) pairs, best first, optionally restricted to allowed ids."""
+        if not self.doc_lengths:
+            return []
+
+        avg_length = self.total_length / len(self.doc_lengths) or 1.0
+        scores: Dict[str, float] = defaultdict(float)
+        for term in set(tokenize(query)):
+            postings = self.postings.get(term)
+            if not postings:
+                continue
+            idf = self.idf(term)
+            for doc_id, tf in postings.items():
+                if allowed is not None and doc_id not in allowed:
+                    continue
+                norm = self.k1 * (1 - self.b + self.b * self.doc_lengths[doc_id] / avg_length)
+                scores[doc_id] += idf * tf * (self.k1 + 1) / (tf + norm)
+
+        ranked = sorted(scores.items(), key=lambda item: item[1], reverse=True)
+        return ranked[:k]
@@ -0,0 +1,232 @@
+import atexit
+import json
+import math
+import os
+import threading
+import time
+from typing import Any, Dict, Iterable, Optional
+
+
+class LatencyHistogram:
+    """
+    Latency histogram with logarithmic buckets (HDR-style).
+
+    Every bucket is `growth` times wider than the previous one, so percentiles
+    are accurate to within a fixed relative error (about 4.5% with the default
+    growth of 2 ** (1/8)) whatever the range of recorded values.
+    """
+
+    def __init__(self, min_value: float = 1e-4, growth: float = 2 ** 0.125):
+        self.min_value = min_value
+        self.growth = growth
+        self._log_growth = math.log(growth)
+        self.buckets: Dict[int, int] = {}
+        self.count = 0
+        self.errors = 0
+        self.total = 0.0
+        self.min = math.inf
+        self.max = 0.0
+        self.first_seen: Optional[float] = None
+        self.last_seen: Optional[float] = None
+
+    def bucket_index(self, value: float) -> int:
+        """Index of the bucket a value falls into."""
+        if value <= self.min_value:
+            return 0
+        return int(math.log(value / self.min_value) / self._log_growth) + 1
+
+    def bucket_value(self, index: int) -> float:
+        """Representative value of a bucket (geometric midpoint of its bounds)."""
+        if index == 0:
+            return self.min_value
+        return self.min_value * self.growth ** (index - 0.5)
+
+    def record(self, value: float, success: bool = True, timestamp: Optional[float] = None):
+        """Add one observation (in seconds)."""
+        index = self.bucket_index(value)
+        self.buckets[index] = self.buckets.get(index, 0) + 1
+        self.count += 1
+        self.total += value
+        self.min = min(self.min, value)
+        self.max = max(self.max, value)
+        if not success:
+            self.errors += 1
+
+        timestamp = timestamp or time.time()
+        if self.first_seen is None:
+            self.first_seen = timestamp
+        self.last_seen = timestamp
+
+    def percentile(self, q: float) -> float:
+        """Return the approximate q-th percentile (0-100)."""
+        if self.count == 0:
+            return 0.0
+
+        rank = max(1, math.ceil(q / 100 * self.count))
+        seen = 0
+        for index in sorted(self.buckets):
+            seen += self.buckets[index]
+            if seen >= rank:
+                return min(max(self.bucket_value(index), self.min), self.max)
+        return self.max
+
+    def summary(self) -> Dict[str, Any]:
+        """Count, mean, min/max, p50/p95/p99, throughput and error rate."""
+        elapsed = (self.last_seen - self.first_seen) if self.count > 1 else 0.0
+        return {
+            "count": self.count,
+            "mean": self.total / self.count if self.count else 0.0,
+            "min": self.min if self.count else 0.0,
+            "max": self.max,
+            "p50": self.percentile(50),
+            "p95": self.percentile(95),
+            "p99": self.percentile(99),
+            "throughput_per_min": self.count / elapsed * 60 if elapsed > 0 else 0.0,
+            "error_rate": self.errors / self.count if self.count else 0.0,
+        }
+
+    def merge(self, other: "LatencyHistogram"):
+        """Add another histogram's observations; both must use the same buckets."""
+        if (other.min_value, other.growth) != (self.min_value, self.growth):
+            raise ValueError("Cannot merge histograms with different buckets")
+        for index, count in other.buckets.items():
+            self.buckets[index] = self.buckets.get(index, 0) + count
+        self.count += other.count
+        self.errors += other.errors
+        self.total += other.total
+        self.min = min(self.min, other.min)
+        self.max = max(self.max, other.max)
+        seen = [t for t in (self.first_seen, other.first_seen) if t is not None]
+        self.first_seen = min(seen) if seen else None
+        seen = [t for t in (self.last_seen, other.last_seen) if t is not None]
+        self.last_seen = max(seen) if seen else None
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "min_value": self.min_value,
+            "growth": self.growth,
+            "buckets": {str(index): count for index, count in self.buckets.items()},
+            "count": self.count,
+            "errors": self.errors,
+            "total": self.total,
+            "min": self.min if self.count else None,
+            "max": self.max,
+            "first_seen": self.first_seen,
+            "last_seen": self.last_seen,
+        }
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "LatencyHistogram":
+        histogram = cls(min_value=data["min_value"], growth=data["growth"])
+        histogram.buckets = {int(index): count for index, count in data["buckets"].items()}
+        histogram.count = data["count"]
+        histogram.errors = data["errors"]
+        histogram.total = data["total"]
+        histogram.min = data["min"] if data["min"] is not None else math.inf
+        histogram.max = data["max"]
+        histogram.first_seen = data["first_seen"]
+        histogram.last_seen = data["last_seen"]
+        return histogram
+
+
+def read_snapshot(path: str) -> Dict[str, LatencyHistogram]:
+    """Load the histograms of a registry snapshot file; missing or corrupt files give none."""
+    if not os.path.exists(path):
+        return {}
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            data = json.load(f)
+        return {name: LatencyHistogram.from_dict(histogram) for name, histogram in data["histograms"].items()}
+    except (OSError, ValueError, KeyError):
+        # A corrupt snapshot only costs us history, not the running app
+        return {}
+
+
+class HistogramRegistry:
+    """
+    Per-function latency histograms, periodically snapshotted to a JSON file.
+
+    The snapshot is loaded on start-up so that metrics survive restarts.
+    """
+
+    def __init__(self, snapshot_path: str, snapshot_interval: float = 10.0):
+        self.snapshot_path = snapshot_path
+        self.snapshot_interval = snapshot_interval
+        self.histograms: Dict[str, LatencyHistogram] = {}
+        self._lock = threading.Lock()
+        self._dirty = False
+        self._stopped = threading.Event()
+
+        self.load()
+        self._thread = threading.Thread(target=self._run, name="HistogramSnapshotter", daemon=True)
+        self._thread.start()
+        atexit.register(self.close)
+
+    def record(self, name: str, duration: float, success: bool = True):
+        """Record one call of a function."""
+        with self._lock:
+            histogram = self.histograms.get(name)
+            if histogram is None:
+                histogram = self.histograms[name] = LatencyHistogram()
+            histogram.record(duration, success)
+            self._dirty = True
+
+    def summaries(self, other_snapshots: Iterable[str] = ()) -> Dict[str, Dict[str, Any]]:
+        """
+        Return summary statistics for every recorded function.
+
+        Histograms from other processes' snapshot files (such as the
+        description worker's) are merged in by function name. Those are only
+        as recent as the other process's last snapshot.
+        """
+        with self._lock:
+            if not other_snapshots:
+                return {name: histogram.summary() for name, histogram in self.histograms.items()}
+            # Copies, so merging leaves this process's histograms untouched
+            histograms = {name: LatencyHistogram.from_dict(h.to_dict()) for name, h in self.histograms.items()}
+
+        for path in other_snapshots:
+            for name, histogram in read_snapshot(path).items():
+                if name in histograms:
+                    histograms[name].merge(histogram)
+                else:
+                    histograms[name] = histogram
+        return {name: histogram.summary() for name, histogram in histograms.items()}
+
+    def load(self):
+        """Load histograms from the last snapshot, if any."""
+        histograms = read_snapshot(self.snapshot_path)
+        with self._lock:
+            self.histograms = histograms
+
+    def snapshot(self):
+        """Atomically write all histograms to the snapshot file if they changed."""
+        with self._lock:
+            if not self._dirty:
+                return
+            data = {
+                "updated_at": time.time(),
+                "histograms": {name: histogram.to_dict() for name, histogram in self.histograms.items()},
+            }
+            self._dirty = False
+
+        os.makedirs(os.path.dirname(self.snapshot_path) or ".", exist_ok=True)
+        temp_path = self.snapshot_path + ".tmp"
+        with open(temp_path, "w", encoding="utf-8") as f:
+            json.dump(data, f)
+        os.replace(temp_path, self.snapshot_path)
+
+    def close(self):
+        """Stop the snapshot thread and write a final snapshot."""
+        if self._stopped.is_set():
+            return
+        self._stopped.set()
+        self._thread.join(timeout=5)
+        self.snapshot()
+
+    def _run(self):
+        while not self._stopped.wait(self.snapshot_interval):
+            try:
+                self.snapshot()
+            except OSError:
+                pass
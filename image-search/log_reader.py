@@ -0,0 +1,51 @@
+import json
+import os
+from typing import List
+
+import pandas as pd
+
+TIMING_COLUMNS = ["Timestamp", "Function", "Execution Time (s)", "Status", "Error"]
+
+
+def tail_lines(path: str, max_lines: int, block_size: int = 64 * 1024) -> List[str]:
+    """
+    Return the last max_lines lines of a file, oldest first.
+
+    The file is read backwards from the end in fixed-size blocks, so the cost
+    depends on the number of lines requested rather than the size of the file.
+    """
+    with open(path, "rb") as f:
+        f.seek(0, os.SEEK_END)
+        position = f.tell()
+        data = b""
+        # One extra newline is needed to be sure the oldest line is complete
+        while position > 0 and data.count(b"\n") <= max_lines:
+            read_size = min(block_size, position)
+            position -= read_size
+            f.seek(position)
+            data = f.read(read_size) + data
+
+    lines = data.decode("utf-8", errors="replace").splitlines()
+    return lines[-max_lines:] if max_lines > 0 else []
+
+
+def recent_timings(log_path: str, count: int) -> pd.DataFrame:
+    """
+    Return the last count timing records of a JSONL timing log, oldest first.
+
+    Only the tail of the file is read and parsed, so nothing is cached or
+    persisted besides the log itself. Malformed lines are skipped.
+    """
+    rows = []
+    if os.path.exists(log_path):
+        for line in tail_lines(log_path, count):
+            try:
+                entry = json.loads(line)
+                rows.append([entry["timestamp"], entry["function"], entry["duration"],
+                             entry["status"], entry.get("error", "")])
+            except (ValueError, KeyError):
+                continue
+
+    df = pd.DataFrame(rows, columns=TIMING_COLUMNS)
+    df["Timestamp"] = pd.to_datetime(df["Timestamp"])
+    return df
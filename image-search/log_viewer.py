@@ -2,6 +2,10 @@ import streamlit as st
 import os
 from datetime import datetime
 import pandas as pd
+from image_store import ImageStore
+from log_reader import recent_timings, tail_lines
+from logger import WORKER_LOG_NAME, app_logger
+from profiling_hooks import PROFILING_MODES, list_profiles, top_cumulative_functions
 
 def show_logs():
     """Display log files in a user-friendly format."""
@@ -10,27 +14,35 @@ def show_logs():
     
     # Check if log files exist
     main_log_file = "./logs/image-search.log"
-    timing_log_file = "./logs/image-search-timing.log"
+    timing_log_file = app_logger.timing_log_file
+    worker_latency_file = f"./logs/{WORKER_LOG_NAME}-latency.json"
     
-    tab1, tab2, tab3 = st.tabs(["📝 Application Logs", "⏱️ Performance Timing", "📈 Analytics"])
+    # Have the sink's writer thread put buffered timing records on disk, then
+    # parse only the most recent ones
+    timing_df = pd.DataFrame()
+    try:
+        app_logger.metrics_sink.flush(timeout=2.0)
+        timing_df = recent_timings(timing_log_file, 20)
+    except Exception as e:
+        st.error(f"Error reading timing file: {str(e)}")
+    
+    tab1, tab2, tab3, tab4, tab5 = st.tabs(["📝 Application Logs", "⏱️ Performance Timing", "📈 Analytics", "🧠 Search Cache", "🔬 Profiling"])
     
     with tab1:
         st.header("Application Logs")
         
         if os.path.exists(main_log_file):
             try:
-                with open(main_log_file, 'r', encoding='utf-8') as f:
-                    logs = f.readlines()
-                
-                # Show recent logs first
-                logs.reverse()
-                
                 # Filter options
                 log_level = st.selectbox("Filter by log level:", ["ALL", "INFO", "WARNING", "ERROR"])
                 max_lines = st.slider("Number of lines to show:", 10, 500, 50)
                 
+                # Only the tail of the file is read, newest lines first
+                logs = tail_lines(main_log_file, max_lines)
+                logs.reverse()
+                
                 filtered_logs = []
-                for log in logs[:max_lines]:
+                for log in logs:
                     if log_level == "ALL" or log_level in log:
                         filtered_logs.append(log.strip())
                 
@@ -38,7 +50,7 @@ def show_logs():
                     # Display logs in a text area
                     st.text_area(
                         "Recent Logs (newest first):",
-                        value="\\n".join(filtered_logs),
+                        value="\n".join(filtered_logs),
                         height=400,
                         help="These are the most recent application logs. Use the filter to see specific log levels."
                     )
@@ -53,114 +65,177 @@ def show_logs():
     with tab2:
         st.header("Performance Timing")
         
-        if os.path.exists(timing_log_file):
-            try:
-                timing_data = []
-                with open(timing_log_file, 'r', encoding='utf-8') as f:
-                    for line in f:
-                        if line.strip():
-                            parts = line.strip().split(" | ")
-                            if len(parts) >= 4:
-                                timing_data.append({
-                                    "Timestamp": parts[0],
-                                    "Function": parts[1],
-                                    "Execution Time (s)": float(parts[2].replace('s', '')),
-                                    "Status": parts[3],
-                                    "Error": parts[4] if len(parts) > 4 else ""
-                                })
-                
-                if timing_data:
-                    df = pd.DataFrame(timing_data)
-                    
-                    # Show summary statistics
-                    st.subheader("Performance Summary")
-                    
-                    col1, col2, col3, col4 = st.columns(4)
-                    
-                    with col1:
-                        st.metric("Total Operations", len(df))
-                    
-                    with col2:
-                        avg_time = df["Execution Time (s)"].mean()
-                        st.metric("Average Time", f"{avg_time:.4f}s")
-                    
-                    with col3:
-                        success_rate = (df["Status"] == "SUCCESS").sum() / len(df) * 100
-                        st.metric("Success Rate", f"{success_rate:.1f}%")
-                    
-                    with col4:
-                        max_time = df["Execution Time (s)"].max()
-                        st.metric("Slowest Operation", f"{max_time:.4f}s")
-                    
-                    # Show function performance breakdown
-                    st.subheader("Performance by Function")
-                    
-                    function_stats = df.groupby("Function").agg({
-                        "Execution Time (s)": ["count", "mean", "min", "max"],
-                        "Status": lambda x: (x == "SUCCESS").sum() / len(x) * 100
-                    }).round(4)
-                    
-                    function_stats.columns = ["Count", "Avg Time", "Min Time", "Max Time", "Success Rate %"]
-                    st.dataframe(function_stats, use_container_width=True)
-                    
-                    # Show recent timing data
-                    st.subheader("Recent Operations")
-                    recent_data = df.tail(20).iloc[::-1]  # Show last 20, newest first
-                    st.dataframe(recent_data, use_container_width=True)
-                    
-                else:
-                    st.info("No timing data available yet.")
-                    
-            except Exception as e:
-                st.error(f"Error reading timing file: {str(e)}")
+        # Summaries come from the in-process latency histograms, so this tab
+        # renders instantly no matter how large the timing log has grown. The
+        # description worker runs in its own process; its histograms are
+        # merged in from its latency snapshot.
+        latency_summaries = app_logger.latency_metrics.summaries(other_snapshots=[worker_latency_file])
+        
+        if latency_summaries:
+            total_count = sum(stats["count"] for stats in latency_summaries.values())
+            total_errors = sum(stats["error_rate"] * stats["count"] for stats in latency_summaries.values())
+            total_time = sum(stats["mean"] * stats["count"] for stats in latency_summaries.values())
+            
+            # Show summary statistics
+            st.subheader("Performance Summary")
+            
+            col1, col2, col3, col4 = st.columns(4)
+            
+            with col1:
+                st.metric("Total Operations", total_count)
+            
+            with col2:
+                st.metric("Average Time", f"{total_time / total_count:.4f}s")
+            
+            with col3:
+                success_rate = (1 - total_errors / total_count) * 100
+                st.metric("Success Rate", f"{success_rate:.1f}%")
+            
+            with col4:
+                max_time = max(stats["max"] for stats in latency_summaries.values())
+                st.metric("Slowest Operation", f"{max_time:.4f}s")
+            
+            # Show function performance breakdown
+            st.subheader("Performance by Function")
+            
+            function_stats = pd.DataFrame([
+                {
+                    "Function": name,
+                    "Count": stats["count"],
+                    "Avg Time": stats["mean"],
+                    "p50": stats["p50"],
+                    "p95": stats["p95"],
+                    "p99": stats["p99"],
+                    "Max Time": stats["max"],
+                    "Ops/min": stats["throughput_per_min"],
+                    "Error Rate %": stats["error_rate"] * 100,
+                }
+                for name, stats in sorted(latency_summaries.items())
+            ]).set_index("Function").round(4)
+            st.dataframe(function_stats, use_container_width=True)
+            st.caption(
+                "Includes the description worker's operations (image_upload, image_description_job, "
+                "image_description_generation) as of its last latency snapshot, taken every 10 seconds."
+            )
         else:
-            st.warning("No timing logs found. Performance data will appear after you use the search functionality.")
+            st.info("No timing data available yet.")
+        
+        # Show recent timing data
+        if len(timing_df) > 0:
+            st.subheader("Recent Operations")
+            recent_data = timing_df.iloc[::-1]  # Newest first
+            st.dataframe(recent_data, use_container_width=True)
+        
+        sink_stats = app_logger.metrics_sink.stats()
+        st.caption(
+            f"Timing records written: {sink_stats['written']} | "
+            f"dropped under load: {sink_stats['dropped']} | "
+            f"pending: {sink_stats['pending']} | "
+            f"failed writes: {sink_stats['write_errors']} | "
+            f"failed rollup updates: {sink_stats['callback_errors']}"
+        )
     
     with tab3:
         st.header("Usage Analytics")
         
-        if os.path.exists(timing_log_file):
-            try:
-                timing_data = []
-                with open(timing_log_file, 'r', encoding='utf-8') as f:
-                    for line in f:
-                        if line.strip():
-                            parts = line.strip().split(" | ")
-                            if len(parts) >= 4:
-                                timing_data.append({
-                                    "Timestamp": pd.to_datetime(parts[0]),
-                                    "Function": parts[1],
-                                    "Execution Time (s)": float(parts[2].replace('s', '')),
-                                    "Status": parts[3]
-                                })
+        days = st.slider("Days to show:", 1, 90, 7)
+        
+        try:
+            # Pre-aggregated hour x function rollups, updated as timings are written
+            rollups = pd.DataFrame(app_logger.rollups.hourly(days=days))
+            
+            if len(rollups) > 0:
+                rollups["hour"] = pd.to_datetime(rollups["hour"])
+                hourly = rollups.groupby("hour")[["count", "total"]].sum()
                 
-                if timing_data:
-                    df = pd.DataFrame(timing_data)
-                    
-                    # Usage over time
-                    st.subheader("Operations Over Time")
-                    df_hourly = df.set_index("Timestamp").resample("H").size()
-                    if len(df_hourly) > 0:
-                        st.line_chart(df_hourly)
-                    
-                    # Function usage distribution
-                    st.subheader("Function Usage Distribution")
-                    function_counts = df["Function"].value_counts()
-                    st.bar_chart(function_counts)
-                    
-                    # Performance trends
-                    st.subheader("Performance Trends")
-                    if len(df) > 1:
-                        df_performance = df.set_index("Timestamp")["Execution Time (s)"].resample("H").mean()
-                        st.line_chart(df_performance)
-                    
-                else:
-                    st.info("No analytics data available yet.")
-                    
+                # Usage over time
+                st.subheader("Operations Over Time")
+                st.line_chart(hourly["count"])
+                
+                # Function usage distribution
+                st.subheader("Function Usage Distribution")
+                function_counts = rollups.groupby("function")["count"].sum().sort_values(ascending=False)
+                st.bar_chart(function_counts)
+                
+                # Performance trends
+                st.subheader("Performance Trends")
+                if len(hourly) > 1:
+                    p95 = pd.Series(app_logger.rollups.hourly_percentile(95, days=days))
+                    p95.index = pd.to_datetime(p95.index)
+                    df_performance = pd.DataFrame({
+                        "Mean (s)": hourly["total"] / hourly["count"],
+                        "p95 (s)": p95,
+                    })
+                    st.line_chart(df_performance)
+                
+            else:
+                st.info("No analytics data available yet.")
+                
+        except Exception as e:
+            st.error(f"Error generating analytics: {str(e)}")
+    
+    with tab4:
+        st.header("Search Cache")
+        
+        cache_stats = ImageStore.cache_stats()
+        caches = {
+            "Query Embeddings": cache_stats["query_embeddings"],
+            "Search Results": cache_stats["search_results"],
+        }
+        
+        cols = st.columns(len(caches))
+        for col, (cache_name, stats) in zip(cols, caches.items()):
+            with col:
+                st.subheader(cache_name)
+                st.metric("Hit Rate", f"{stats['hit_rate']:.1%}")
+                st.metric("Hits / Misses", f"{stats['hits']} / {stats['misses']}")
+                st.metric("Entries", f"{stats['size']} / {stats['maxsize']}")
+        
+        st.caption(
+            f"Index version: {cache_stats['index_version']}. "
+            "Search results are invalidated whenever a new image is added."
+        )
+    
+    with tab5:
+        st.header("Profiling")
+        
+        # Profiling settings apply to the app and are saved for the description
+        # worker, which applies them from its next job
+        app_logger.sync_profiling_settings()
+        profiler = app_logger.profiler
+        st.subheader("Settings")
+        known_functions = sorted(set(latency_summaries) | profiler.functions)
+        selected_functions = st.multiselect(
+            "Always profile these functions:",
+            known_functions,
+            default=sorted(profiler.functions),
+            help="Every call of a selected function is profiled"
+        )
+        sample_rate = st.slider(
+            "Sampling rate for other calls:", 0.0, 1.0, float(profiler.sample_rate), 0.01,
+            help="Fraction of all other profiled calls to capture"
+        )
+        mode = st.radio(
+            "Profiler:", PROFILING_MODES, index=PROFILING_MODES.index(profiler.mode), horizontal=True,
+            help="cprofile writes .pstats files; sampler writes collapsed-stack files"
+        )
+        if st.button("Apply Profiling Settings"):
+            app_logger.configure_profiling(functions=selected_functions, sample_rate=sample_rate, mode=mode)
+            st.success("Profiling settings updated for the app and the description worker.")
+        
+        st.subheader("Captured Profiles")
+        profile_files = list_profiles(profiler.output_dir)
+        if profile_files:
+            selected_profile = st.selectbox(
+                "Profile:", profile_files, format_func=os.path.basename
+            )
+            try:
+                top_functions = pd.DataFrame(top_cumulative_functions(selected_profile))
+                st.dataframe(top_functions.round(4), use_container_width=True)
             except Exception as e:
-                st.error(f"Error generating analytics: {str(e)}")
+                st.error(f"Error reading profile: {str(e)}")
         else:
-            st.warning("No data available for analytics.")
+            st.info("No profiles captured yet. Select functions or a sampling rate above to start profiling.")
     
     # Refresh button
     if st.button("🔄 Refresh Logs"):
@@ -1,18 +1,42 @@
 import logging
+import json
 import time
 import functools
 from datetime import datetime
 import os
 from typing import Any, Callable, Optional
+from latency_histogram import HistogramRegistry
+from metrics_sink import MetricsSink
+from profiling_hooks import FunctionProfiler
+from rollup_store import RollupStore
 
 class ImageSearchLogger:
     """
     Centralized logging and profiling utility for the image search application.
     """
     
-    def __init__(self, log_file: str = "./logs/image-search.log"):
+    def __init__(self, log_file: str = "./logs/image-search.log",
+                 timing_log_file: str = "./logs/image-search-timing.jsonl",
+                 latency_snapshot_file: str = "./logs/image-search-latency.json",
+                 rollup_db_file: str = "./logs/image-search-rollups.sqlite",
+                 profiling_settings_file: str = "./logs/profiling-settings.json"):
         self.log_file = log_file
+        self.timing_log_file = timing_log_file
+        self.latency_snapshot_file = latency_snapshot_file
+        self.rollup_db_file = rollup_db_file
+        self.profiling_settings_file = profiling_settings_file
+        self._profiling_settings_mtime = None
         self.setup_logger()
+        # Timing records are buffered and written by a background thread so
+        # profiled calls never wait on disk I/O. The writer thread also folds
+        # each written batch into the hourly rollups used by the analytics tab.
+        self.rollups = RollupStore(self.rollup_db_file)
+        self.metrics_sink = MetricsSink(self.timing_log_file, on_batch=self.rollups.add_batch)
+        # Per-function latency histograms for instant percentile summaries
+        self.latency_metrics = HistogramRegistry(self.latency_snapshot_file)
+        # Opt-in cProfile / stack sampling of profiled functions (off by default)
+        self.profiler = FunctionProfiler(os.path.join(os.path.dirname(self.log_file), "profiles"))
+        self.sync_profiling_settings()
     
     def setup_logger(self):
         """Set up the logger with proper formatting and file handling."""
@@ -63,7 +87,8 @@ class ImageSearchLogger:
                 self.logger.info(f"Started: {name}")
                 
                 try:
-                    result = func(*args, **kwargs)
+                    with self.profiler.capture(name) as profile_path:
+                        result = func(*args, **kwargs)
                     end_time = time.time()
                     execution_time = end_time - start_time
                     
@@ -72,6 +97,9 @@ class ImageSearchLogger:
                     # Also write timing to specific log format for profiling
                     self._log_timing(name, execution_time, "SUCCESS")
                     
+                    if profile_path:
+                        self.logger.info(f"Profile for {name} written to {profile_path}")
+                    
                     return result
                     
                 except Exception as e:
@@ -86,20 +114,61 @@ class ImageSearchLogger:
             return wrapper
         return decorator
     
+    def configure_profiling(self, functions=None, sample_rate: float = 0.0, mode: str = "cprofile"):
+        """
+        Enable detailed profiling of functions wrapped by profile_function.
+        
+        Args:
+            functions: Names of profiled functions to capture on every call
+            sample_rate: Fraction (0-1) of all other profiled calls to capture
+            mode: "cprofile" for .pstats files or "sampler" for collapsed stacks
+        """
+        self.profiler.configure(functions=functions, sample_rate=sample_rate, mode=mode)
+        self.logger.info(
+            f"Profiling configured - Functions: {sorted(self.profiler.functions)} | "
+            f"Sample rate: {sample_rate} | Mode: {mode}"
+        )
+        
+        # Saved for the other processes sharing the logs directory, which pick
+        # the settings up through sync_profiling_settings
+        settings = {"functions": sorted(self.profiler.functions), "sample_rate": sample_rate, "mode": mode}
+        temp_path = self.profiling_settings_file + ".tmp"
+        with open(temp_path, "w", encoding="utf-8") as f:
+            json.dump(settings, f)
+        os.replace(temp_path, self.profiling_settings_file)
+        self._profiling_settings_mtime = os.stat(self.profiling_settings_file).st_mtime_ns
+    
+    def sync_profiling_settings(self):
+        """Apply profiling settings saved by configure_profiling in any process, if they changed."""
+        try:
+            mtime = os.stat(self.profiling_settings_file).st_mtime_ns
+            if mtime == self._profiling_settings_mtime:
+                return
+            with open(self.profiling_settings_file, "r", encoding="utf-8") as f:
+                settings = json.load(f)
+            self.profiler.configure(**settings)
+            self._profiling_settings_mtime = mtime
+            self.logger.info(f"Profiling settings loaded from {self.profiling_settings_file}: {settings}")
+        except FileNotFoundError:
+            return
+        except (OSError, ValueError, TypeError) as e:
+            self.logger.warning(f"Ignoring unreadable profiling settings: {e}")
+    
     def _log_timing(self, function_name: str, execution_time: float, status: str, error: Optional[str] = None):
-        """Log timing information in a structured format."""
-        timestamp = datetime.now().isoformat()
-        log_entry = f"{timestamp} | {function_name} | {execution_time:.4f}s | {status}"
+        """Record timing in the latency histograms and queue it for the metrics sink."""
+        self.latency_metrics.record(function_name, execution_time, success=(status == "SUCCESS"))
         
-        if error:
-            log_entry += f" | Error: {error}"
+        entry = {
+            "timestamp": datetime.now().isoformat(),
+            "function": function_name,
+            "duration": round(execution_time, 6),
+            "status": status,
+        }
         
-        # Write to timing log file
-        timing_log_file = "./logs/image-search-timing.log"
-        os.makedirs(os.path.dirname(timing_log_file), exist_ok=True)
+        if error:
+            entry["error"] = error
         
-        with open(timing_log_file, "a", encoding="utf-8") as f:
-            f.write(log_entry + "\n")
+        self.metrics_sink.record(entry)
     
     def log_search_operation(self, query: str, num_results: int, execution_time: float, results_found: int):
         """Log specific image search operation details."""
@@ -136,5 +205,15 @@ class ImageSearchLogger:
         self.logger.info(log_message)
         self._log_timing(f"reverse_image_search", execution_time, "SUCCESS")
 
+# Processes other than the Streamlit app (such as the description worker)
+# set IMAGE_SEARCH_LOG_NAME so they keep their own log, timing and latency
+# files; the hourly rollups database and profiling settings are shared.
+LOG_NAME = os.environ.get("IMAGE_SEARCH_LOG_NAME", "image-search")
+WORKER_LOG_NAME = "image-search-worker"
+
 # Global logger instance
-app_logger = ImageSearchLogger()
+app_logger = ImageSearchLogger(
+    log_file=f"./logs/{LOG_NAME}.log",
+    timing_log_file=f"./logs/{LOG_NAME}-timing.jsonl",
+    latency_snapshot_file=f"./logs/{LOG_NAME}-latency.json",
+)
@@ -0,0 +1,203 @@
+import atexit
+import json
+import logging
+import os
+import threading
+from collections import deque
+from typing import Any, Callable, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+
+class MetricsSink:
+    """
+    Non-blocking, batched writer for structured timing records.
+
+    Records are appended to a bounded in-memory ring buffer and written as
+    JSON lines by a background thread. When the buffer is full new records
+    are dropped (and counted) instead of blocking the caller. The output file
+    is rotated once it grows past max_bytes.
+
+    Only the writer thread writes: flush() asks it to write now and waits, and
+    close() has it write what is left before it exits. Draining, writing and
+    rotating happen under one write lock, and a batch that fails to write is
+    put back in the buffer (as far as capacity allows; the rest is counted as
+    dropped).
+
+    An optional on_batch callback receives every written batch, always on the
+    writer thread and after the batch is on disk. A failing callback is logged
+    and retried with the next cycle; it never affects the file, and batches
+    waiting for it are bounded by capacity.
+    """
+
+    def __init__(self, path: str, capacity: int = 10000, batch_size: int = 256,
+                 flush_interval: float = 1.0, max_bytes: int = 10 * 1024 * 1024,
+                 backup_count: int = 5,
+                 on_batch: Optional[Callable[[List[Dict[str, Any]]], None]] = None):
+        self.path = path
+        self.on_batch = on_batch
+        self.capacity = capacity
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.max_bytes = max_bytes
+        self.backup_count = backup_count
+
+        self._buffer: deque = deque()
+        self._lock = threading.Lock()
+        self._write_lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._flush_waiters: List[threading.Event] = []
+        self._stopped = threading.Event()
+        self.written = 0
+        self.dropped = 0
+        self.write_errors = 0
+        self.callback_errors = 0
+        # Written batches the on_batch callback has not accepted yet
+        self._callback_backlog: deque = deque()
+
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        self._thread = threading.Thread(target=self._run, name="MetricsSinkWriter", daemon=True)
+        self._thread.start()
+        atexit.register(self.close)
+
+    def record(self, entry: Dict[str, Any]) -> bool:
+        """Queue a record for writing. Returns False if it was dropped."""
+        with self._lock:
+            if len(self._buffer) >= self.capacity:
+                self.dropped += 1
+                return False
+            self._buffer.append(entry)
+            pending = len(self._buffer)
+
+        if pending >= self.batch_size:
+            self._wakeup.set()
+        return True
+
+    def flush(self, timeout: float = 5.0) -> bool:
+        """
+        Have the writer thread write all records queued so far and wait up to
+        timeout seconds for it. Returns False if it did not finish in time or
+        the writer has stopped.
+        """
+        if not self._thread.is_alive():
+            return False
+        done = threading.Event()
+        with self._lock:
+            self._flush_waiters.append(done)
+        self._wakeup.set()
+        return done.wait(timeout)
+
+    def close(self):
+        """Stop the writer thread once it has written whatever is still queued."""
+        if self._stopped.is_set():
+            return
+        self._stopped.set()
+        self._wakeup.set()
+        self._thread.join(timeout=5)
+        for done in self._take_flush_waiters():
+            done.set()
+
+    def stats(self) -> Dict[str, int]:
+        """Return the number of written, dropped and pending records, and failed writes and callbacks."""
+        with self._lock:
+            pending = len(self._buffer)
+        return {"written": self.written, "dropped": self.dropped, "pending": pending,
+                "write_errors": self.write_errors, "callback_errors": self.callback_errors}
+
+    def _run(self):
+        while True:
+            self._wakeup.wait(self.flush_interval)
+            self._wakeup.clear()
+            stopping = self._stopped.is_set()
+            # Taken before draining, so every waiter's records are in this flush
+            waiters = self._take_flush_waiters()
+            try:
+                batch = self._flush_pending()
+                if batch and self.on_batch is not None:
+                    self._callback_backlog.append(batch)
+                self._run_callback()
+            except Exception:
+                # Never let an unexpected error kill the writer thread
+                logger.exception("Metrics sink writer failed")
+            finally:
+                for done in waiters:
+                    done.set()
+            if stopping:
+                return
+
+    def _run_callback(self):
+        """Pass written batches to on_batch in order, stopping at the first failure."""
+        while self._callback_backlog:
+            try:
+                self.on_batch(self._callback_backlog[0])
+            except Exception:
+                self.callback_errors += 1
+                logger.warning("Metrics sink on_batch callback failed; retrying with the next batch", exc_info=True)
+                break
+            self._callback_backlog.popleft()
+
+        waiting = sum(len(batch) for batch in self._callback_backlog)
+        while waiting > self.capacity:
+            discarded = self._callback_backlog.popleft()
+            waiting -= len(discarded)
+            logger.warning(f"Metrics sink on_batch backlog full; discarded {len(discarded)} records")
+
+    def _take_flush_waiters(self) -> List[threading.Event]:
+        with self._lock:
+            waiters, self._flush_waiters = self._flush_waiters, []
+        return waiters
+
+    def _flush_pending(self) -> Optional[List[Dict[str, Any]]]:
+        """
+        Drain the buffer and write it. Returns the written batch, or None if
+        there was nothing to write or the write failed (the batch is requeued).
+        """
+        with self._write_lock:
+            batch = self._drain()
+            if not batch:
+                return None
+            try:
+                self._write(batch)
+            except OSError:
+                self.write_errors += 1
+                self._requeue(batch)
+                return None
+            self.written += len(batch)
+
+            try:
+                if os.path.getsize(self.path) >= self.max_bytes:
+                    self._rotate()
+            except OSError:
+                # The batch is on disk; rotation is retried after the next write
+                self.write_errors += 1
+        return batch
+
+    def _drain(self) -> List[Dict[str, Any]]:
+        with self._lock:
+            batch = list(self._buffer)
+            self._buffer.clear()
+        return batch
+
+    def _requeue(self, batch: List[Dict[str, Any]]):
+        """Put a failed batch back in front of newer records, dropping its oldest records if full."""
+        with self._lock:
+            room = max(0, self.capacity - len(self._buffer))
+            kept = batch[len(batch) - room:] if room < len(batch) else batch
+            self._buffer.extendleft(reversed(kept))
+            self.dropped += len(batch) - len(kept)
+
+    def _write(self, batch: List[Dict[str, Any]]):
+        lines = "".join(json.dumps(entry, separators=(",", ":")) + "\n" for entry in batch)
+        with open(self.path, "a", encoding="utf-8") as f:
+            f.write(lines)
+
+    def _rotate(self):
+        """Shift path -> path.1 -> path.2 ..., discarding the oldest backup."""
+        for i in range(self.backup_count - 1, 0, -1):
+            source = f"{self.path}.{i}"
+            if os.path.exists(source):
+                os.replace(source, f"{self.path}.{i + 1}")
+        if self.backup_count > 0:
+            os.replace(self.path, f"{self.path}.1")
+        else:
+            os.remove(self.path)
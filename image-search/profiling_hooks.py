@@ -0,0 +1,189 @@
+import cProfile
+import os
+import pstats
+import random
+import sys
+import threading
+from collections import Counter
+from contextlib import contextmanager
+from datetime import datetime
+from typing import Any, Dict, Iterable, List, Optional
+
+PROFILING_MODES = ["cprofile", "sampler"]
+
+
+class StackSampler:
+    """
+    Lightweight sampling profiler for a single thread.
+
+    A background thread periodically captures the target thread's Python
+    stack and counts identical stacks, which can be written out in the
+    collapsed-stack format used by flame graph tools.
+    """
+
+    def __init__(self, thread_id: int, interval: float = 0.005):
+        self.thread_id = thread_id
+        self.interval = interval
+        self.stacks: Counter = Counter()
+        self._stopped = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="StackSampler", daemon=True)
+
+    def start(self):
+        self._thread.start()
+
+    def stop(self):
+        self._stopped.set()
+        self._thread.join()
+
+    def _run(self):
+        while not self._stopped.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            names = []
+            while frame is not None:
+                code = frame.f_code
+                names.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})")
+                frame = frame.f_back
+            if names:
+                self.stacks[";".join(reversed(names))] += 1
+
+    def write_collapsed(self, path: str):
+        with open(path, "w", encoding="utf-8") as f:
+            for stack, count in self.stacks.most_common():
+                f.write(f"{stack} {count}\n")
+
+
+class FunctionProfiler:
+    """
+    Opt-in profiling hook used by ImageSearchLogger.profile_function.
+
+    Calls are profiled when their name has been selected explicitly, or at
+    random with probability sample_rate. In "cprofile" mode a .pstats file is
+    written per call; in "sampler" mode a collapsed-stack file is written.
+    Nested profiled calls inside an already profiled call are not profiled
+    again.
+    """
+
+    def __init__(self, output_dir: str = "./logs/profiles"):
+        self.output_dir = output_dir
+        self.functions: set = set()
+        self.sample_rate = 0.0
+        self.mode = "cprofile"
+        self.sampler_interval = 0.005
+        self._local = threading.local()
+
+    def configure(self, functions: Optional[Iterable[str]] = None, sample_rate: float = 0.0,
+                  mode: str = "cprofile", sampler_interval: float = 0.005):
+        """Select which calls to profile and how. With no arguments, profiling is off."""
+        if mode not in PROFILING_MODES:
+            raise ValueError(f"Unknown profiling mode: {mode}")
+        self.functions = set(functions or [])
+        self.sample_rate = sample_rate
+        self.mode = mode
+        self.sampler_interval = sampler_interval
+
+    @property
+    def enabled(self) -> bool:
+        return bool(self.functions) or self.sample_rate > 0
+
+    def should_profile(self, name: str) -> bool:
+        return name in self.functions or (self.sample_rate > 0 and random.random() < self.sample_rate)
+
+    @contextmanager
+    def capture(self, name: str):
+        """Profile the enclosed block if the named function is selected."""
+        if getattr(self._local, "active", False) or not self.should_profile(name):
+            yield None
+            return
+
+        self._local.active = True
+        try:
+            os.makedirs(self.output_dir, exist_ok=True)
+            stamp = datetime.now().strftime("%Y%m%d-%H%M%S-%f")
+            path = os.path.join(self.output_dir, f"{name}-{stamp}")
+            if self.mode == "cprofile":
+                with self._cprofile(path + ".pstats") as output:
+                    yield output
+            else:
+                with self._sample(path + ".collapsed") as output:
+                    yield output
+        finally:
+            self._local.active = False
+
+    @contextmanager
+    def _cprofile(self, path: str):
+        profiler = cProfile.Profile()
+        try:
+            profiler.enable()
+        except ValueError:
+            # Another profiler is already active (e.g. in a concurrent request)
+            yield None
+            return
+        try:
+            yield path
+        finally:
+            profiler.disable()
+            profiler.dump_stats(path)
+
+    @contextmanager
+    def _sample(self, path: str):
+        sampler = StackSampler(threading.get_ident(), self.sampler_interval)
+        sampler.start()
+        try:
+            yield path
+        finally:
+            sampler.stop()
+            sampler.write_collapsed(path)
+
+
+def list_profiles(output_dir: str = "./logs/profiles") -> List[str]:
+    """Profile files in output_dir, newest first."""
+    if not os.path.exists(output_dir):
+        return []
+    files = [
+        os.path.join(output_dir, name)
+        for name in os.listdir(output_dir)
+        if name.endswith((".pstats", ".collapsed"))
+    ]
+    return sorted(files, key=os.path.getmtime, reverse=True)
+
+
+def top_cumulative_functions(path: str, limit: int = 25) -> List[Dict[str, Any]]:
+    """Top functions by cumulative time (.pstats) or inclusive samples (.collapsed)."""
+    if path.endswith(".pstats"):
+        stats = pstats.Stats(path).stats
+        rows = [
+            {
+                "Function": f"{func} ({os.path.basename(filename)}:{line})",
+                "Calls": calls,
+                "Total Time (s)": total_time,
+                "Cumulative Time (s)": cumulative_time,
+            }
+            for (filename, line, func), (_, calls, total_time, cumulative_time, _) in stats.items()
+        ]
+        rows.sort(key=lambda row: row["Cumulative Time (s)"], reverse=True)
+        return rows[:limit]
+
+    inclusive: Counter = Counter()
+    exclusive: Counter = Counter()
+    total = 0
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            stack, _, count = line.rstrip("\n").rpartition(" ")
+            if not stack:
+                continue
+            frames = stack.split(";")
+            count = int(count)
+            total += count
+            exclusive[frames[-1]] += count
+            for frame in set(frames):
+                inclusive[frame] += count
+
+    return [
+        {
+            "Function": frame,
+            "Inclusive Samples": samples,
+            "Inclusive %": samples / total * 100,
+            "Self Samples": exclusive[frame],
+        }
+        for frame, samples in inclusive.most_common(limit)
+    ]
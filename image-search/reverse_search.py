@@ -7,6 +7,9 @@ from logger import app_logger
 # Add breadcrumb navigation
 UIComponents.show_breadcrumb(["Home", "Reverse Search"])
 
+# Make images described by the background worker searchable
+ImageStore.sync_completed_jobs()
+
 st.title("🔍 Reverse Image Search")
 st.markdown("Find similar images by uploading a reference image.")
 
@@ -0,0 +1,149 @@
+import os
+import sqlite3
+from collections import defaultdict
+from contextlib import closing
+from datetime import datetime, timedelta
+from typing import Any, Dict, Iterable, List, Optional
+
+from latency_histogram import LatencyHistogram
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS hourly_rollups (
+    hour TEXT NOT NULL,
+    function TEXT NOT NULL,
+    count INTEGER NOT NULL,
+    errors INTEGER NOT NULL,
+    total REAL NOT NULL,
+    min REAL NOT NULL,
+    max REAL NOT NULL,
+    PRIMARY KEY (hour, function)
+);
+CREATE TABLE IF NOT EXISTS hourly_buckets (
+    hour TEXT NOT NULL,
+    function TEXT NOT NULL,
+    bucket INTEGER NOT NULL,
+    count INTEGER NOT NULL,
+    PRIMARY KEY (hour, function, bucket)
+);
+"""
+
+
+class RollupStore:
+    """
+    Hour x function rollups of timing records, stored in SQLite.
+
+    Each row holds count, error count, sum, min and max, plus a log-bucketed
+    latency histogram in a side table. Rollups are updated incrementally from
+    each batch the metrics sink writes, so analytics read a few hundred rows
+    however long the application has been running.
+    """
+
+    def __init__(self, db_path: str):
+        self.db_path = db_path
+        # Same bucket layout as the in-process latency histograms
+        self._histogram = LatencyHistogram()
+        os.makedirs(os.path.dirname(self.db_path) or ".", exist_ok=True)
+        with closing(self._connect()) as conn:
+            conn.executescript(SCHEMA)
+
+    def _connect(self) -> sqlite3.Connection:
+        return sqlite3.connect(self.db_path, timeout=10)
+
+    def add_batch(self, entries: Iterable[Dict[str, Any]]):
+        """Fold a batch of timing records into the hourly rollups."""
+        rollups: Dict[tuple, Dict[str, Any]] = {}
+        buckets: Dict[tuple, int] = defaultdict(int)
+
+        for entry in entries:
+            hour = entry["timestamp"][:13] + ":00:00"
+            key = (hour, entry["function"])
+            duration = entry["duration"]
+            failed = entry["status"] != "SUCCESS"
+
+            rollup = rollups.get(key)
+            if rollup is None:
+                rollups[key] = {"count": 1, "errors": int(failed), "total": duration,
+                                "min": duration, "max": duration}
+            else:
+                rollup["count"] += 1
+                rollup["errors"] += int(failed)
+                rollup["total"] += duration
+                rollup["min"] = min(rollup["min"], duration)
+                rollup["max"] = max(rollup["max"], duration)
+            buckets[key + (self._histogram.bucket_index(duration),)] += 1
+
+        if not rollups:
+            return
+
+        with closing(self._connect()) as conn, conn:
+            conn.executemany(
+                """
+                INSERT INTO hourly_rollups (hour, function, count, errors, total, min, max)
+                VALUES (?, ?, ?, ?, ?, ?, ?)
+                ON CONFLICT (hour, function) DO UPDATE SET
+                    count = count + excluded.count,
+                    errors = errors + excluded.errors,
+                    total = total + excluded.total,
+                    min = MIN(min, excluded.min),
+                    max = MAX(max, excluded.max)
+                """,
+                [(hour, function, r["count"], r["errors"], r["total"], r["min"], r["max"])
+                 for (hour, function), r in rollups.items()],
+            )
+            conn.executemany(
+                """
+                INSERT INTO hourly_buckets (hour, function, bucket, count)
+                VALUES (?, ?, ?, ?)
+                ON CONFLICT (hour, function, bucket) DO UPDATE SET
+                    count = count + excluded.count
+                """,
+                [key + (count,) for key, count in buckets.items()],
+            )
+
+    def hourly(self, days: Optional[int] = None) -> List[Dict[str, Any]]:
+        """Rollup rows (oldest first), optionally limited to the last `days` days."""
+        query = "SELECT hour, function, count, errors, total, min, max FROM hourly_rollups"
+        params: tuple = ()
+        if days is not None:
+            query += " WHERE hour >= ?"
+            params = (self._since(days),)
+        query += " ORDER BY hour, function"
+
+        with closing(self._connect()) as conn:
+            rows = conn.execute(query, params).fetchall()
+        return [
+            {"hour": hour, "function": function, "count": count, "errors": errors,
+             "total": total, "min": min_, "max": max_}
+            for hour, function, count, errors, total, min_, max_ in rows
+        ]
+
+    def hourly_percentile(self, q: float, days: Optional[int] = None) -> Dict[str, float]:
+        """Approximate q-th percentile latency per hour, across all functions."""
+        query = "SELECT hour, bucket, SUM(count) FROM hourly_buckets"
+        params: tuple = ()
+        if days is not None:
+            query += " WHERE hour >= ?"
+            params = (self._since(days),)
+        query += " GROUP BY hour, bucket ORDER BY hour, bucket"
+
+        with closing(self._connect()) as conn:
+            rows = conn.execute(query, params).fetchall()
+
+        by_hour: Dict[str, List[tuple]] = defaultdict(list)
+        for hour, bucket, count in rows:
+            by_hour[hour].append((bucket, count))
+
+        percentiles = {}
+        for hour, hour_buckets in by_hour.items():
+            rank = max(1, -(-q * sum(count for _, count in hour_buckets) // 100))
+            seen = 0
+            for bucket, count in hour_buckets:
+                seen += count
+                if seen >= rank:
+                    percentiles[hour] = self._histogram.bucket_value(bucket)
+                    break
+        return percentiles
+
+    @staticmethod
+    def _since(days: int) -> str:
+        return (datetime.now() - timedelta(days=days)).strftime("%Y-%m-%dT%H:00:00")
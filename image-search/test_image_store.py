@@ -0,0 +1,205 @@
+import io
+import time
+import tracemalloc
+import unittest
+from unittest.mock import MagicMock, patch
+
+import numpy as np
+from PIL import Image
+
+from image_metadata import MetadataColumns, MetadataFilter
+from image_store import ImageStore
+from keyword_index import KeywordIndex
+from search_cache import LRUCache
+
+
+def metadata(file_type="jpg", folder="", width=640, height=480):
+    return {
+        "file_size": 1000,
+        "width": width,
+        "height": height,
+        "file_type": file_type,
+        "folder": folder,
+        "uploaded_at": 0.0,
+        "taken_at": None,
+    }
+
+
+class TestMetadataVectorSearch(unittest.TestCase):
+    def setUp(self):
+        self.rng = np.random.default_rng(0)
+
+    def fill(self, count, dimension, selective_every=100):
+        """Columns with random embeddings; every selective_every-th image is a png."""
+        columns = MetadataColumns()
+        vectors = self.rng.standard_normal((count, dimension)).astype(np.float32)
+        for row, vector in enumerate(vectors):
+            file_type = "png" if row % selective_every == 0 else "jpg"
+            columns.add(f"doc-{row}", metadata(file_type=file_type), [], vector)
+        return columns, vectors
+
+    def test_search_returns_cosine_top_k(self):
+        columns, vectors = self.fill(500, 16)
+        query = self.rng.standard_normal(16)
+
+        results = columns.search(query, k=5)
+
+        cosine = vectors @ query / (np.linalg.norm(vectors, axis=1) * np.linalg.norm(query))
+        expected = np.argsort(-cosine)[:5]
+        self.assertEqual([doc_id for doc_id, _ in results], [f"doc-{row}" for row in expected])
+        np.testing.assert_allclose([score for _, score in results], cosine[expected], rtol=1e-5)
+
+    def test_mask_restricts_candidates(self):
+        columns, vectors = self.fill(500, 16, selective_every=10)
+        query = self.rng.standard_normal(16)
+        mask = columns.mask(MetadataFilter(file_types=("png",)))
+
+        results = columns.search(query, k=100, mask=mask)
+
+        self.assertEqual(len(results), 50)
+        self.assertTrue(all(int(doc_id.split("-")[1]) % 10 == 0 for doc_id, _ in results))
+        scores = [score for _, score in results]
+        self.assertEqual(scores, sorted(scores, reverse=True))
+
+    def test_empty_columns_and_empty_mask(self):
+        columns = MetadataColumns()
+        self.assertEqual(columns.search([1.0, 0.0], k=3), [])
+
+        columns.add("doc-0", metadata(), [], [1.0, 0.0])
+        self.assertEqual(columns.search([1.0, 0.0], k=3, mask=np.zeros(1, dtype=bool)), [])
+
+    def test_selective_filter_is_faster_than_unfiltered_scan(self):
+        columns, _ = self.fill(20000, 256)
+        query = self.rng.standard_normal(256)
+        mask = columns.mask(MetadataFilter(file_types=("png",)))
+
+        def best_time(**kwargs):
+            times = []
+            for _ in range(5):
+                start = time.perf_counter()
+                columns.search(query, k=10, **kwargs)
+                times.append(time.perf_counter() - start)
+            return min(times)
+
+        unfiltered = best_time()
+        filtered = best_time(mask=mask)
+        self.assertLess(filtered, unfiltered)
+
+
+def isolate_image_store(test):
+    """Give ImageStore empty indexes and caches for the duration of a test."""
+    patches = [
+        patch.object(ImageStore, "metadata_columns", MetadataColumns()),
+        patch.object(ImageStore, "keyword_index", KeywordIndex()),
+        patch.object(ImageStore, "document_ids_to_images", {}),
+        patch.object(ImageStore, "document_ids_to_documents", {}),
+        patch.object(ImageStore, "query_embedding_cache", LRUCache(maxsize=8)),
+        patch.object(ImageStore, "result_cache", LRUCache(maxsize=8)),
+    ]
+    for p in patches:
+        p.start()
+        test.addCleanup(p.stop)
+
+
+class TestImageStoreFilteredSearch(unittest.TestCase):
+    def setUp(self):
+        isolate_image_store(self)
+        images = [
+            ("a", "a.jpg", "a dog on the beach", [1.0, 0.0, 0.0], "jpg"),
+            ("b", "b.png", "a dog in the snow", [0.9, 0.1, 0.0], "png"),
+            ("c", "c.png", "a cat on a sofa", [0.0, 1.0, 0.0], "png"),
+        ]
+        for doc_id, file_name, description, embedding, file_type in images:
+            ImageStore._add_described_image(doc_id, file_name, description, embedding, metadata(file_type))
+        # Seed the cache so no embedding model is called
+        ImageStore.query_embedding_cache.put("dog pictures", [1.0, 0.0, 0.0])
+
+    def test_filter_applies_before_ranking(self):
+        unfiltered = ImageStore.retrieve_docs_by_query("dog pictures", k=1)
+        filtered = ImageStore.retrieve_docs_by_query("dog pictures", k=1, filters=MetadataFilter(file_types=("png",)))
+
+        self.assertEqual(unfiltered[0].id, "a")
+        self.assertEqual(filtered[0].id, "b")
+
+    def test_filter_without_matches_returns_nothing(self):
+        results = ImageStore.retrieve_docs_by_query("dog pictures", k=3, filters=MetadataFilter(file_types=("gif",)))
+        self.assertEqual(results, [])
+
+
+class TestKeywordFastPath(unittest.TestCase):
+    def setUp(self):
+        isolate_image_store(self)
+        embeddings = MagicMock()
+        embeddings.embed_query.return_value = [1.0, 0.0]
+        self.embed_query = embeddings.embed_query
+        embeddings_patch = patch.object(ImageStore, "embeddings", embeddings)
+        embeddings_patch.start()
+        self.addCleanup(embeddings_patch.stop)
+
+    def add(self, doc_id, description, embedding):
+        ImageStore._add_described_image(doc_id, f"{doc_id}.jpg", description, embedding, metadata())
+
+    def test_fewer_keyword_hits_than_k_fall_back_to_hybrid(self):
+        """A rare term with fewer than k literal matches still returns related images."""
+        self.add("river", "A wild animal drinking from a river.", [0.9, 0.1])
+        for i, description in enumerate(["A tiger in tall grass.", "A dog on a beach.", "A cat on a sofa.",
+                                         "A horse in a field."]):
+            self.add(f"pet-{i}", description, [1.0, 0.05 * i])
+        for i in range(5):
+            self.add(f"fruit-{i}", f"A bowl of fruit number {i}.", [0.0, 1.0])
+
+        results = ImageStore.retrieve_docs_by_query("animals", k=5)
+
+        self.embed_query.assert_called_once_with("animals")
+        self.assertEqual(len(results), 5)
+        self.assertEqual({doc.id for doc in results}, {"river", "pet-0", "pet-1", "pet-2", "pet-3"})
+
+    def test_selective_term_with_k_hits_skips_embedding(self):
+        """A term found in few descriptions, but at least k of them, is answered by BM25 alone."""
+        for i in range(3):
+            self.add(f"tiger-{i}", f"A tiger resting, shot {i}.", [1.0, 0.0])
+        for i in range(27):
+            self.add(f"other-{i}", f"A mountain landscape, shot {i}.", [0.0, 1.0])
+
+        results = ImageStore.retrieve_docs_by_query("tiger", k=3)
+
+        self.embed_query.assert_not_called()
+        self.assertEqual({doc.id for doc in results}, {"tiger-0", "tiger-1", "tiger-2"})
+
+    def test_common_term_uses_hybrid_search(self):
+        """A term in more than the allowed share of descriptions is not answered from keywords."""
+        for i in range(10):
+            self.add(f"doc-{i}", f"A mountain {'lake' if i < 3 else 'peak'}.", [1.0, 0.0])
+
+        ImageStore.retrieve_docs_by_query("lake", k=2)
+
+        self.embed_query.assert_called_once()
+
+
+
+class TestDownscaleImage(unittest.TestCase):
+    def encoded(self, size, format="PNG"):
+        output = io.BytesIO()
+        Image.effect_noise(size, 50).convert("RGB").save(output, format=format)
+        return memoryview(output.getbuffer())
+
+    def test_small_image_is_returned_without_copy(self):
+        buffer = self.encoded((600, 400))
+
+        tracemalloc.start()
+        result = ImageStore._downscale_image(buffer, 672)
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+
+        self.assertIs(result, buffer)
+        self.assertLess(peak, len(buffer) // 10)
+
+    def test_large_image_is_shrunk(self):
+        for format in ("PNG", "JPEG"):
+            with self.subTest(format=format):
+                result = ImageStore._downscale_image(self.encoded((1500, 1000), format), 672)
+                self.assertEqual(Image.open(io.BytesIO(result)).size, (672, 448))
+
+
+if __name__ == "__main__":
+    unittest.main()
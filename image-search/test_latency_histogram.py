@@ -0,0 +1,81 @@
+import os
+import shutil
+import tempfile
+import unittest
+
+from latency_histogram import HistogramRegistry
+from logger import ImageSearchLogger
+
+
+class TestHistogramRegistry(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.directory, ignore_errors=True)
+
+    def registry(self, name):
+        registry = HistogramRegistry(os.path.join(self.directory, f"{name}-latency.json"))
+        self.addCleanup(registry.close)
+        return registry
+
+    def test_summaries_merge_other_process_snapshots(self):
+        app = self.registry("app")
+        worker = self.registry("worker")
+        app.record("image_upload", 0.1)
+        worker.record("image_upload", 0.3, success=False)
+        worker.record("image_description_generation", 2.0)
+        worker.snapshot()
+
+        summaries = app.summaries(other_snapshots=[worker.snapshot_path])
+
+        self.assertEqual(summaries["image_upload"]["count"], 2)
+        self.assertEqual(summaries["image_upload"]["error_rate"], 0.5)
+        self.assertAlmostEqual(summaries["image_upload"]["max"], 0.3)
+        self.assertEqual(summaries["image_description_generation"]["count"], 1)
+        # The app's own histograms are not changed by the merge
+        self.assertEqual(app.summaries()["image_upload"]["count"], 1)
+
+    def test_missing_snapshot_is_ignored(self):
+        app = self.registry("app")
+        app.record("image_search_query", 0.1)
+
+        summaries = app.summaries(other_snapshots=[os.path.join(self.directory, "missing.json")])
+
+        self.assertEqual(list(summaries), ["image_search_query"])
+
+
+class TestProfilingSettings(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory, True)
+
+    def logger(self, name):
+        logger = ImageSearchLogger(
+            log_file=os.path.join(self.directory, f"{name}.log"),
+            timing_log_file=os.path.join(self.directory, f"{name}-timing.jsonl"),
+            latency_snapshot_file=os.path.join(self.directory, f"{name}-latency.json"),
+            rollup_db_file=os.path.join(self.directory, "rollups.sqlite"),
+            profiling_settings_file=os.path.join(self.directory, "profiling-settings.json"),
+        )
+        self.addCleanup(logger.metrics_sink.close)
+        self.addCleanup(logger.latency_metrics.close)
+        return logger
+
+    def test_settings_reach_other_processes(self):
+        app = self.logger("app")
+        worker = self.logger("worker")
+        self.assertFalse(worker.profiler.enabled)
+
+        app.configure_profiling(functions=["image_description_generation"], sample_rate=0.1, mode="sampler")
+        worker.sync_profiling_settings()
+
+        self.assertEqual(worker.profiler.functions, {"image_description_generation"})
+        self.assertEqual(worker.profiler.sample_rate, 0.1)
+        self.assertEqual(worker.profiler.mode, "sampler")
+        # A logger started later picks up the saved settings too
+        self.assertEqual(self.logger("later").profiler.functions, {"image_description_generation"})
+
+
+if __name__ == "__main__":
+    unittest.main()
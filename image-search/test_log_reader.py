@@ -0,0 +1,55 @@
+import json
+import os
+import shutil
+import tempfile
+import unittest
+
+from log_reader import TIMING_COLUMNS, recent_timings, tail_lines
+
+
+def line(i, status="SUCCESS"):
+    entry = {"timestamp": f"2026-01-01T00:00:{i:02d}", "function": "f", "duration": i / 10, "status": status}
+    return json.dumps(entry) + "\n"
+
+
+class TestRecentTimings(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.log_path = os.path.join(self.directory, "timing.jsonl")
+
+    def tearDown(self):
+        shutil.rmtree(self.directory, ignore_errors=True)
+
+    def test_returns_last_records_oldest_first(self):
+        with open(self.log_path, "w") as f:
+            f.write("".join(line(i) for i in range(50)))
+
+        df = recent_timings(self.log_path, 3)
+
+        self.assertEqual(list(df["Execution Time (s)"]), [4.7, 4.8, 4.9])
+        self.assertEqual(str(df["Timestamp"].dtype)[:10], "datetime64")
+        self.assertEqual(os.listdir(self.directory), ["timing.jsonl"])
+
+    def test_malformed_and_partial_lines_are_skipped(self):
+        with open(self.log_path, "w") as f:
+            f.write(line(0) + "not json\n" + line(1) + '{"timestamp": "2026')
+
+        self.assertEqual(list(recent_timings(self.log_path, 4)["Execution Time (s)"]), [0.0, 0.1])
+
+    def test_missing_log_gives_empty_frame(self):
+        df = recent_timings(self.log_path, 20)
+        self.assertTrue(df.empty)
+        self.assertEqual(list(df.columns), TIMING_COLUMNS)
+
+
+class TestTailLines(unittest.TestCase):
+    def test_returns_last_lines_oldest_first(self):
+        with tempfile.NamedTemporaryFile("w", delete=False) as f:
+            f.write("".join(f"line {i}\n" for i in range(100)))
+        self.addCleanup(os.remove, f.name)
+
+        self.assertEqual(tail_lines(f.name, 3, block_size=16), ["line 97", "line 98", "line 99"])
+
+
+if __name__ == "__main__":
+    unittest.main()
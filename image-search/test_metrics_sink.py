@@ -0,0 +1,112 @@
+import json
+import os
+import shutil
+import tempfile
+import threading
+import unittest
+
+from metrics_sink import MetricsSink
+
+
+def entry(i):
+    return {"i": i, "timestamp": "2026-01-01T00:00:00", "function": "f", "duration": 0.1, "success": True}
+
+
+class TestMetricsSink(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.path = os.path.join(self.directory, "timing.jsonl")
+
+    def tearDown(self):
+        shutil.rmtree(self.directory, ignore_errors=True)
+
+    def written_ids(self):
+        ids = []
+        for name in os.listdir(self.directory):
+            with open(os.path.join(self.directory, name)) as f:
+                ids.extend(json.loads(line)["i"] for line in f)
+        return ids
+
+    def test_concurrent_flushes_with_rotation_write_every_record_once(self):
+        sink = MetricsSink(self.path, flush_interval=10, max_bytes=4000, backup_count=1000)
+        self.addCleanup(sink.close)
+
+        def produce(start):
+            for i in range(start, start + 500):
+                sink.record(entry(i))
+                if i % 25 == 0:
+                    sink.flush()
+
+        threads = [threading.Thread(target=produce, args=(n * 500,)) for n in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertTrue(sink.flush())
+
+        self.assertEqual(sorted(self.written_ids()), list(range(2000)))
+        self.assertEqual(sink.stats()["written"], 2000)
+        self.assertEqual(sink.stats()["write_errors"], 0)
+
+    def test_failed_write_is_requeued(self):
+        path = os.path.join(self.directory, "sub", "timing.jsonl")
+        sink = MetricsSink(path, flush_interval=10)
+        self.addCleanup(sink.close)
+        shutil.rmtree(os.path.dirname(path))
+
+        for i in range(3):
+            sink.record(entry(i))
+        sink.flush()
+        self.assertEqual(sink.stats(), {"written": 0, "dropped": 0, "pending": 3, "write_errors": 1,
+                                        "callback_errors": 0})
+
+        os.makedirs(os.path.dirname(path))
+        sink.flush()
+        self.assertEqual(sink.stats()["written"], 3)
+        self.assertEqual(sink.stats()["pending"], 0)
+
+    def test_on_batch_runs_on_writer_thread_and_is_retried(self):
+        calls = []
+        failures = [RuntimeError("database is locked")]
+
+        def on_batch(batch):
+            if failures:
+                raise failures.pop()
+            calls.append((threading.current_thread().name, [record["i"] for record in batch]))
+
+        sink = MetricsSink(self.path, flush_interval=10, on_batch=on_batch)
+        self.addCleanup(sink.close)
+        sink.record(entry(0))
+        sink.flush()
+        self.assertEqual(sink.stats()["callback_errors"], 1)
+        self.assertEqual(self.written_ids(), [0])
+
+        sink.record(entry(1))
+        sink.flush()
+        self.assertEqual(calls, [("MetricsSinkWriter", [0]), ("MetricsSinkWriter", [1])])
+        self.assertEqual(sorted(self.written_ids()), [0, 1])
+
+    def test_close_writes_remaining_records(self):
+        batches = []
+        sink = MetricsSink(self.path, flush_interval=10, on_batch=batches.append)
+        sink.record(entry(0))
+        sink.close()
+
+        self.assertEqual(self.written_ids(), [0])
+        self.assertEqual(len(batches), 1)
+        self.assertFalse(sink.flush())
+
+    def test_requeue_beyond_capacity_counts_dropped(self):
+        sink = MetricsSink(self.path, capacity=4, flush_interval=10)
+        self.addCleanup(sink.close)
+        for i in range(3):
+            sink.record(entry(10 + i))
+
+        sink._requeue([entry(i) for i in range(3)])
+
+        self.assertEqual(sink.stats()["dropped"], 2)
+        self.assertEqual([record["i"] for record in sink._buffer], [2, 10, 11, 12])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -1,10 +1,34 @@
 import streamlit as st
+import os
 import time
 from typing import List, Optional
 import base64
 from io import BytesIO
 from PIL import Image
 
+# Longest edge of the thumbnails shown in image cards
+THUMBNAIL_SIZE = 300
+
+
+@st.cache_data(max_entries=512, show_spinner=False)
+def load_thumbnail(image_path: str, mtime: float, size: int = THUMBNAIL_SIZE) -> bytes:
+    """
+    Decode an image and return an encoded thumbnail of it.
+
+    The modification time is part of the cache key, so a file replaced on
+    disk is decoded again instead of showing a stale thumbnail.
+    """
+    image = Image.open(image_path)
+    image.draft("RGB", (size, size))  # Let JPEG decode at reduced scale
+    image.thumbnail((size, size))
+    if image.mode not in ("RGB", "L"):
+        image = image.convert("RGB")
+
+    output = BytesIO()
+    image.save(output, format="JPEG", quality=85)
+    return output.getvalue()
+
+
 class UIComponents:
     
     @staticmethod
@@ -54,20 +78,30 @@ class UIComponents:
         """, unsafe_allow_html=True)
     
     @staticmethod
-    def create_image_card(image_path: str, caption: str, similarity_score: Optional[float] = None, doc_id: Optional[str] = None):
-        """Create an enhanced image card with zoom functionality"""
+    def get_thumbnail(image_path: str) -> bytes:
+        """Cached thumbnail for an image file, refreshed when the file changes"""
+        return load_thumbnail(image_path, os.path.getmtime(image_path))
+    
+    @staticmethod
+    def create_image_card(image_path: str, caption: str, similarity_score: Optional[float] = None,
+                          doc_id: Optional[str] = None, key_prefix: str = ""):
+        """
+        Create an enhanced image card with zoom functionality.
+        
+        Widget keys are derived from doc_id (or the image path), so they stay
+        the same across reruns and button clicks are registered. Pass a
+        key_prefix when the same image is shown more than once on a page.
+        """
+        card_key = f"{key_prefix}{doc_id or image_path}"
         col1, col2 = st.columns([1, 2])
         
         with col1:
             # Create thumbnail
             try:
-                image = Image.open(image_path)
-                # Resize for thumbnail
-                image.thumbnail((300, 300))
-                st.image(image, use_container_width=True)
+                st.image(UIComponents.get_thumbnail(image_path), use_container_width=True)
                 
                 # Zoom button
-                if st.button(f"🔍 Zoom", key=f"zoom_{doc_id}_{time.time()}"):
+                if st.button(f"🔍 Zoom", key=f"zoom_{card_key}"):
                     UIComponents.show_image_modal(image_path)
                     
             except Exception as e:
@@ -88,15 +122,15 @@ class UIComponents:
             col_a, col_b, col_c = st.columns(3)
             
             with col_a:
-                if doc_id and st.button("⭐ Favorite", key=f"fav_{doc_id}_{time.time()}"):
+                if doc_id and st.button("⭐ Favorite", key=f"fav_{card_key}"):
                     UIComponents.add_to_favorites(doc_id, image_path, caption)
             
             with col_b:
-                if st.button("📋 Copy", key=f"copy_{doc_id}_{time.time()}"):
+                if st.button("📋 Copy", key=f"copy_{card_key}"):
                     st.write("Caption copied to clipboard!")
             
             with col_c:
-                if st.button("📤 Share", key=f"share_{doc_id}_{time.time()}"):
+                if st.button("📤 Share", key=f"share_{card_key}"):
                     st.write("Share functionality coming soon!")
             
             st.markdown('</div>', unsafe_allow_html=True)
@@ -17,90 +17,92 @@ uploaded_files = UIComponents.show_upload_area(
     multiple=True
 )
 
+# Bring in images the background worker finished since the last rerun
+ImageStore.sync_completed_jobs()
+
+# Jobs queued from this session, keyed by uploaded file. The uploader returns
+# the same files on every rerun, so each file is only queued once.
+if 'upload_jobs' not in st.session_state:
+    st.session_state.upload_jobs = {}
+
+@st.fragment(run_every=2)
+def show_job_status():
+    """Poll the job queue and show the state of this session's uploads."""
+    ImageStore.sync_completed_jobs()
+    jobs = ImageStore.job_queue.jobs(st.session_state.upload_jobs.values())
+
+    done = [job for job in jobs if job['status'] == 'done']
+    failed = [job for job in jobs if job['status'] == 'failed']
+    waiting = len(jobs) - len(done) - len(failed)
+
+    col1, col2, col3, col4 = st.columns(4)
+    with col1:
+        st.metric("Total Files", len(jobs))
+    with col2:
+        st.metric("Searchable", len(done))
+    with col3:
+        st.metric("Pending", waiting)
+    with col4:
+        st.metric("Errors", len(failed), delta=-len(failed) if failed else None)
+
+    if jobs:
+        st.progress((len(done) + len(failed)) / len(jobs))
+
+    status_icons = {"pending": "⏳", "running": "⚙️", "done": "✅", "failed": "❌"}
+    for job in jobs:
+        if job['status'] == 'done':
+            with st.expander(f"{status_icons['done']} {job['file_name']}"):
+                UIComponents.create_image_card(
+                    image_path=ImageStore.get_image_path_by_id(job['doc_id']),
+                    caption=job['description'],
+                    doc_id=job['doc_id']
+                )
+        elif job['status'] == 'failed':
+            UIComponents.show_error_message(f"Failed to process {job['file_name']}: {job['error']}")
+        else:
+            st.text(f"{status_icons[job['status']]} {job['file_name']} - {job['status']}")
+
+    if failed and st.button("🔁 Retry failed images"):
+        requeued = ImageStore.job_queue.retry_failed()
+        app_logger.log_info(f"Requeued {requeued} failed description job(s)")
+        ImageStore.ensure_worker()
+
 if uploaded_files:
     # Ensure uploaded_files is a list
     if not isinstance(uploaded_files, list):
         uploaded_files = [uploaded_files]
     
-    # Log the upload batch start
-    app_logger.log_info(f"Starting batch upload of {len(uploaded_files)} images")
-    batch_start_time = time.time()
-    
     # Show image previews
     UIComponents.show_image_preview_grid(uploaded_files)
     
-    # Process uploaded files
+    # Queue new files; descriptions are generated by the background worker
+    new_files = [
+        uploaded_file for uploaded_file in uploaded_files
+        if uploaded_file.file_id not in st.session_state.upload_jobs
+    ]
+    if new_files:
+        app_logger.log_info(f"Queueing batch upload of {len(new_files)} images")
+        batch_start_time = time.time()
+        
+        for uploaded_file in new_files:
+            try:
+                job = ImageStore.enqueue_image(uploaded_file)
+                st.session_state.upload_jobs[uploaded_file.file_id] = job['id']
+            except Exception as e:
+                app_logger.log_error(f"Failed to queue image: {uploaded_file.name}", e)
+                UIComponents.show_error_message(f"Failed to queue {uploaded_file.name}: {str(e)}")
+        
+        batch_execution_time = time.time() - batch_start_time
+        app_logger.log_info(f"Queued {len(new_files)} images in {batch_execution_time:.4f} seconds")
+
+if st.session_state.upload_jobs:
     st.markdown("---")
     st.markdown("### Processing Images")
-    
-    total_files = len(uploaded_files)
-    success_count = 0
-    error_count = 0
-    
-    # Create containers for progress and results
-    progress_container = st.container()
-    results_container = st.container()
-    
-    for i, uploaded_file in enumerate(uploaded_files):
-        # Show progress
-        with progress_container:
-            UIComponents.show_batch_upload_progress(total_files, i + 1, uploaded_file.name)
-        
-        file_start_time = time.time()
-        try:
-            # Upload and process the image
-            with st.spinner(f"Processing {uploaded_file.name}..."):
-                doc_id = ImageStore.upload_image(uploaded_file)
-                document = ImageStore.get_by_id(doc_id)
-                image_path = ImageStore.get_image_path_by_id(doc_id)
-                
-                file_execution_time = time.time() - file_start_time
-                success_count += 1
-                
-                app_logger.log_info(f"Successfully processed image {i+1}/{total_files}: {uploaded_file.name} in {file_execution_time:.4f} seconds")
-                
-                # Show result in results container
-                with results_container:
-                    st.markdown(f"#### ✅ {uploaded_file.name}")
-                    UIComponents.create_image_card(
-                        image_path=image_path,
-                        caption=document.page_content,
-                        doc_id=doc_id
-                    )
-                    st.markdown("---")
-                
-        except Exception as e:
-            file_execution_time = time.time() - file_start_time
-            error_count += 1
-            app_logger.log_error(f"Failed to process image {i+1}/{total_files}: {uploaded_file.name} after {file_execution_time:.4f} seconds", e)
-            with results_container:
-                UIComponents.show_error_message(f"Failed to process {uploaded_file.name}: {str(e)}")
-    
-    # Log batch completion
-    batch_execution_time = time.time() - batch_start_time
-    app_logger.log_info(f"Batch upload completed: {success_count} successful, {error_count} failed in {batch_execution_time:.4f} seconds")
-    
-    # Clear progress bar when done
-    progress_container.empty()
-    
-    # Show final summary
-    st.markdown("### Upload Summary")
-    col1, col2, col3 = st.columns(3)
-    
-    with col1:
-        st.metric("Total Files", total_files)
-    with col2:
-        st.metric("Successful", success_count, delta=success_count if success_count > 0 else None)
-    with col3:
-        st.metric("Errors", error_count, delta=-error_count if error_count > 0 else None)
-    
-    if success_count > 0:
-        UIComponents.show_success_message(f"Successfully uploaded {success_count} image(s)!")
-    
-    if error_count > 0:
-        UIComponents.show_error_message(f"{error_count} image(s) failed to upload. Please try again.")
+    st.caption("Images are described in the background and become searchable as each one finishes. "
+               "You can leave this page; processing continues, even across app restarts.")
+    show_job_status()
 
-else:
+if not uploaded_files:
     # Show upload instructions when no files are selected
     st.markdown("""
     ### Getting Started
@@ -0,0 +1,116 @@
+"""
+Scheduler for batch summarization.
+
+Frame extraction is CPU-bound and runs in a process pool; summarization is
+bound by the model server and runs in a small thread pool. The scheduler
+keeps both busy at once, so the frames of the next videos are extracted
+while the model is summarizing the current ones.
+
+This module has no Streamlit dependency; the app passes callbacks for
+progress updates.
+"""
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+from video_frames import process_pool
+
+JOB_STATUSES = ["queued", "extracting", "waiting for model", "summarizing", "done", "failed"]
+
+
+def _summarize_job(summarize, frames):
+    start = time.time()
+    summary = summarize(frames)
+    return summary, time.time() - start
+
+
+def run_batch(jobs, extract, summarize, extraction_workers=2, inference_concurrency=1, on_update=None):
+    """
+    Extract and summarize a batch of videos.
+
+    Args:
+        jobs: List of job dicts with a "path" key; they are updated in place
+            with "status", "frames_count", "duplicates_removed", "summary",
+            "error" and the timings "extract_seconds", "summarize_seconds"
+            and "finished_after" (seconds since the batch started)
+        extract: Picklable function(path) returning the dict of
+            video_frames.extract_video; runs in the process pool
+        summarize: Function(frames) returning the summary; runs in a thread
+        extraction_workers: Videos extracted at the same time
+        inference_concurrency: Summaries requested from the model at the same time
+        on_update: Optional callback(job), called from the calling thread
+            whenever a job changes status
+
+    Extraction runs at most extraction_workers videos ahead of the model, so
+    a slow model does not make the frames of the whole batch pile up in memory.
+
+    Returns:
+        Dict with the batch "wall_seconds", the number of jobs "done" and
+        "failed", and the throughput in "videos_per_hour".
+    """
+    notify = on_update or (lambda job: None)
+    batch_start = time.time()
+    queued = deque(jobs)
+    ready = deque()
+    running = {}  # future -> (stage, job)
+
+    def update(job, **changes):
+        job.update(changes)
+        if job["status"] in ("done", "failed"):
+            job["finished_after"] = time.time() - batch_start
+        notify(job)
+
+    for job in jobs:
+        update(job, status="queued")
+
+    def stage_count(stage):
+        return sum(1 for running_stage, _ in running.values() if running_stage == stage)
+
+    with process_pool(extraction_workers) as extract_pool, \
+            ThreadPoolExecutor(max_workers=inference_concurrency) as model_pool:
+
+        def schedule():
+            while ready and stage_count("summarize") < inference_concurrency:
+                job = ready.popleft()
+                running[model_pool.submit(_summarize_job, summarize, job.pop("frames"))] = ("summarize", job)
+                update(job, status="summarizing")
+            while queued and stage_count("extract") < extraction_workers and len(ready) < extraction_workers:
+                job = queued.popleft()
+                running[extract_pool.submit(extract, job["path"])] = ("extract", job)
+                update(job, status="extracting")
+
+        schedule()
+        while running:
+            done, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in done:
+                stage, job = running.pop(future)
+                try:
+                    if stage == "extract":
+                        result = future.result()
+                        job.update(
+                            extract_seconds=result["seconds"],
+                            frames_count=len(result["frames"]),
+                            duplicates_removed=result["duplicates_removed"],
+                        )
+                        if not result["frames"]:
+                            update(job, status="failed", error="No frames extracted")
+                            continue
+                        job["frames"] = result["frames"]
+                        ready.append(job)
+                        update(job, status="waiting for model")
+                    else:
+                        summary, seconds = future.result()
+                        update(job, status="done", summary=summary, summarize_seconds=seconds)
+                except Exception as e:
+                    job.pop("frames", None)
+                    update(job, status="failed", error=str(e))
+            schedule()
+
+    wall_seconds = time.time() - batch_start
+    done_count = sum(1 for job in jobs if job["status"] == "done")
+    return {
+        "wall_seconds": wall_seconds,
+        "done": done_count,
+        "failed": len(jobs) - done_count,
+        "videos_per_hour": done_count * 3600 / wall_seconds if wall_seconds > 0 else 0.0,
+    }
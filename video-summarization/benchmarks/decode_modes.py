@@ -0,0 +1,96 @@
+"""
+Benchmark seek vs sequential-scan frame extraction.
+
+Times video_frames.read_targets in "seek", "scan" and "auto" mode for a
+range of sampling intervals, and the same extraction split over several
+processes with extract_targets_parallel. Pass real long MKV/MP4 files, or let the script
+generate synthetic ones with a long GOP:
+
+    python -m benchmarks.decode_modes videos/test01.mkv videos/test02.mp4
+    python -m benchmarks.decode_modes --seconds 600 --gop 250 --workers 4
+"""
+import argparse
+import json
+import os
+import tempfile
+import time
+
+import cv2
+
+from benchmarks.synthetic_video import write_synthetic_video
+from video_frames import choose_decode_mode, extract_targets_parallel, plan_targets, read_targets
+
+
+def time_extraction(video_path, interval_seconds, mode, max_frames, workers=1):
+    """
+    Seconds taken to extract up to max_frames frames, the mode actually used
+    and the number of frames extracted. With workers > 1 the frames are also
+    JPEG-encoded, as the app does before writing them.
+    """
+    video = cv2.VideoCapture(video_path)
+    fps = int(video.get(cv2.CAP_PROP_FPS))
+    frames_count = int(video.get(cv2.CAP_PROP_FRAME_COUNT))
+    step = fps * interval_seconds
+
+    start = time.perf_counter()
+    if mode == "auto":
+        mode = f"auto->{choose_decode_mode(video, frames_count, step)}"
+    used_mode = mode.split("->")[-1]
+    targets = plan_targets(frames_count, step, max_frames)
+    if workers > 1:
+        video.release()
+        extracted = len(extract_targets_parallel(video_path, targets, used_mode, workers))
+        mode = f"{mode} x{workers}"
+    else:
+        extracted = sum(1 for _, frame in read_targets(video, targets, used_mode) if frame is not None)
+        video.release()
+    elapsed = time.perf_counter() - start
+    return elapsed, mode, extracted
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark seek vs scan frame extraction.")
+    parser.add_argument("videos", nargs="*", help="Video files to benchmark (default: generate synthetic ones)")
+    parser.add_argument("--intervals", type=int, nargs="+", default=[1, 2, 5, 15, 30],
+                        help="Sampling intervals in seconds")
+    parser.add_argument("--max-frames", type=int, default=50, help="Frames to extract per run")
+    parser.add_argument("--seconds", type=int, default=300, help="Length of generated videos")
+    parser.add_argument("--gop", type=int, default=250, help="Keyframe interval of generated videos")
+    parser.add_argument("--workers", type=int, nargs="+", default=[1],
+                        help="Process counts to compare (1 = sequential in this process)")
+    parser.add_argument("--json", help="Also write the results to this JSON file")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        videos = args.videos
+        if not videos:
+            videos = [os.path.join(directory, f"synthetic{extension}") for extension in (".mp4", ".mkv")]
+            for path in videos:
+                write_synthetic_video(path, seconds=args.seconds, key_interval=args.gop)
+
+        results = []
+        print(f"{'Video':<24}{'Interval':>9}{'Mode':>18}{'Frames':>8}{'Seconds':>10}")
+        for path in videos:
+            for interval in args.intervals:
+                for workers in args.workers:
+                    for mode in ("seek", "scan", "auto"):
+                        elapsed, used_mode, extracted = time_extraction(
+                            path, interval, mode, args.max_frames, workers
+                        )
+                        results.append({
+                            "video": os.path.basename(path),
+                            "interval_seconds": interval,
+                            "mode": used_mode,
+                            "workers": workers,
+                            "frames": extracted,
+                            "seconds": round(elapsed, 4),
+                        })
+                        print(f"{os.path.basename(path):<24}{interval:>8}s{used_mode:>18}{extracted:>8}{elapsed:>10.3f}")
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,129 @@
+"""
+Local stand-in for the Ollama HTTP API.
+
+Serves /api/generate (the endpoint OllamaLLM calls) with a canned response
+after a configurable delay, so the summarization pipeline can be timed
+without a GPU or a model. The delay is latency plus per_image_latency for
+every image in the request, a rough model of vision-model prefill cost.
+Every request is recorded, so benchmarks can report request counts,
+payload sizes and peak concurrency.
+
+    with FakeOllamaServer(latency=0.5, per_image_latency=0.1) as server:
+        model = OllamaLLM(model="gemma3:27b", base_url=server.url)
+"""
+import base64
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+class FakeOllamaServer:
+    def __init__(self, latency=0.5, per_image_latency=0.0, response="A synthetic summary of the video frames.",
+                 host="127.0.0.1", port=0):
+        self.latency = latency
+        self.per_image_latency = per_image_latency
+        self.response = response
+        self.requests = []
+        self.active = 0
+        self.peak_concurrency = 0
+        self._lock = threading.Lock()
+        self._server = ThreadingHTTPServer((host, port), self._handler())
+        self._server.daemon_threads = True
+        self._thread = None
+
+    @property
+    def url(self):
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self):
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+        self._thread.join()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc_info):
+        self.stop()
+
+    def reset(self):
+        """Forget recorded requests, e.g. between benchmark runs."""
+        with self._lock:
+            self.requests = []
+            self.peak_concurrency = 0
+
+    def _generate(self, body):
+        images = body.get("images") or []
+        with self._lock:
+            self.active += 1
+            self.peak_concurrency = max(self.peak_concurrency, self.active)
+        try:
+            delay = self.latency + self.per_image_latency * len(images)
+            time.sleep(delay)
+        finally:
+            with self._lock:
+                self.active -= 1
+                self.requests.append({
+                    "images": len(images),
+                    "image_bytes": sum(len(base64.b64decode(image)) for image in images),
+                    "prompt_chars": len(body.get("prompt", "")),
+                    "delay": delay,
+                })
+        return {
+            "model": body.get("model"),
+            "created_at": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+            "response": self.response,
+            "done": True,
+            "done_reason": "stop",
+            "total_duration": int(delay * 1e9),
+        }
+
+    def _handler(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def _send_json(self, data, status=200):
+                payload = json.dumps(data).encode()
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(payload)))
+                self.end_headers()
+                self.wfile.write(payload)
+
+            def do_GET(self):
+                if self.path == "/api/tags":
+                    self._send_json({"models": []})
+                elif self.path == "/api/version":
+                    self._send_json({"version": "0.0.0-fake"})
+                else:
+                    self._send_json({"error": "not found"}, 404)
+
+            def do_POST(self):
+                if self.path != "/api/generate":
+                    self._send_json({"error": "not found"}, 404)
+                    return
+                length = int(self.headers.get("Content-Length", 0))
+                body = json.loads(self.rfile.read(length) or b"{}")
+                result = server._generate(body)
+                if body.get("stream", True):
+                    # Ollama streams newline-delimited JSON; one chunk is enough
+                    payload = (json.dumps(result) + "\n").encode()
+                    self.send_response(200)
+                    self.send_header("Content-Type", "application/x-ndjson")
+                    self.send_header("Content-Length", str(len(payload)))
+                    self.end_headers()
+                    self.wfile.write(payload)
+                else:
+                    self._send_json(result)
+
+            def log_message(self, format, *args):
+                pass
+
+        return Handler
@@ -0,0 +1,203 @@
+"""
+End-to-end benchmark of the summarization pipeline, fully offline.
+
+Generates synthetic videos (see synthetic_video) for every combination of
+length and resolution, then measures:
+
+- extract_frames: wall time, extracted frames/sec, decoded video frames/sec
+  and peak memory (Python allocations via tracemalloc, and the process's
+  peak RSS where the resource module is available),
+- describe_video: end-to-end latency against a FakeOllamaServer with the
+  given latency, in single-pass and map-reduce mode, with the number of
+  model requests, image payload and peak request concurrency.
+
+Timings are the median of --repeat runs. Results are written as JSON together
+with the commit and library versions, so runs can be compared across commits:
+
+    python -m benchmarks.pipeline --json results/$(git rev-parse --short HEAD).json
+    python -m benchmarks.pipeline --seconds 60 600 --resolution 1280x720 1920x1080 \\
+        --latency 1.0 --per-image-latency 0.2 --repeat 5
+"""
+import argparse
+import json
+import logging
+import os
+import platform
+import statistics
+import subprocess
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime
+
+import cv2
+from langchain_ollama import OllamaLLM
+
+import video_summary
+from benchmarks.fake_ollama import FakeOllamaServer
+from benchmarks.synthetic_video import write_synthetic_video
+
+try:
+    import resource
+except ImportError:  # Not available on Windows
+    resource = None
+
+
+def git_commit():
+    """Current commit hash, with a -dirty suffix for uncommitted changes, or None."""
+    try:
+        commit = subprocess.run(["git", "rev-parse", "HEAD"], capture_output=True, text=True, check=True).stdout.strip()
+        dirty = subprocess.run(["git", "status", "--porcelain", "--untracked-files=no"],
+                               capture_output=True, text=True, check=True).stdout.strip()
+        return commit + ("-dirty" if dirty else "")
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def max_rss_mb():
+    """Peak resident set size of this process and its finished children, in MiB."""
+    if resource is None:
+        return None
+    # ru_maxrss is in KiB on Linux and bytes on macOS
+    scale = 1 if platform.system() == "Darwin" else 1024
+    peak = max(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+               resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss)
+    return round(peak * scale / 2**20, 1)
+
+
+def bench_extraction(video_path, frames_count, args, sampling):
+    """Time extract_frames over args.repeat runs, then measure its Python memory peak in one more run."""
+    seconds = []
+    for _ in range(args.repeat):
+        start = time.perf_counter()
+        frames = video_summary.extract_frames(video_path, args.interval, sampling, args.decode_mode)
+        seconds.append(time.perf_counter() - start)
+
+    tracemalloc.start()
+    video_summary.extract_frames(video_path, args.interval, sampling, args.decode_mode)
+    peak_python = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+
+    median = statistics.median(seconds)
+    return frames, {
+        "benchmark": "extract_frames",
+        "sampling": sampling,
+        "frames": len(frames),
+        "seconds": round(median, 4),
+        "seconds_all": [round(s, 4) for s in seconds],
+        "frames_per_second": round(len(frames) / median, 2),
+        "video_frames_per_second": round(frames_count / median, 1),
+        "payload_bytes": sum(len(frame["jpeg"]) for frame in frames),
+        "peak_python_mb": round(peak_python / 2**20, 1),
+        "max_rss_mb": max_rss_mb(),
+    }
+
+
+def bench_summary(frames, server, args, mode):
+    """Time describe_video against the fake server over args.repeat runs."""
+    video_summary.summarization_mode = mode
+    seconds = []
+    for _ in range(args.repeat):
+        server.reset()
+        start = time.perf_counter()
+        summary = video_summary.describe_video(frames)
+        seconds.append(time.perf_counter() - start)
+        if summary.startswith("Error:"):
+            raise RuntimeError(summary)
+
+    return {
+        "benchmark": "describe_video",
+        "summarization_mode": mode,
+        "frames": len(frames),
+        "seconds": round(statistics.median(seconds), 4),
+        "seconds_all": [round(s, 4) for s in seconds],
+        "model_requests": len(server.requests),
+        "model_seconds": round(sum(request["delay"] for request in server.requests), 4),
+        "image_bytes": sum(request["image_bytes"] for request in server.requests),
+        "peak_concurrency": server.peak_concurrency,
+    }
+
+
+def parse_resolution(value):
+    width, height = value.lower().split("x")
+    return int(width), int(height)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark frame extraction and summarization offline.")
+    parser.add_argument("--seconds", type=int, nargs="+", default=[60, 300], help="Lengths of the generated videos")
+    parser.add_argument("--resolution", type=parse_resolution, nargs="+", default=[(1280, 720)],
+                        help="Resolutions of the generated videos, as WIDTHxHEIGHT")
+    parser.add_argument("--fps", type=int, default=30, help="Frame rate of the generated videos")
+    parser.add_argument("--scene-seconds", type=float, default=10, help="Length of each scene (scene cut interval)")
+    parser.add_argument("--format", default=".mp4", choices=[".mp4", ".mkv", ".avi"], help="Container to write")
+    parser.add_argument("--sampling", nargs="+", default=["interval", "scene"], choices=["interval", "scene"])
+    parser.add_argument("--interval", type=int, default=5, help="Sampling interval in seconds")
+    parser.add_argument("--max-frames", type=int, default=20)
+    parser.add_argument("--decode-mode", default="auto", choices=["auto", "seek", "scan"])
+    parser.add_argument("--workers", type=int, default=1, help="Extraction processes for long videos")
+    parser.add_argument("--modes", nargs="+", default=["Single pass", "Map-reduce"],
+                        choices=["Single pass", "Map-reduce"], help="Summarization modes to time")
+    parser.add_argument("--window-size", type=int, default=8, help="Frames per map-reduce window")
+    parser.add_argument("--model-concurrency", type=int, default=2, help="Parallel model calls")
+    parser.add_argument("--latency", type=float, default=0.5, help="Fake model seconds per request")
+    parser.add_argument("--per-image-latency", type=float, default=0.05, help="Fake model seconds per image")
+    parser.add_argument("--repeat", type=int, default=3, help="Runs per measurement (the median is reported)")
+    parser.add_argument("--json", help="Write the results to this JSON file")
+    args = parser.parse_args()
+
+    # Keep the app's per-frame log lines out of the results table
+    video_summary.logger.setLevel(logging.WARNING)
+    logging.getLogger("httpx").setLevel(logging.WARNING)
+    video_summary.max_frames = args.max_frames
+    video_summary.extraction_workers = args.workers
+    video_summary.window_size = args.window_size
+    video_summary.model_concurrency = args.model_concurrency
+
+    run = {
+        "commit": git_commit(),
+        "created": datetime.now().isoformat(),
+        "python": platform.python_version(),
+        "opencv": cv2.__version__,
+        "cpu_count": os.cpu_count(),
+        "settings": {key: value for key, value in vars(args).items() if key != "json"},
+        "results": [],
+    }
+
+    print(f"{'Video':<24}{'Benchmark':<16}{'Mode':>12}{'Frames':>8}{'Seconds':>10}{'Frames/s':>10}{'Peak MB':>9}")
+    with tempfile.TemporaryDirectory() as directory, \
+            FakeOllamaServer(args.latency, args.per_image_latency) as server:
+        video_summary.model = OllamaLLM(model=video_summary.selected_model, base_url=server.url)
+        for seconds in args.seconds:
+            for width, height in args.resolution:
+                name = f"{seconds}s_{width}x{height}_{args.fps}fps{args.format}"
+                path = os.path.join(directory, name)
+                scene_starts = write_synthetic_video(path, seconds=seconds, fps=args.fps, width=width, height=height,
+                                                     scene_seconds=args.scene_seconds)
+                video = {"video": name, "video_seconds": seconds, "width": width, "height": height,
+                         "fps": args.fps, "scenes": len(scene_starts),
+                         "file_bytes": os.path.getsize(path)}
+
+                for sampling in args.sampling:
+                    frames, result = bench_extraction(path, seconds * args.fps, args, sampling)
+                    run["results"].append({**video, **result})
+                    print(f"{name:<24}{'extract_frames':<16}{sampling:>12}{result['frames']:>8}"
+                          f"{result['seconds']:>10.3f}{result['frames_per_second']:>10.1f}"
+                          f"{result['peak_python_mb']:>9.1f}")
+                    if not frames:
+                        continue
+                    for mode in args.modes:
+                        result = bench_summary(frames, server, args, mode)
+                        run["results"].append({**video, "sampling": sampling, **result})
+                        print(f"{name:<24}{'describe_video':<16}{mode:>12}{result['frames']:>8}"
+                              f"{result['seconds']:>10.3f}{'':>10}{'':>9}")
+
+    if args.json:
+        os.makedirs(os.path.dirname(os.path.abspath(args.json)), exist_ok=True)
+        with open(args.json, "w") as f:
+            json.dump(run, f, indent=2)
+        print(f"Results written to {args.json}")
+
+
+if __name__ == "__main__":
+    main()
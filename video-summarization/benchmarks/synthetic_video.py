@@ -0,0 +1,90 @@
+"""
+Synthetic test videos written with OpenCV.
+
+Each scene has its own background colour and layout with a moving shape,
+so scene detection, deduplication and extraction can be exercised with
+known ground truth and no external files.
+"""
+import cv2
+import numpy as np
+
+try:
+    import av
+except ImportError:  # Optional: only needed to control the GOP length
+    av = None
+
+# fourcc per container that the pip OpenCV builds can write
+DEFAULT_FOURCC = {".mp4": "mp4v", ".mkv": "XVID", ".avi": "MJPG"}
+
+
+def scene_frame(scene, index, width, height):
+    """Frame number index of the given scene."""
+    rng = np.random.default_rng(scene)
+    background = tuple(int(c) for c in rng.integers(0, 256, 3))
+    accent = tuple(int(c) for c in rng.integers(0, 256, 3))
+    frame = np.empty((height, width, 3), dtype=np.uint8)
+    frame[:] = background
+    split = int(width * rng.uniform(0.2, 0.8))
+    frame[:, :split] = accent
+
+    radius = max(4, height // 12)
+    x = radius + (index * 4) % max(1, width - 2 * radius)
+    cv2.circle(frame, (x, height // 2), radius, (255 - background[0], 255 - background[1], 255 - background[2]), -1)
+    cv2.putText(frame, f"{scene}:{index}", (10, height - 10), cv2.FONT_HERSHEY_SIMPLEX,
+                max(0.4, height / 720), (255, 255, 255), 1)
+    return frame
+
+
+def write_synthetic_video(path, seconds=60, fps=30, width=640, height=360,
+                          scene_seconds=10, fourcc=None, key_interval=None):
+    """
+    Write a video of seconds length made of scenes scene_seconds long.
+
+    key_interval sets the GOP length (frames between keyframes); long GOPs
+    make random seeks expensive. OpenCV's writer ignores it, so when it is
+    given and PyAV is installed the video is encoded with H.264 through PyAV
+    instead.
+
+    Returns the frame indices at which scenes start.
+    """
+    total_frames = int(seconds * fps)
+    scene_length = max(1, int(scene_seconds * fps))
+    frames = (
+        scene_frame(index // scene_length, index % scene_length, width, height)
+        for index in range(total_frames)
+    )
+
+    if key_interval and av is not None:
+        _write_with_pyav(path, frames, fps, width, height, key_interval)
+    else:
+        _write_with_opencv(path, frames, fps, width, height, fourcc)
+    return list(range(0, total_frames, scene_length))
+
+
+def _write_with_opencv(path, frames, fps, width, height, fourcc=None):
+    extension = path[path.rfind("."):].lower()
+    codec = fourcc or DEFAULT_FOURCC.get(extension, "mp4v")
+    writer = cv2.VideoWriter(path, cv2.VideoWriter_fourcc(*codec), fps, (width, height))
+    if not writer.isOpened():
+        raise RuntimeError(f"OpenCV cannot write {codec} video to {path}")
+    try:
+        for frame in frames:
+            writer.write(frame)
+    finally:
+        writer.release()
+
+
+def _write_with_pyav(path, frames, fps, width, height, key_interval):
+    with av.open(path, "w") as container:
+        stream = container.add_stream("libx264", rate=fps)
+        stream.width = width
+        stream.height = height
+        stream.pix_fmt = "yuv420p"
+        stream.codec_context.gop_size = key_interval
+        # Disable scene-cut keyframes so the GOP length is exactly key_interval
+        stream.options = {"sc_threshold": "0", "preset": "veryfast"}
+        for frame in frames:
+            for packet in stream.encode(av.VideoFrame.from_ndarray(frame, format="bgr24")):
+                container.mux(packet)
+        for packet in stream.encode():
+            container.mux(packet)
@@ -0,0 +1,117 @@
+"""
+Append-only processing history stored in SQLite.
+
+Each summary is one INSERT, so saving never rewrites earlier entries and
+concurrent sessions cannot overwrite each other's updates (SQLite locks
+the database file for every write). The UI reads only what it shows: the
+last N entries come from the primary key index and the per-model
+statistics are computed by the database, so the history can grow without
+slowing page reruns.
+"""
+import json
+import os
+import sqlite3
+from contextlib import closing
+from datetime import datetime
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS history (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    timestamp TEXT NOT NULL,
+    video_name TEXT NOT NULL,
+    summary TEXT NOT NULL,
+    processing_time REAL NOT NULL,
+    model_used TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS history_model_time ON history (model_used, processing_time);
+"""
+
+COLUMNS = ["timestamp", "video_name", "summary", "processing_time", "model_used"]
+
+
+class ProcessingHistory:
+    def __init__(self, path="processing_history.db", legacy_json="processing_history.json"):
+        self.path = path
+        with closing(self._connect()) as connection, connection:
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.executescript(SCHEMA)
+        if legacy_json and os.path.exists(legacy_json):
+            self.import_json(legacy_json)
+
+    def _connect(self):
+        connection = sqlite3.connect(self.path, timeout=30)
+        connection.row_factory = sqlite3.Row
+        return connection
+
+    def add(self, video_name, summary, processing_time, model_used, timestamp=None):
+        """Append one entry and return it."""
+        entry = {
+            "timestamp": timestamp or datetime.now().isoformat(),
+            "video_name": video_name,
+            "summary": summary,
+            "processing_time": processing_time,
+            "model_used": model_used,
+        }
+        with closing(self._connect()) as connection, connection:
+            connection.execute(
+                f"INSERT INTO history ({', '.join(COLUMNS)}) VALUES ({', '.join('?' * len(COLUMNS))})",
+                [entry[column] for column in COLUMNS],
+            )
+        return entry
+
+    def recent(self, limit=10):
+        """The last limit entries as dicts, most recent first."""
+        with closing(self._connect()) as connection:
+            rows = connection.execute(
+                f"SELECT {', '.join(COLUMNS)} FROM history ORDER BY id DESC LIMIT ?", (limit,)
+            ).fetchall()
+        return [dict(row) for row in rows]
+
+    def totals(self):
+        """Count and min/avg/max processing time over all entries (times are None when empty)."""
+        with closing(self._connect()) as connection:
+            row = connection.execute(
+                "SELECT COUNT(*) AS count, MIN(processing_time) AS min_time, "
+                "AVG(processing_time) AS avg_time, MAX(processing_time) AS max_time FROM history"
+            ).fetchone()
+        return dict(row)
+
+    def model_stats(self):
+        """Per-model count and min/avg/max processing time, most used model first."""
+        with closing(self._connect()) as connection:
+            rows = connection.execute(
+                "SELECT model_used, COUNT(*) AS count, MIN(processing_time) AS min_time, "
+                "AVG(processing_time) AS avg_time, MAX(processing_time) AS max_time "
+                "FROM history GROUP BY model_used ORDER BY count DESC, model_used"
+            ).fetchall()
+        return [dict(row) for row in rows]
+
+    def import_json(self, json_path):
+        """
+        Move the entries of a processing_history.json file written by earlier
+        versions into the database and rename the file to *.imported, so it is
+        imported only once even when several sessions start at the same time.
+        Returns the number of imported entries.
+        """
+        with closing(self._connect()) as connection, connection:
+            # Hold the write lock while checking, so only one session imports
+            connection.execute("BEGIN IMMEDIATE")
+            if not os.path.exists(json_path):
+                return 0
+            with open(json_path, "r") as f:
+                entries = json.load(f)
+            rows = [
+                [
+                    entry.get("timestamp") or datetime.now().isoformat(),
+                    entry.get("video_name", "Unknown"),
+                    entry.get("summary", ""),
+                    entry.get("processing_time", 0.0),
+                    entry.get("model_used", "Unknown"),
+                ]
+                for entry in entries
+            ]
+            connection.executemany(
+                f"INSERT INTO history ({', '.join(COLUMNS)}) VALUES ({', '.join('?' * len(COLUMNS))})", rows
+            )
+            os.replace(json_path, json_path + ".imported")
+        return len(rows)
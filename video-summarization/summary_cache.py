@@ -0,0 +1,125 @@
+"""
+Content-addressed cache of extracted frames, window summaries and summaries.
+
+Entries are addressed by hashes of everything that determines them:
+
+- frames by the video's SHA-256 and the frame extraction settings,
+- window summaries (map stage) by the model, the window prompt and the
+  JPEG bytes of the window's frames,
+- summaries by the frames key, the model and the summary options,
+- audio transcripts by the video's SHA-256 and the speech model settings.
+
+So a re-uploaded video skips extraction, identical requests return the
+stored summary, and a different summary length reuses the frames and
+window summaries. Files are written to a temporary name and renamed into
+place, so concurrent sessions never see partial entries.
+"""
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+import time
+
+
+def cache_key(*parts):
+    """SHA-256 of JSON-serializable parts."""
+    return hashlib.sha256(json.dumps(parts, sort_keys=True).encode()).hexdigest()
+
+
+class SummaryCache:
+    def __init__(self, directory="cache/"):
+        self.directory = directory
+        for kind in ("frames", "windows", "summaries", "transcripts"):
+            os.makedirs(os.path.join(directory, kind), exist_ok=True)
+
+    def _path(self, kind, name):
+        return os.path.join(self.directory, kind, name)
+
+    def _read_json(self, path):
+        try:
+            with open(path, "r") as f:
+                return json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            return None
+
+    def _write_json(self, path, data):
+        fd, temp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+        with os.fdopen(fd, "w") as f:
+            json.dump(data, f, indent=2)
+        os.replace(temp_path, path)
+
+    @staticmethod
+    def frames_key(video_sha, settings):
+        """Key of the frames extracted from a video with the given extraction settings."""
+        return cache_key("frames", video_sha, settings)
+
+    @staticmethod
+    def window_key(model, prompt, frames):
+        """Key of a window summary: the model, the map prompt and the window's JPEG bytes."""
+        frame_hashes = [hashlib.sha256(frame["jpeg"]).hexdigest() for frame in frames]
+        return cache_key("window", model, prompt, frame_hashes)
+
+    @staticmethod
+    def summary_key(frames_key, model, options):
+        """Key of a final summary of cached frames with the given model and summary options."""
+        return cache_key("summary", frames_key, model, options)
+
+    @staticmethod
+    def transcript_key(video_sha, settings):
+        """Key of the audio transcript of a video with the given speech model settings."""
+        return cache_key("transcript", video_sha, settings)
+
+    def get_frames(self, key):
+        """Cached frames as {"index", "timestamp", "jpeg"[, "dhash"]} dicts, or None."""
+        directory = self._path("frames", key)
+        index = self._read_json(os.path.join(directory, "frames.json"))
+        if index is None:
+            return None
+        frames = []
+        for entry in index:
+            with open(os.path.join(directory, entry.pop("file")), "rb") as f:
+                frames.append({**entry, "jpeg": f.read()})
+        return frames
+
+    def put_frames(self, key, frames):
+        directory = self._path("frames", key)
+        if os.path.exists(directory):
+            return
+        temp_directory = tempfile.mkdtemp(dir=os.path.dirname(directory), suffix=".tmp")
+        index = []
+        for number, frame in enumerate(frames, start=1):
+            file_name = f"frame_{number:03d}.jpg"
+            with open(os.path.join(temp_directory, file_name), "wb") as f:
+                f.write(frame["jpeg"])
+            index.append({**{k: v for k, v in frame.items() if k != "jpeg"}, "file": file_name})
+        with open(os.path.join(temp_directory, "frames.json"), "w") as f:
+            json.dump(index, f, indent=2)
+        try:
+            os.rename(temp_directory, directory)
+        except OSError:
+            # Another session stored the same frames first
+            shutil.rmtree(temp_directory, ignore_errors=True)
+
+    def get_window(self, key):
+        """Cached window summary text, or None."""
+        entry = self._read_json(self._path("windows", f"{key}.json"))
+        return entry["summary"] if entry else None
+
+    def put_window(self, key, summary):
+        self._write_json(self._path("windows", f"{key}.json"), {"summary": summary, "created": time.time()})
+
+    def get_summary(self, key):
+        """Cached summary entry ({"summary", "created", ...}), or None."""
+        return self._read_json(self._path("summaries", f"{key}.json"))
+
+    def put_summary(self, key, summary, **details):
+        self._write_json(self._path("summaries", f"{key}.json"), {"summary": summary, "created": time.time(), **details})
+
+    def get_transcript(self, key):
+        """Cached transcript segments, or None."""
+        entry = self._read_json(self._path("transcripts", f"{key}.json"))
+        return entry["segments"] if entry else None
+
+    def put_transcript(self, key, segments):
+        self._write_json(self._path("transcripts", f"{key}.json"), {"segments": segments, "created": time.time()})
@@ -1,12 +1,19 @@
 import unittest
 from unittest.mock import patch, mock_open, MagicMock, call
+import hashlib
+import io
 import json
+import math
 import os
 import tempfile
 from datetime import datetime
 import cv2
 import shutil
 import logging
+import threading
+import time
+from functools import partial
+import numpy as np
 
 # Use absolute import since parent directory has no __init__.py
 from video_summary import (
@@ -15,8 +22,30 @@ from video_summary import (
     get_summary_prompt,
     upload_video,
     extract_frames,
-    describe_video
+    describe_video,
+    save_frames,
+    new_job_id,
+    get_window_prompt,
+    get_reduce_prompt,
+    format_transcript,
+    deduplicate_frames,
+    transcribe_video,
+    generate_summary,
+    summarize_upload,
+    frame_limit,
+    frame_settings,
+    summary_options
 )
+from video_frames import (
+    frame_signature, signature_distance, scene_keyframes, plan_targets, read_targets,
+    split_evenly, extract_targets_parallel, encode_jpeg, difference_hash, jpeg_difference_hash,
+    hamming_distance, near_duplicates, preprocess_frame, extract_video, measure_seek_cost, choose_decode_mode
+)
+from batch_scheduler import run_batch
+from processing_history import ProcessingHistory
+from summary_cache import SummaryCache
+from video_audio import av, extract_audio, segments_between, split_audio, transcribe_audio
+from benchmarks.synthetic_video import write_synthetic_video
 
 # Configure test logging to write to both console and log file
 def setup_test_logging():
@@ -111,78 +140,66 @@ class TestVideoSummary(unittest.TestCase):
         print(f"END TEST SUMMARY - {test_name}")
         print(f"{separator}\n")
 
-    @patch('builtins.open', new_callable=mock_open)
-    @patch('os.path.exists')
-    @patch('json.load')
-    @patch('json.dump')
-    def test_save_processing_history_new_file(self, mock_json_dump, mock_json_load, mock_exists, mock_file):
-        """Test saving processing history when file doesn't exist."""
+    def make_history(self):
+        """Empty processing history in a temporary directory, used by save_processing_history."""
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        history = ProcessingHistory(os.path.join(directory, "history.db"), legacy_json=None)
+        patcher = patch('video_summary.history_store', history)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        return history
+
+    def test_save_processing_history_new_file(self):
+        """Test saving processing history to an empty history."""
         # Arrange
-        mock_exists.return_value = False
+        history = self.make_history()
         
         # Act
         save_processing_history(self.test_video_name, self.test_summary, 
                               self.test_processing_time, self.test_model)
         
         # Assert
-        mock_file.assert_called()
-        mock_json_dump.assert_called_once()
-        
-        # Verify the structure of data being saved
-        call_args = mock_json_dump.call_args[0]
-        saved_data = call_args[0]
+        saved_data = history.recent()
         self.assertEqual(len(saved_data), 1)
         self.assertEqual(saved_data[0]['video_name'], self.test_video_name)
         self.assertEqual(saved_data[0]['summary'], self.test_summary)
         self.assertEqual(saved_data[0]['processing_time'], self.test_processing_time)
         self.assertEqual(saved_data[0]['model_used'], self.test_model)
 
-    @patch('builtins.open', new_callable=mock_open)
-    @patch('os.path.exists')
-    @patch('json.load')
-    @patch('json.dump')
-    def test_save_processing_history_existing_file(self, mock_json_dump, mock_json_load, mock_exists, mock_file):
-        """Test saving processing history when file exists."""
+    def test_save_processing_history_existing_file(self):
+        """Test saving processing history appends to existing entries."""
         # Arrange
-        mock_exists.return_value = True
-        existing_history = [{"video_name": "old_video.mp4", "summary": "old summary"}]
-        mock_json_load.return_value = existing_history
+        history = self.make_history()
+        history.add("old_video.mp4", "old summary", 3.0, self.test_model)
         
         # Act
         save_processing_history(self.test_video_name, self.test_summary, 
                               self.test_processing_time, self.test_model)
         
-        # Assert
-        mock_json_load.assert_called_once()
-        mock_json_dump.assert_called_once()
-        
-        # Verify new entry is appended
-        call_args = mock_json_dump.call_args[0]
-        saved_data = call_args[0]
+        # Assert: most recent first
+        saved_data = history.recent()
         self.assertEqual(len(saved_data), 2)
-        self.assertEqual(saved_data[1]['video_name'], self.test_video_name)
+        self.assertEqual(saved_data[0]['video_name'], self.test_video_name)
+        self.assertEqual(saved_data[1]['video_name'], "old_video.mp4")
 
-    @patch('builtins.open', new_callable=mock_open)
-    @patch('os.path.exists')
-    @patch('json.load')
-    @patch('json.dump')
-    def test_save_processing_history_max_entries(self, mock_json_dump, mock_json_load, mock_exists, mock_file):
-        """Test that processing history keeps only last 50 entries."""
+    def test_save_processing_history_max_entries(self):
+        """Test that processing history is not truncated and recent() returns the last N entries."""
         # Arrange
-        mock_exists.return_value = True
-        # Create 50 existing entries
-        existing_history = [{"video_name": f"video_{i}.mp4"} for i in range(50)]
-        mock_json_load.return_value = existing_history
+        history = self.make_history()
+        for i in range(60):
+            history.add(f"video_{i}.mp4", "summary", float(i), self.test_model)
         
         # Act
         save_processing_history(self.test_video_name, self.test_summary, 
                               self.test_processing_time, self.test_model)
         
         # Assert
-        call_args = mock_json_dump.call_args[0]
-        saved_data = call_args[0]
-        self.assertEqual(len(saved_data), 50)  # Should still be 50 (oldest removed)
-        self.assertEqual(saved_data[-1]['video_name'], self.test_video_name)  # New entry at end
+        self.assertEqual(history.totals()['count'], 61)
+        saved_data = history.recent(50)
+        self.assertEqual(len(saved_data), 50)
+        self.assertEqual(saved_data[0]['video_name'], self.test_video_name)  # New entry first
+        self.assertEqual(saved_data[-1]['video_name'], "video_11.mp4")
 
     def test_export_summary(self):
         """Test export summary report generation."""
@@ -240,27 +257,56 @@ class TestVideoSummary(unittest.TestCase):
     @patch('video_summary.st')
     @patch('video_summary.logger')
     @patch('video_summary.os.makedirs')
+    @patch('video_summary.os.replace')
     @patch('builtins.open', new_callable=mock_open)
     @patch('video_summary.time.time')
-    def test_upload_video_success(self, mock_time, mock_file, mock_makedirs, mock_logger, mock_st):
+    def test_upload_video_success(self, mock_time, mock_file, mock_replace, mock_makedirs, mock_logger, mock_st):
         """Test successful video upload."""
         # Arrange
         mock_time.side_effect = [100.0, 105.0]  # start_time, end_time
         mock_file_obj = MagicMock()
         mock_file_obj.name = self.test_video_name
-        mock_file_obj.getbuffer.return_value = b"fake video data"
+        mock_file_obj.read.side_effect = [b"fake video", b" data", b""]
         
         # Act
-        result = upload_video(mock_file_obj)
+        result, sha256 = upload_video(mock_file_obj, chunk_size=10)
         
         # Assert
-        expected_path = f"videos/{self.test_video_name}"
-        self.assertEqual(result, expected_path)
+        self.assertTrue(result.startswith("videos/"))
+        self.assertTrue(result.endswith(".mkv"))
+        self.assertIn("test01", result)
+        self.assertEqual(sha256, hashlib.sha256(b"fake video data").hexdigest())
         mock_makedirs.assert_called_once_with("videos/", exist_ok=True)
-        mock_file.assert_called_once_with(expected_path, "wb")
+        mock_file.assert_called_once_with(result + ".part", "wb")
+        mock_file().write.assert_has_calls([call(b"fake video"), call(b" data")])
+        mock_file_obj.read.assert_called_with(10)
+        mock_replace.assert_called_once_with(result + ".part", result)
         mock_st.success.assert_called_once()
         mock_logger.info.assert_called()
 
+    @patch('video_summary.st')
+    @patch('video_summary.logger')
+    def test_upload_video_streams_to_unique_files(self, mock_logger, mock_st):
+        """Uploads of the same file name go to separate job files with the same hash."""
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        data = os.urandom(100_000)
+        
+        with patch('video_summary.videos_directory', directory + "/"):
+            paths = []
+            for _ in range(2):
+                mock_file_obj = MagicMock()
+                mock_file_obj.name = self.test_video_name
+                mock_file_obj.read.side_effect = io.BytesIO(data).read
+                paths.append(upload_video(mock_file_obj, chunk_size=4096))
+        
+        self.assertNotEqual(paths[0][0], paths[1][0])
+        for path, sha256 in paths:
+            self.assertEqual(sha256, hashlib.sha256(data).hexdigest())
+            with open(path, "rb") as f:
+                self.assertEqual(f.read(), data)
+        self.assertEqual(sorted(os.listdir(directory)), sorted(os.path.basename(path) for path, _ in paths))
+
     @patch('video_summary.st')
     @patch('video_summary.logger')
     @patch('video_summary.os.makedirs')
@@ -281,20 +327,15 @@ class TestVideoSummary(unittest.TestCase):
     @patch('video_summary.logger')
     @patch('video_summary.cv2.VideoCapture')
     @patch('video_summary.cv2.imwrite')
-    @patch('video_summary.os.path.exists')
-    @patch('video_summary.os.listdir')
+    @patch('video_summary.encode_jpeg')
     @patch('video_summary.os.remove')
-    @patch('video_summary.os.makedirs')
     @patch('video_summary.time.time')
-    def test_extract_frames_success(self, mock_time, mock_makedirs, mock_remove, 
-                                   mock_listdir, mock_exists, mock_imwrite,
+    def test_extract_frames_success(self, mock_time, mock_remove, mock_encode, mock_imwrite,
                                    mock_video_capture, mock_logger, mock_st):
         """Test successful frame extraction."""
         # Arrange
         mock_time.side_effect = [200.0, 210.0]  # start_time, end_time
-        mock_exists.return_value = True
-        mock_listdir.return_value = ["old_frame.jpg"]
-        mock_imwrite.return_value = True  # Mock successful write
+        mock_encode.return_value = b"jpeg"
         
         mock_video = MagicMock()
         mock_video_capture.return_value = mock_video
@@ -310,15 +351,18 @@ class TestVideoSummary(unittest.TestCase):
         mock_st.empty.return_value = MagicMock()
         
         # Act
-        extract_frames(self.test_video_path, interval_seconds=5)
+        frames = extract_frames(self.test_video_path, interval_seconds=5)
         
         # Assert
         mock_video_capture.assert_called_once_with(self.test_video_path)
         mock_video.isOpened.assert_called_once()
-        mock_remove.assert_called_once_with("frames/old_frame.jpg")
         mock_video.release.assert_called_once()
         mock_st.success.assert_called()
-        mock_imwrite.assert_called()  # Verify cv2.imwrite was called
+        # Frames stay in memory, in timestamp order; nothing is written or deleted
+        self.assertEqual([frame["timestamp"] for frame in frames], [0.0, 5.0, 10.0, 15.0, 20.0, 25.0])
+        self.assertTrue(all(frame["jpeg"] == b"jpeg" for frame in frames))
+        mock_remove.assert_not_called()
+        mock_imwrite.assert_not_called()
 
     @patch('video_summary.st')
     @patch('video_summary.logger')
@@ -337,34 +381,30 @@ class TestVideoSummary(unittest.TestCase):
         mock_logger.error.assert_called()
         mock_st.error.assert_called()
 
-    @patch('video_summary.st')
     @patch('video_summary.logger')
-    @patch('video_summary.os.path.exists')
-    def test_describe_video_no_frames_directory(self, mock_exists, mock_logger, mock_st):
-        """Test video description when frames directory doesn't exist."""
-        # Arrange
-        mock_exists.return_value = False
-        
-        # Act
-        result = describe_video()
-        
-        # Assert
-        self.assertEqual(result, "Error: No frames extracted")
-        mock_logger.error.assert_called()
-        mock_st.error.assert_called()
+    def test_save_frames_per_job(self, mock_logger):
+        """Persisted frames go to a separate folder for every job."""
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        frames = [{"index": 0, "timestamp": 0.0, "jpeg": b"first"}, {"index": 30, "timestamp": 1.0, "jpeg": b"second"}]
+        job_a = os.path.join(directory, new_job_id("./videos/test01.mkv"))
+        job_b = os.path.join(directory, new_job_id("./videos/test01.mkv"))
+        
+        save_frames(frames, job_a)
+        save_frames(frames[:1], job_b)
+        
+        self.assertNotEqual(job_a, job_b)
+        self.assertEqual(sorted(os.listdir(job_a)), ["frame_001.jpg", "frame_002.jpg"])
+        self.assertEqual(os.listdir(job_b), ["frame_001.jpg"])
+        with open(os.path.join(job_a, "frame_002.jpg"), "rb") as f:
+            self.assertEqual(f.read(), b"second")
 
     @patch('video_summary.st')
     @patch('video_summary.logger')
-    @patch('video_summary.os.path.exists')
-    @patch('video_summary.os.listdir')
-    def test_describe_video_no_frame_files(self, mock_listdir, mock_exists, mock_logger, mock_st):
-        """Test video description when no frame files exist."""
-        # Arrange
-        mock_exists.return_value = True
-        mock_listdir.return_value = []
-        
+    def test_describe_video_no_frames(self, mock_logger, mock_st):
+        """Test video description when no frames were extracted."""
         # Act
-        result = describe_video()
+        result = describe_video([])
         
         # Assert
         self.assertEqual(result, "Error: No frames to analyze")
@@ -373,20 +413,14 @@ class TestVideoSummary(unittest.TestCase):
 
     @patch('video_summary.st')
     @patch('video_summary.logger')
-    @patch('video_summary.os.path.exists')
-    @patch('video_summary.os.listdir')
-    @patch('video_summary.os.path.join')
     @patch('video_summary.model')
     @patch('video_summary.get_summary_prompt')
     @patch('video_summary.time.time')
-    def test_describe_video_success(self, mock_time, mock_get_prompt, mock_model, 
-                                   mock_join, mock_listdir, mock_exists, mock_logger, mock_st):
+    def test_describe_video_success(self, mock_time, mock_get_prompt, mock_model, mock_logger, mock_st):
         """Test successful video description."""
         # Arrange
         mock_time.side_effect = [300.0, 305.0, 310.0, 315.0]  # start, model_start, model_end, end
-        mock_exists.return_value = True
-        mock_listdir.return_value = ["frame_001.jpg", "frame_002.jpg"]
-        mock_join.side_effect = ["frames/frame_001.jpg", "frames/frame_002.jpg"]
+        frames = [{"index": 0, "timestamp": 0.0, "jpeg": b"frame1"}, {"index": 150, "timestamp": 5.0, "jpeg": b"frame2"}]
         mock_get_prompt.return_value = "Test prompt"
         
         mock_model_with_images = MagicMock()
@@ -395,11 +429,11 @@ class TestVideoSummary(unittest.TestCase):
         mock_model_with_images.invoke.return_value = generated_summary
         
         # Act
-        result = describe_video()
+        result = describe_video(frames)
         
         # Assert
         self.assertEqual(result, generated_summary)
-        mock_model.bind.assert_called_once()
+        mock_model.bind.assert_called_once_with(images=[b"frame1", b"frame2"])
         mock_model_with_images.invoke.assert_called_once_with("Test prompt")
         mock_logger.info.assert_called()
         
@@ -414,22 +448,18 @@ class TestVideoSummary(unittest.TestCase):
 
     @patch('video_summary.st')
     @patch('video_summary.logger')
-    @patch('video_summary.os.path.exists')
-    @patch('video_summary.os.listdir')
     @patch('video_summary.model')
     @patch('video_summary.time.time')
-    def test_describe_video_model_error(self, mock_time, mock_model, mock_listdir, 
-                                       mock_exists, mock_logger, mock_st):
+    def test_describe_video_model_error(self, mock_time, mock_model, mock_logger, mock_st):
         """Test video description when model throws an error."""
         # Arrange
         mock_time.side_effect = [400.0, 405.0]  # start_time, end_time
-        mock_exists.return_value = True
-        mock_listdir.return_value = ["frame_001.jpg"]
+        frames = [{"index": 0, "timestamp": 0.0, "jpeg": b"frame1"}]
         
         mock_model.bind.side_effect = Exception("Model error")
         
         # Act
-        result = describe_video()
+        result = describe_video(frames)
         
         # Assert
         self.assertIn("Error: Could not analyze video", result)
@@ -456,21 +486,24 @@ class TestVideoSummary(unittest.TestCase):
         """Test upload video functionality with actual test video names."""
         mock_file_obj = MagicMock()
         mock_file_obj.name = self.test_video_name
-        mock_file_obj.getbuffer.return_value = b"fake video data"
+        mock_file_obj.read.side_effect = [b"fake video data", b""]
         
         with patch('video_summary.st'), \
              patch('video_summary.logger'), \
              patch('video_summary.os.makedirs'), \
+             patch('video_summary.os.replace'), \
              patch('builtins.open', mock_open()) as mock_file, \
              patch('video_summary.time.time', side_effect=[100.0, 105.0]):
             
             # Act
-            result = upload_video(mock_file_obj)
+            result, _ = upload_video(mock_file_obj)
             
             # Assert
-            expected_path = f"videos/{self.test_video_name}"
-            self.assertEqual(result, expected_path)
-            mock_file.assert_called_once_with(expected_path, "wb")
+            stem, extension = os.path.splitext(self.test_video_name)
+            self.assertTrue(result.startswith("videos/"))
+            self.assertIn(stem, result)
+            self.assertTrue(result.endswith(extension))
+            mock_file.assert_called_once_with(result + ".part", "wb")
 
     @patch('video_summary.st')
     @patch('video_summary.logger')
@@ -478,21 +511,24 @@ class TestVideoSummary(unittest.TestCase):
         """Test upload video functionality with MP4 test file."""
         mock_file_obj = MagicMock()
         mock_file_obj.name = self.test_video_name_2
-        mock_file_obj.getbuffer.return_value = b"fake video data for mp4"
+        mock_file_obj.read.side_effect = [b"fake video data for mp4", b""]
         
         with patch('video_summary.st'), \
              patch('video_summary.logger'), \
              patch('video_summary.os.makedirs'), \
+             patch('video_summary.os.replace'), \
              patch('builtins.open', mock_open()) as mock_file, \
              patch('video_summary.time.time', side_effect=[100.0, 105.0]):
             
             # Act
-            result = upload_video(mock_file_obj)
+            result, _ = upload_video(mock_file_obj)
             
             # Assert
-            expected_path = f"videos/{self.test_video_name_2}"
-            self.assertEqual(result, expected_path)
-            mock_file.assert_called_once_with(expected_path, "wb")
+            stem, extension = os.path.splitext(self.test_video_name_2)
+            self.assertTrue(result.startswith("videos/"))
+            self.assertIn(stem, result)
+            self.assertTrue(result.endswith(extension))
+            mock_file.assert_called_once_with(result + ".part", "wb")
         
 
 class TestVideoSummaryIntegration(unittest.TestCase):
@@ -638,21 +674,13 @@ class TestVideoSummaryIntegration(unittest.TestCase):
         mock_st.progress.return_value = MagicMock()
         mock_st.empty.return_value = MagicMock()
         
-        # Clean up frames directory first
-        frames_dir = "frames/"
-        if os.path.exists(frames_dir):
-            for file in os.listdir(frames_dir):
-                if file.endswith('.jpg'):
-                    os.remove(os.path.join(frames_dir, file))
-        
         try:
             # Act
-            extract_frames("./videos/test01.mkv", interval_seconds=10)
+            frames = extract_frames("./videos/test01.mkv", interval_seconds=10)
             
-            # Assert - check that frames were created
-            self.assertTrue(os.path.exists(frames_dir))
-            frame_files = [f for f in os.listdir(frames_dir) if f.endswith('.jpg')]
-            self.assertGreater(len(frame_files), 0, "No frames were extracted from test video")
+            # Assert - check that frames were extracted as JPEG bytes
+            self.assertGreater(len(frames), 0, "No frames were extracted from test video")
+            self.assertTrue(frames[0]["jpeg"].startswith(b"\xff\xd8"))
             
         except Exception as e:
             self.fail(f"Frame extraction failed with error: {str(e)}")
@@ -669,32 +697,13 @@ class TestVideoSummaryIntegration(unittest.TestCase):
         mock_st.progress.return_value = MagicMock()
         mock_st.empty.return_value = MagicMock()
         
-        # Clean up frames directory first
-        frames_dir = "frames/"
-        if os.path.exists(frames_dir):
-            for file in os.listdir(frames_dir):
-                if file.endswith('.jpg'):
-                    os.remove(os.path.join(frames_dir, file))
-        
         try:
             # Test with 5-second intervals
-            extract_frames("./videos/test02.mp4", interval_seconds=5)
-            
-            # Check that frames were created
-            self.assertTrue(os.path.exists(frames_dir))
-            frame_files = [f for f in os.listdir(frames_dir) if f.endswith('.jpg')]
-            frames_count_5s = len(frame_files)
+            frames_count_5s = len(extract_frames("./videos/test02.mp4", interval_seconds=5))
             self.assertGreater(frames_count_5s, 0, "No frames extracted with 5s interval")
             
-            # Clean up for next test
-            for file in frame_files:
-                os.remove(os.path.join(frames_dir, file))
-            
             # Test with 15-second intervals
-            extract_frames("./videos/test02.mp4", interval_seconds=15)
-            
-            frame_files = [f for f in os.listdir(frames_dir) if f.endswith('.jpg')]
-            frames_count_15s = len(frame_files)
+            frames_count_15s = len(extract_frames("./videos/test02.mp4", interval_seconds=15))
             self.assertGreater(frames_count_15s, 0, "No frames extracted with 15s interval")
             
             # Generally, 5s intervals should produce more frames than 15s intervals
@@ -775,14 +784,12 @@ class TestVideoSummaryIntegration(unittest.TestCase):
                 mock_model.bind.return_value = mock_model_with_images
                 mock_model_with_images.invoke.return_value = mock_summaries[scenario["type"]]
                 
-                # Mock the necessary path and file operations
-                with patch('video_summary.os.path.exists', return_value=True), \
-                     patch('video_summary.os.listdir', return_value=["frame_001.jpg", "frame_002.jpg"]), \
-                     patch('video_summary.get_summary_prompt', return_value=f"Generate a {scenario['type']} summary"), \
+                frames = [{"index": 0, "timestamp": 0.0, "jpeg": b"frame1"}, {"index": 300, "timestamp": 10.0, "jpeg": b"frame2"}]
+                with patch('video_summary.get_summary_prompt', return_value=f"Generate a {scenario['type']} summary"), \
                      patch('video_summary.time.time', side_effect=[100.0, 105.0, 110.0, 115.0]):
                     
                     # Act - call the actual describe_video function
-                    result = describe_video()
+                    result = describe_video(frames)
                     
                     # Assert the result matches expected
                     self.assertEqual(result, mock_summaries[scenario["type"]])
@@ -859,10 +866,7 @@ class TestVideoSummarySettings(unittest.TestCase):
                 with patch('video_summary.st'), \
                      patch('video_summary.logger'), \
                      patch('video_summary.cv2.VideoCapture') as mock_capture, \
-                     patch('video_summary.cv2.imwrite', return_value=True), \
-                     patch('video_summary.os.path.exists', return_value=True), \
-                     patch('video_summary.os.listdir', return_value=[]), \
-                     patch('video_summary.os.makedirs'), \
+                     patch('video_summary.encode_jpeg', return_value=b"jpeg"), \
                      patch('video_summary.time.time', return_value=100.0):
                     
                     # Mock video capture
@@ -899,10 +903,7 @@ class TestVideoSummarySettings(unittest.TestCase):
         with patch('video_summary.st'), \
              patch('video_summary.logger'), \
              patch('video_summary.cv2.VideoCapture') as mock_capture, \
-             patch('video_summary.cv2.imwrite', return_value=True) as mock_imwrite, \
-             patch('video_summary.os.path.exists', return_value=True), \
-             patch('video_summary.os.listdir', return_value=[]), \
-             patch('video_summary.os.makedirs'), \
+             patch('video_summary.encode_jpeg', return_value=b"jpeg"), \
              patch('video_summary.time.time', return_value=100.0):
             
             # Mock video with many frames
@@ -913,11 +914,11 @@ class TestVideoSummarySettings(unittest.TestCase):
             mock_video.read.return_value = (True, MagicMock(size=1000))
             
             # Act
-            extract_frames(self.test_video_path_mkv, interval_seconds=1)  # 1 second interval
+            frames = extract_frames(self.test_video_path_mkv, interval_seconds=1)  # 1 second interval
             
-            # Assert that cv2.imwrite was called at most max_frames times
-            # Note: The actual call count may be less due to video duration
-            self.assertLessEqual(mock_imwrite.call_count, max_frames_value)
+            # Assert that at most max_frames frames were extracted
+            # Note: The actual count may be less due to video duration
+            self.assertLessEqual(len(frames), max_frames_value)
 
     def test_ai_model_settings(self):
         """Test all required AI model settings: gemma3:27b, llava:7b, bakllava."""
@@ -1043,23 +1044,11 @@ class TestVideoSummarySettings(unittest.TestCase):
         mock_st.progress.return_value = MagicMock()
         mock_st.empty.return_value = MagicMock()
         
-        frames_dir = "frames/"
-        
         for interval in self.frame_intervals:
             with self.subTest(interval=interval):
-                # Clean up frames directory
-                if os.path.exists(frames_dir):
-                    for file in os.listdir(frames_dir):
-                        if file.endswith('.jpg'):
-                            os.remove(os.path.join(frames_dir, file))
-                
                 try:
                     # Extract frames with current interval
-                    extract_frames(self.test_video_path_mp4, interval_seconds=interval)
-                    
-                    # Verify frames were extracted
-                    self.assertTrue(os.path.exists(frames_dir))
-                    frame_files = [f for f in os.listdir(frames_dir) if f.endswith('.jpg')]
+                    frame_files = extract_frames(self.test_video_path_mp4, interval_seconds=interval)
                     
                     # For the 8-second test video, we should get different numbers of frames
                     # based on the interval (unless interval > video duration)
@@ -1123,10 +1112,11 @@ class TestVideoSummarySettings(unittest.TestCase):
             with self.subTest(model=model):
                 test_data['model_used'] = model
                 
-                with patch('builtins.open', mock_open()) as mock_file, \
-                     patch('os.path.exists', return_value=False), \
-                     patch('json.dump') as mock_json_dump:
-                    
+                directory = tempfile.mkdtemp()
+                self.addCleanup(shutil.rmtree, directory)
+                history = ProcessingHistory(os.path.join(directory, "history.db"), legacy_json=None)
+                
+                with patch('video_summary.history_store', history):
                     save_processing_history(
                         test_data['video_name'], 
                         test_data['summary'],
@@ -1134,10 +1124,8 @@ class TestVideoSummarySettings(unittest.TestCase):
                         test_data['model_used']
                     )
                     
-                    # Verify the function was called and data structure is correct
-                    mock_json_dump.assert_called_once()
-                    call_args = mock_json_dump.call_args[0]
-                    saved_data = call_args[0]
+                    # Verify the data structure is correct
+                    saved_data = history.recent()
                     
                     self.assertEqual(len(saved_data), 1)
                     self.assertEqual(saved_data[0]['model_used'], model)
@@ -1222,6 +1210,823 @@ class TestVideoSummarySettings(unittest.TestCase):
                     self.assertGreater(len(scenario["summary"]), 500)
 
 
+class FakeCapture:
+    """Minimal stand-in for cv2.VideoCapture that plays a list of frames."""
+    
+    def __init__(self, frames):
+        self.frames = frames
+        self.position = 0
+        self.reads = 0
+    
+    def grab(self):
+        if self.position >= len(self.frames):
+            return False
+        self.position += 1
+        return True
+    
+    def read(self):
+        if self.position >= len(self.frames):
+            return False, None
+        frame = self.frames[self.position]
+        self.position += 1
+        self.reads += 1
+        return True, frame
+
+
+def make_scene_frames(scenes, fps=10, size=(120, 160)):
+    """Frames for a list of (brightness, seconds) scenes, with a moving dot in each."""
+    frames = []
+    for brightness, seconds in scenes:
+        for i in range(int(fps * seconds)):
+            frame = np.full(size + (3,), brightness, dtype=np.uint8)
+            frame[:, :size[1] // 2] = 255 - brightness
+            cv2.circle(frame, (5 + i % (size[1] - 10), size[0] // 2), 4, (0, 0, 255), -1)
+            frames.append(frame)
+    return frames
+
+
+class TestSceneSampling(unittest.TestCase):
+    """Tests for scene-change keyframe sampling in video_frames."""
+    
+    def test_signature_distance_identical_and_different(self):
+        """Identical frames have distance 0; very different frames are far apart."""
+        dark = np.full((90, 160, 3), 20, dtype=np.uint8)
+        bright = np.full((90, 160, 3), 230, dtype=np.uint8)
+        
+        self.assertAlmostEqual(signature_distance(frame_signature(dark), frame_signature(dark)), 0.0, places=5)
+        self.assertGreater(signature_distance(frame_signature(dark), frame_signature(bright)), 0.9)
+    
+    def test_scene_keyframes_at_cuts(self):
+        """One keyframe per scene, regardless of scene length."""
+        fps = 10
+        frames = make_scene_frames([(40, 3), (200, 10), (90, 2)], fps=fps)
+        capture = FakeCapture(frames)
+        
+        keyframes = scene_keyframes(capture, fps, len(frames), max_frames=20, analysis_fps=5)
+        
+        indices = [index for index, _ in keyframes]
+        self.assertEqual(len(indices), 3)
+        self.assertEqual(indices[0], 0)
+        self.assertTrue(30 <= indices[1] <= 32)
+        self.assertTrue(130 <= indices[2] <= 132)
+        # Only analysed frames are decoded
+        self.assertLess(capture.reads, len(frames))
+    
+    def test_scene_keyframes_respects_max_frames(self):
+        """With more scenes than max_frames, the strongest changes are kept in time order."""
+        fps = 10
+        frames = make_scene_frames([(40, 2), (60, 2), (220, 2), (200, 2)], fps=fps)
+        
+        keyframes = scene_keyframes(FakeCapture(frames), fps, len(frames), max_frames=2, analysis_fps=5)
+        
+        indices = [index for index, _ in keyframes]
+        self.assertEqual(len(indices), 2)
+        self.assertEqual(indices, sorted(indices))
+        self.assertEqual(indices[0], 0)
+    
+    def test_scene_keyframes_static_video(self):
+        """A static video produces a single keyframe."""
+        fps = 10
+        frames = [np.full((120, 160, 3), 128, dtype=np.uint8)] * 100
+        
+        keyframes = scene_keyframes(FakeCapture(frames), fps, len(frames), max_frames=20)
+        
+        self.assertEqual([index for index, _ in keyframes], [0])
+    
+    @patch('video_summary.st')
+    @patch('video_summary.logger')
+    @patch('video_summary.cv2.VideoCapture')
+    def test_extract_frames_scene_mode(self, mock_video_capture, mock_logger, mock_st):
+        """Scene mode extracts one frame per detected scene."""
+        frames = make_scene_frames([(40, 3), (200, 3)], fps=10)
+        capture = FakeCapture(frames)
+        mock_video = MagicMock()
+        mock_video.isOpened.return_value = True
+        mock_video.get.side_effect = [10.0, len(frames)]  # FPS, frame_count
+        mock_video.grab.side_effect = capture.grab
+        mock_video.read.side_effect = capture.read
+        mock_video_capture.return_value = mock_video
+        
+        keyframes = extract_frames("./videos/test02.mp4", interval_seconds=5, sampling="scene")
+        
+        self.assertEqual([frame["index"] for frame in keyframes], [0, 30])
+        self.assertTrue(all(frame["jpeg"].startswith(b"\xff\xd8") for frame in keyframes))
+        mock_video.set.assert_not_called()
+        mock_video.release.assert_called_once()
+
+
+class TestSegmentExtraction(unittest.TestCase):
+    """Tests for the extraction budget and parallel segment extraction in video_frames."""
+    
+    def test_plan_targets_budget(self):
+        """Targets are every step-th frame, capped at max_frames."""
+        self.assertEqual(plan_targets(100, 30, 20), [0, 30, 60, 90])
+        self.assertEqual(plan_targets(100000, 30, 5), [0, 30, 60, 90, 120])
+        self.assertEqual(plan_targets(0, 30, 5), [])
+    
+    def test_split_evenly(self):
+        """Chunks are contiguous, non-empty and cover all items."""
+        chunks = split_evenly(list(range(10)), 4)
+        self.assertEqual([len(chunk) for chunk in chunks], [3, 3, 2, 2])
+        self.assertEqual(sum(chunks, []), list(range(10)))
+        self.assertEqual(split_evenly([1, 2], 8), [[1], [2]])
+        self.assertEqual(split_evenly([], 4), [])
+    
+    def test_read_targets_scan_from_segment_start(self):
+        """A scan segment seeks once to its first target, then reads sequentially."""
+        frames = make_scene_frames([(40, 10)], fps=10)
+        capture = FakeCapture(frames)
+        capture.set = MagicMock(side_effect=lambda prop, value: setattr(capture, "position", int(value)))
+        
+        result = list(read_targets(capture, [40, 50, 60], mode="scan"))
+        
+        self.assertEqual([index for index, _ in result], [40, 50, 60])
+        capture.set.assert_called_once_with(cv2.CAP_PROP_POS_FRAMES, 40)
+        self.assertTrue(np.array_equal(result[1][1], frames[50]))
+        self.assertEqual(capture.reads, 3)
+    
+    def test_extract_targets_parallel_matches_sequential(self):
+        """Segments decoded in separate processes merge back in timestamp order."""
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        video_path = os.path.join(directory, "segments.avi")
+        writer = cv2.VideoWriter(video_path, cv2.VideoWriter_fourcc(*"MJPG"), 10, (160, 120))
+        for frame in make_scene_frames([(40, 3), (200, 3)], fps=10):
+            writer.write(frame)
+        writer.release()
+        targets = plan_targets(60, 7, 20)
+        
+        frames = extract_targets_parallel(video_path, targets, "scan", workers=3)
+        
+        self.assertEqual([index for index, _ in frames], targets)
+        for _, jpeg in frames:
+            self.assertTrue(jpeg.startswith(b"\xff\xd8"))
+
+
+class GopCapture:
+    """
+    Stand-in capture that charges decode work to a virtual clock: one unit per
+    decoded frame, and a seek decodes forward from the previous keyframe.
+    """
+    
+    def __init__(self, frames_count, gop):
+        self.frames_count = frames_count
+        self.gop = gop
+        self.position = 0
+        self.clock = 0.0
+    
+    def set(self, prop, index):
+        self.clock += index - (index // self.gop) * self.gop
+        self.position = index
+        return True
+    
+    def grab(self):
+        if self.position >= self.frames_count:
+            return False
+        self.clock += 1
+        self.position += 1
+        return True
+    
+    def read(self):
+        if not self.grab():
+            return False, None
+        return True, np.full((4, 4, 3), (self.position - 1) % 256, dtype=np.uint8)
+
+
+class TestDecodeModeSelection(unittest.TestCase):
+    """Tests for the automatic choice between seeking and sequential scanning."""
+    
+    def choose(self, gop, step, frames_count=1000):
+        capture = GopCapture(frames_count, gop)
+        with patch('video_frames.time.perf_counter', side_effect=lambda: capture.clock):
+            cost = measure_seek_cost(capture, frames_count)
+            mode = choose_decode_mode(capture, frames_count, step)
+        self.assertEqual(capture.position, 0)
+        return cost, mode
+    
+    def test_short_gop_seeks(self):
+        """With keyframes close together a seek costs about one frame, so sparse targets are sought."""
+        cost, mode = self.choose(gop=1, step=30)
+        
+        self.assertAlmostEqual(cost, 1.0)
+        self.assertEqual(mode, "seek")
+    
+    def test_long_gop_scans(self):
+        """With long GOPs a seek costs many decoded frames, so a short step is scanned."""
+        cost, mode = self.choose(gop=300, step=30)
+        
+        self.assertGreater(cost, 30)
+        self.assertEqual(mode, "scan")
+    
+    def test_long_gop_seeks_past_the_seek_cost(self):
+        """Steps longer than the measured seek cost still seek, whatever the GOP."""
+        cost, mode = self.choose(gop=300, step=500)
+        
+        self.assertLess(cost, 500)
+        self.assertEqual(mode, "seek")
+    
+    def test_every_frame_scans(self):
+        """Reading every frame never seeks."""
+        self.assertEqual(choose_decode_mode(GopCapture(100, 1), 100, 1), "scan")
+    
+    def write_video(self, key_interval):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        path = os.path.join(directory, f"gop{key_interval}.mp4")
+        write_synthetic_video(path, seconds=20, fps=30, width=160, height=120, scene_seconds=5,
+                              key_interval=key_interval)
+        return path
+    
+    @unittest.skipIf(av is None, "PyAV not installed")
+    def test_synthetic_videos_pick_mode_by_gop(self):
+        """
+        On real H.264 videos, sampling every 3 s seeks in an all-keyframe video
+        and sampling every second scans in a 10 s GOP. A seek also has a fixed
+        cost (decoder flush), worth about 20 grabbed frames at this size, so
+        the short-GOP step must be larger than that.
+        """
+        for key_interval, step, expected in ((1, 90, "seek"), (300, 30, "scan")):
+            with self.subTest(key_interval=key_interval):
+                video = cv2.VideoCapture(self.write_video(key_interval))
+                self.addCleanup(video.release)
+                frames_count = int(video.get(cv2.CAP_PROP_FRAME_COUNT))
+                
+                self.assertEqual(choose_decode_mode(video, frames_count, step), expected)
+    
+    @unittest.skipIf(av is None, "PyAV not installed")
+    def test_read_targets_same_frames_in_both_modes(self):
+        """Seeking and scanning return the same frames for the same targets."""
+        path = self.write_video(60)
+        targets = plan_targets(600, 45, 20)
+        
+        results = {}
+        for mode in ("seek", "scan"):
+            video = cv2.VideoCapture(path)
+            try:
+                results[mode] = list(read_targets(video, targets, mode))
+            finally:
+                video.release()
+        
+        self.assertEqual([index for index, _ in results["seek"]], targets)
+        self.assertEqual([index for index, _ in results["scan"]], targets)
+        for (_, sought), (_, scanned) in zip(results["seek"], results["scan"]):
+            np.testing.assert_array_equal(sought, scanned)
+
+
+class TestMapReduceSummarization(unittest.TestCase):
+    """Tests for windowed map-reduce summarization in describe_video."""
+    
+    def make_frames(self, count, interval=5):
+        return [{"index": i * interval * 30, "timestamp": float(i * interval), "jpeg": f"frame{i}".encode()}
+                for i in range(count)]
+    
+    def test_window_prompt_independent_of_summary_options(self):
+        """The map prompt only depends on the window's position in the video."""
+        prompt = get_window_prompt(65, 100)
+        
+        self.assertIn("1:05", prompt)
+        self.assertIn("1:40", prompt)
+        self.assertNotIn("2-3 sentence", prompt)
+    
+    def test_reduce_prompt_orders_segments(self):
+        """The reduce prompt lists window summaries in order, followed by the summary request."""
+        windows = [{"start": 0, "end": 35, "summary": "A dog runs."}, {"start": 40, "end": 75, "summary": "A cat sleeps."}]
+        
+        prompt = get_reduce_prompt(windows, "Brief", False)
+        
+        self.assertLess(prompt.index("A dog runs."), prompt.index("A cat sleeps."))
+        self.assertIn("[0:40 - 1:15]", prompt)
+        self.assertIn("concise 2-3 sentence summary", prompt)
+    
+    @patch('video_summary.st')
+    @patch('video_summary.logger')
+    @patch('video_summary.model')
+    @patch('video_summary.summarization_mode', "Map-reduce")
+    @patch('video_summary.window_size', 3)
+    @patch('video_summary.model_concurrency', 2)
+    def test_map_reduce_summarizes_windows_then_reduces(self, mock_model, mock_logger, mock_st):
+        """Frames are summarized in windows and the window summaries combined in order."""
+        mock_model.bind.side_effect = lambda images: MagicMock(
+            invoke=MagicMock(return_value=f"window starting with {images[0].decode()}")
+        )
+        mock_model.invoke.return_value = "Final summary"
+        
+        result = describe_video(self.make_frames(7))
+        
+        self.assertEqual(result, "Final summary")
+        window_sizes = sorted(len(call.kwargs["images"]) for call in mock_model.bind.call_args_list)
+        self.assertEqual(window_sizes, [1, 3, 3])
+        reduce_prompt = mock_model.invoke.call_args[0][0]
+        self.assertLess(reduce_prompt.index("with frame0"), reduce_prompt.index("with frame3"))
+        self.assertLess(reduce_prompt.index("with frame3"), reduce_prompt.index("with frame6"))
+    
+    @patch('video_summary.st')
+    @patch('video_summary.logger')
+    @patch('video_summary.model')
+    @patch('video_summary.summarization_mode', "Auto")
+    @patch('video_summary.window_size', 8)
+    def test_auto_mode_single_pass_for_short_videos(self, mock_model, mock_logger, mock_st):
+        """Auto mode sends all frames in one call when they fit in one window."""
+        mock_model.bind.return_value.invoke.return_value = "Summary"
+        
+        result = describe_video(self.make_frames(4))
+        
+        self.assertEqual(result, "Summary")
+        mock_model.bind.assert_called_once()
+        mock_model.invoke.assert_not_called()
+    
+    @patch('video_summary.st')
+    @patch('video_summary.logger')
+    @patch('video_summary.model')
+    @patch('video_summary.summarization_mode', "Map-reduce")
+    @patch('video_summary.window_size', 2)
+    def test_shared_model_slots_bound_concurrent_map_reduce_jobs(self, mock_model, mock_logger, mock_st):
+        """Jobs running map-reduce at the same time stay within one shared model_concurrency."""
+        lock = threading.Lock()
+        calls = {"active": 0, "peak": 0}
+        
+        def slow_call(*args):
+            with lock:
+                calls["active"] += 1
+                calls["peak"] = max(calls["peak"], calls["active"])
+            time.sleep(0.02)
+            with lock:
+                calls["active"] -= 1
+            return "summary"
+        
+        mock_model.bind.return_value.invoke.side_effect = slow_call
+        mock_model.invoke.side_effect = slow_call
+        model_slots = threading.BoundedSemaphore(2)
+        
+        with patch('video_summary.model_concurrency', 2):
+            jobs = [threading.Thread(target=generate_summary, args=(self.make_frames(8),),
+                                     kwargs={"model_slots": model_slots}) for _ in range(3)]
+            for job in jobs:
+                job.start()
+            for job in jobs:
+                job.join()
+        
+        self.assertEqual(mock_model.bind.return_value.invoke.call_count, 12)
+        self.assertEqual(mock_model.invoke.call_count, 3)
+        self.assertEqual(calls["peak"], 2)
+    
+    @patch('video_summary.st')
+    @patch('video_summary.logger')
+    @patch('video_summary.model')
+    @patch('video_summary.summarization_mode', "Map-reduce")
+    @patch('video_summary.window_size', 2)
+    def test_map_reduce_window_failure(self, mock_model, mock_logger, mock_st):
+        """A failing window call is reported as an analysis error."""
+        mock_model.bind.return_value.invoke.side_effect = Exception("Model timeout")
+        
+        result = describe_video(self.make_frames(5))
+        
+        self.assertIn("Error: Could not analyze video", result)
+        mock_model.invoke.assert_not_called()
+
+
+class TestFrameDeduplication(unittest.TestCase):
+    """Tests for perceptual-hash near-duplicate removal."""
+    
+    def slide(self, text, shade=230):
+        frame = np.full((360, 640, 3), shade, dtype=np.uint8)
+        cv2.putText(frame, text, (40, 200), cv2.FONT_HERSHEY_SIMPLEX, 3, (0, 0, 0), 8)
+        return frame
+    
+    def test_hash_survives_compression_but_not_content_change(self):
+        """Re-encoded and slightly brighter copies hash alike; a new slide does not."""
+        original = difference_hash(self.slide("Intro"))
+        recompressed = jpeg_difference_hash(encode_jpeg(self.slide("Intro", shade=240), quality=40))
+        different = jpeg_difference_hash(encode_jpeg(self.slide("Results")))
+        
+        self.assertLessEqual(hamming_distance(original, recompressed), 5)
+        self.assertGreater(hamming_distance(original, different), 15)
+    
+    def test_near_duplicates_compares_with_last_kept(self):
+        """A slow drift is kept once it has moved far enough from the last kept frame."""
+        hashes = [0b0000, 0b0001, 0b0011, 0b0111, 0b1111]
+        
+        self.assertEqual(near_duplicates(hashes, max_distance=2), [1, 2, 4])
+        self.assertEqual(near_duplicates(hashes, max_distance=0), [])
+    
+    @patch('video_summary.logger')
+    def test_deduplicate_frames_drops_repeated_slides(self, mock_logger):
+        """Repeated slides are dropped and the kept frames stay in order."""
+        slides = ["Intro", "Intro", "Intro", "Results", "Results", "Intro"]
+        frames = [{"index": i, "timestamp": float(i), "jpeg": encode_jpeg(self.slide(text))}
+                  for i, text in enumerate(slides)]
+        
+        kept, removed = deduplicate_frames(frames, max_distance=10)
+        
+        self.assertEqual([frame["index"] for frame in kept], [0, 3, 5])
+        self.assertEqual(removed, 3)
+        self.assertIn("dhash", kept[0])
+
+
+class TestFramePreprocessing(unittest.TestCase):
+    """Tests for frame downscaling, cropping and JPEG quality."""
+    
+    def setUp(self):
+        # A 4K frame with a gradient so JPEG size depends on quality
+        gradient = np.tile(np.linspace(0, 255, 3840, dtype=np.uint8), (2160, 1))
+        self.frame = cv2.merge([gradient, gradient[::-1], np.full_like(gradient, 90)])
+    
+    def test_downscale_keeps_aspect_ratio(self):
+        """The longest edge is capped and the aspect ratio kept; small frames are not upscaled."""
+        self.assertEqual(preprocess_frame(self.frame, max_edge=1024).shape, (576, 1024, 3))
+        self.assertEqual(preprocess_frame(self.frame[:300, :400], max_edge=1024).shape, (300, 400, 3))
+    
+    def test_center_crop_and_letterbox(self):
+        """Both crop modes produce square frames; letterbox keeps the whole picture."""
+        center = preprocess_frame(self.frame, max_edge=896, crop="center")
+        letterbox = preprocess_frame(self.frame, max_edge=896, crop="letterbox")
+        
+        self.assertEqual(center.shape, (896, 896, 3))
+        self.assertEqual(letterbox.shape, (896, 896, 3))
+        # Black bars above and below the 16:9 picture
+        self.assertEqual(int(letterbox[:100].max()), 0)
+        self.assertGreater(int(letterbox[448].max()), 0)
+    
+    def test_quality_and_size_reduce_payload(self):
+        """Lower JPEG quality and a smaller max edge give smaller payloads."""
+        full = encode_jpeg(self.frame, quality=90, max_edge=None)
+        downscaled = encode_jpeg(self.frame, quality=90, max_edge=896)
+        low_quality = encode_jpeg(self.frame, quality=50, max_edge=896)
+        
+        self.assertLess(len(downscaled), len(full) / 4)
+        self.assertLess(len(low_quality), len(downscaled))
+        decoded = cv2.imdecode(np.frombuffer(downscaled, dtype=np.uint8), cv2.IMREAD_COLOR)
+        self.assertEqual(decoded.shape, (504, 896, 3))
+    
+    @patch('video_summary.st')
+    @patch('video_summary.logger')
+    @patch('video_summary.cv2.VideoCapture')
+    @patch('video_summary.encode_options', {"max_edge": 448, "quality": 60, "crop": "center"})
+    def test_extract_frames_applies_preprocessing(self, mock_video_capture, mock_logger, mock_st):
+        """extract_frames encodes frames with the configured preprocessing."""
+        mock_video = MagicMock()
+        mock_video_capture.return_value = mock_video
+        mock_video.isOpened.return_value = True
+        mock_video.get.side_effect = [30.0, 300]  # FPS, frame_count
+        mock_video.read.return_value = (True, self.frame)
+        
+        frames = extract_frames("./videos/test02.mp4", interval_seconds=5, decode_mode="seek")
+        
+        self.assertEqual(len(frames), 2)
+        decoded = cv2.imdecode(np.frombuffer(frames[0]["jpeg"], dtype=np.uint8), cv2.IMREAD_COLOR)
+        self.assertEqual(decoded.shape, (448, 448, 3))
+
+
+def write_test_video(path, scenes, fps=10, size=(120, 160)):
+    """Write make_scene_frames(scenes) to an MJPG AVI file."""
+    writer = cv2.VideoWriter(path, cv2.VideoWriter_fourcc(*"MJPG"), fps, (size[1], size[0]))
+    for frame in make_scene_frames(scenes, fps=fps, size=size):
+        writer.write(frame)
+    writer.release()
+    return path
+
+
+class TestBatchScheduler(unittest.TestCase):
+    """Tests for the batch extraction worker and scheduler."""
+    
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory)
+    
+    def test_extract_video_worker(self):
+        """The worker returns encoded frames in order and can drop duplicates."""
+        path = write_test_video(os.path.join(self.directory, "static.avi"), [(60, 4), (200, 4)])
+        
+        result = extract_video(path, interval_seconds=1, max_frames=20, decode_mode="scan",
+                               encode_options={"max_edge": 64}, max_duplicate_distance=40)
+        
+        self.assertEqual(result["frames"][0]["index"], 0)
+        self.assertEqual(len(result["frames"]) + result["duplicates_removed"], 8)
+        self.assertGreater(result["duplicates_removed"], 0)
+        self.assertGreater(result["seconds"], 0)
+        with self.assertRaises(ValueError):
+            extract_video(os.path.join(self.directory, "missing.avi"))
+    
+    def test_run_batch_records_status_timings_and_throughput(self):
+        """Every job ends done or failed with real timings; model calls stay bounded."""
+        paths = [write_test_video(os.path.join(self.directory, f"video{i}.avi"), [(40 + 60 * i, 3)])
+                 for i in range(3)]
+        jobs = [{"filename": os.path.basename(path), "path": path} for path in paths]
+        jobs.append({"filename": "missing.avi", "path": os.path.join(self.directory, "missing.avi")})
+        active, peak, lock = [0], [0], threading.Lock()
+        statuses = {}
+        
+        def summarize(frames):
+            with lock:
+                active[0] += 1
+                peak[0] = max(peak[0], active[0])
+            time.sleep(0.05)
+            with lock:
+                active[0] -= 1
+            return f"{len(frames)} frames"
+        
+        def on_update(job):
+            statuses.setdefault(job["filename"], []).append(job["status"])
+        
+        batch = run_batch(jobs, partial(extract_video, interval_seconds=1, max_frames=5), summarize,
+                          extraction_workers=2, inference_concurrency=1, on_update=on_update)
+        
+        self.assertEqual(batch["done"], 3)
+        self.assertEqual(batch["failed"], 1)
+        self.assertGreater(batch["videos_per_hour"], 0)
+        self.assertEqual(peak[0], 1)
+        for job in jobs[:3]:
+            self.assertEqual(job["status"], "done")
+            self.assertEqual(job["summary"], "3 frames")
+            self.assertGreater(job["summarize_seconds"], 0.04)
+            self.assertGreater(job["extract_seconds"], 0)
+            self.assertNotIn("frames", job)
+            self.assertEqual(statuses[job["filename"]][-2:], ["summarizing", "done"])
+        self.assertEqual(jobs[3]["status"], "failed")
+        self.assertIn("Could not open", jobs[3]["error"])
+
+
+
+class TestSummaryCache(unittest.TestCase):
+    """Tests for the content-addressed frame and summary cache."""
+    
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory)
+        self.cache = SummaryCache(self.directory)
+    
+    def make_frames(self, count):
+        return [{"index": i * 150, "timestamp": float(i * 5), "jpeg": f"frame{i}".encode(), "dhash": i}
+                for i in range(count)]
+    
+    def test_keys_depend_on_every_setting(self):
+        """Changing the video, a frame setting, the model or a summary option changes the key."""
+        settings = {"interval_seconds": 5, "max_frames": 20}
+        frames_key = SummaryCache.frames_key("sha", settings)
+        
+        self.assertEqual(frames_key, SummaryCache.frames_key("sha", dict(settings)))
+        self.assertNotEqual(frames_key, SummaryCache.frames_key("other", settings))
+        self.assertNotEqual(frames_key, SummaryCache.frames_key("sha", {**settings, "max_frames": 10}))
+        summary_key = SummaryCache.summary_key(frames_key, "llava", {"summary_length": "Brief"})
+        self.assertNotEqual(summary_key, SummaryCache.summary_key(frames_key, "llava", {"summary_length": "Detailed"}))
+        self.assertNotEqual(summary_key, SummaryCache.summary_key(frames_key, "bakllava", {"summary_length": "Brief"}))
+    
+    def test_round_trip(self):
+        """Frames, window summaries and summaries are returned as stored; misses return None."""
+        frames = self.make_frames(3)
+        window_key = SummaryCache.window_key("llava", "prompt", frames)
+        
+        self.assertIsNone(self.cache.get_frames("missing"))
+        self.assertIsNone(self.cache.get_window(window_key))
+        self.assertIsNone(self.cache.get_summary("missing"))
+        
+        self.cache.put_frames("key", frames)
+        self.cache.put_frames("key", self.make_frames(1))
+        self.cache.put_window(window_key, "A window")
+        self.cache.put_summary("key", "A summary", video_name="test.mp4")
+        
+        self.assertEqual(self.cache.get_frames("key"), frames)
+        self.assertEqual(self.cache.get_window(window_key), "A window")
+        self.assertNotEqual(window_key, SummaryCache.window_key("llava", "prompt", frames[:2]))
+        entry = self.cache.get_summary("key")
+        self.assertEqual(entry["summary"], "A summary")
+        self.assertEqual(entry["video_name"], "test.mp4")
+    
+    @patch('video_summary.st')
+    @patch('video_summary.logger')
+    @patch('video_summary.model')
+    @patch('video_summary.summarization_mode', "Map-reduce")
+    @patch('video_summary.window_size', 2)
+    def test_window_summaries_reused_across_summary_lengths(self, mock_model, mock_logger, mock_st):
+        """Only the reduce step runs again when the same frames are summarized with another length."""
+        mock_model.bind.return_value.invoke.return_value = "Window"
+        mock_model.invoke.side_effect = ["Brief summary", "Detailed summary"]
+        frames = self.make_frames(5)
+        
+        with patch('video_summary.summary_length', "Brief"):
+            self.assertEqual(describe_video(frames, self.cache), "Brief summary")
+        self.assertEqual(mock_model.bind.call_count, 3)
+        with patch('video_summary.summary_length', "Detailed"):
+            self.assertEqual(describe_video(frames, self.cache), "Detailed summary")
+        
+        self.assertEqual(mock_model.bind.call_count, 3)
+        self.assertEqual(mock_model.invoke.call_count, 2)
+    
+    @patch('video_summary.st')
+    @patch('video_summary.logger')
+    @patch('video_summary.model')
+    @patch('video_summary.summarization_mode', "Single pass")
+    def test_only_new_summaries_are_recorded_in_history(self, mock_model, mock_logger, mock_st):
+        """A summary served from the cache on a rerun adds no history row and runs no model."""
+        mock_model.bind.return_value.invoke.return_value = "Fresh summary"
+        history = ProcessingHistory(os.path.join(self.directory, "history.db"), legacy_json=None)
+        frames = self.make_frames(3)
+        key = SummaryCache.summary_key("frames-key", "llava", {"summary_length": "Brief"})
+        
+        with patch('video_summary.history_store', history), patch('video_summary.summary_cache', self.cache):
+            summary, _ = summarize_upload(frames, "video.mp4", time.time(), summary_key=key, store_summary=True)
+            self.assertEqual(summary, "Fresh summary")
+            
+            for _ in range(3):
+                summary, _ = summarize_upload(frames, "video.mp4", time.time(), self.cache.get_summary(key), key)
+                self.assertEqual(summary, "Fresh summary")
+        
+        mock_model.bind.assert_called_once()
+        self.assertEqual(history.totals()["count"], 1)
+    
+    @patch('video_summary.st')
+    @patch('video_summary.logger')
+    @patch('video_summary.model')
+    @patch('video_summary.summarization_mode', "Single pass")
+    def test_failed_summary_is_not_recorded(self, mock_model, mock_logger, mock_st):
+        """A model error is neither cached nor recorded in the history."""
+        mock_model.bind.return_value.invoke.side_effect = Exception("Model timeout")
+        history = ProcessingHistory(os.path.join(self.directory, "history.db"), legacy_json=None)
+        
+        with patch('video_summary.history_store', history), patch('video_summary.summary_cache', self.cache):
+            summary, _ = summarize_upload(self.make_frames(2), "video.mp4", time.time(), summary_key="key",
+                                          store_summary=True)
+        
+        self.assertTrue(summary.startswith("Error:"))
+        self.assertIsNone(self.cache.get_summary("key"))
+        self.assertEqual(history.totals()["count"], 0)
+
+
+class TestProcessingHistory(unittest.TestCase):
+    """Tests for the SQLite processing history."""
+    
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory)
+        self.path = os.path.join(self.directory, "history.db")
+    
+    def test_aggregates_per_model(self):
+        """Totals and per-model min/avg/max processing times are computed over all entries."""
+        history = ProcessingHistory(self.path, legacy_json=None)
+        self.assertEqual(history.totals()["count"], 0)
+        self.assertEqual(history.model_stats(), [])
+        for model, seconds in [("llava", 10.0), ("llava", 20.0), ("llava", 30.0), ("gemma3:27b", 5.0)]:
+            history.add("video.mp4", "summary", seconds, model)
+        
+        totals = ProcessingHistory(self.path, legacy_json=None).totals()
+        stats = history.model_stats()
+        
+        self.assertEqual(totals, {"count": 4, "min_time": 5.0, "avg_time": 16.25, "max_time": 30.0})
+        self.assertEqual([s["model_used"] for s in stats], ["llava", "gemma3:27b"])
+        self.assertEqual((stats[0]["count"], stats[0]["min_time"], stats[0]["avg_time"], stats[0]["max_time"]),
+                         (3, 10.0, 20.0, 30.0))
+    
+    def test_concurrent_saves_are_not_lost(self):
+        """Entries saved from several threads at once are all kept."""
+        history = ProcessingHistory(self.path, legacy_json=None)
+        threads = [threading.Thread(target=lambda i=i: [history.add(f"video_{i}_{n}.mp4", "s", 1.0, "llava")
+                                                        for n in range(10)])
+                   for i in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        
+        self.assertEqual(history.totals()["count"], 40)
+    
+    def test_imports_legacy_json_once(self):
+        """Entries of an old processing_history.json are imported on first use."""
+        legacy = os.path.join(self.directory, "processing_history.json")
+        with open(legacy, "w") as f:
+            json.dump([{"timestamp": "2024-01-15T10:30:00", "video_name": "old.mp4", "summary": "Old",
+                        "processing_time": 12.5, "model_used": "llava"}], f)
+        
+        ProcessingHistory(self.path, legacy_json=legacy)
+        history = ProcessingHistory(self.path, legacy_json=legacy)
+        
+        self.assertFalse(os.path.exists(legacy))
+        self.assertEqual(history.recent(), [{"timestamp": "2024-01-15T10:30:00", "video_name": "old.mp4",
+                                             "summary": "Old", "processing_time": 12.5, "model_used": "llava"}])
+
+
+
+class TestAudioTranscript(unittest.TestCase):
+    """Tests for the optional audio transcript branch."""
+    
+    def make_segments(self, starts, seconds=4):
+        return [{"start": float(start), "end": float(start + seconds), "text": f"words at {start}"} for start in starts]
+    
+    def test_split_audio_cuts_at_quiet_points(self):
+        """Chunks cover every sample and are cut in silence near the chunk length."""
+        rate = 1000
+        samples = np.ones(25 * rate, dtype=np.float32)
+        samples[9500:9700] = 0  # silence shortly before the 10 s mark
+        
+        chunks = split_audio(samples, chunk_seconds=10, sample_rate=rate)
+        
+        np.testing.assert_array_equal(np.concatenate([chunk for _, chunk in chunks]), samples)
+        self.assertTrue(9.5 <= chunks[1][0] <= 9.7)
+        self.assertTrue(all(len(chunk) <= 10 * rate for _, chunk in chunks))
+    
+    def test_transcribe_audio_offsets_segments(self):
+        """Segments of each chunk are shifted to video time and kept in order."""
+        class FakeSpeechModel:
+            def transcribe(self, samples, **options):
+                segment = MagicMock(start=1.0, end=2.0, text=f" {len(samples)} samples ")
+                return iter([segment, MagicMock(start=2.0, end=3.0, text=" ")]), None
+        progress = []
+        
+        samples = np.zeros(2500, dtype=np.float32)
+        chunks = split_audio(samples, chunk_seconds=1, sample_rate=1000)
+        
+        segments = transcribe_audio(samples, FakeSpeechModel(), chunk_seconds=1,
+                                    workers=2, sample_rate=1000, progress=lambda done, total: progress.append(total))
+        
+        self.assertEqual([segment["start"] for segment in segments], [offset + 1.0 for offset, _ in chunks])
+        self.assertEqual([segment["text"] for segment in segments], [f"{len(chunk)} samples" for _, chunk in chunks])
+        self.assertEqual(progress, [len(chunks)] * len(chunks))
+    
+    @unittest.skipIf(av is None, "PyAV not installed")
+    def test_extract_audio(self):
+        """The audio track is decoded to 16 kHz mono; videos without one return None."""
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        path = os.path.join(directory, "tone.mkv")
+        with av.open(path, "w") as container:
+            stream = container.add_stream("pcm_s16le", rate=44100, layout="stereo")
+            tone = (np.sin(np.arange(44100 * 2) * 2 * np.pi * 440 / 44100) * 10000).astype(np.int16)
+            frame = av.AudioFrame.from_ndarray(np.stack([tone, tone]).reshape(1, -1), format="s16", layout="stereo")
+            frame.sample_rate = 44100
+            for packet in list(stream.encode(frame)) + list(stream.encode()):
+                container.mux(packet)
+        
+        samples = extract_audio(path)
+        
+        self.assertEqual(samples.dtype, np.float32)
+        self.assertAlmostEqual(len(samples) / 16000, 2.0, delta=0.05)
+        self.assertIsNone(extract_audio(write_test_video(os.path.join(directory, "silent.avi"), [(80, 2)])))
+    
+    def test_segments_between_assigns_each_segment_once(self):
+        """Consecutive ranges split the transcript by segment midpoint."""
+        segments = self.make_segments([0, 5, 18])
+        
+        first, second = segments_between(segments, 0, 10), segments_between(segments, 10, math.inf)
+        
+        self.assertEqual([s["start"] for s in first], [0.0, 5.0])
+        self.assertEqual([s["start"] for s in second], [18.0])
+    
+    def test_format_transcript_compacts_and_covers_range(self):
+        """Segments are merged into timestamped lines; long transcripts keep evenly spaced lines."""
+        segments = self.make_segments(range(0, 600, 5))
+        
+        full = format_transcript(segments, max_chars=math.inf)
+        short = format_transcript(segments, max_chars=400)
+        
+        self.assertTrue(full.startswith("[0:00] words at 0 words at 5 words at 10\n[0:15] words at 15"))
+        self.assertLessEqual(len(short), 400)
+        self.assertIn("[0:00]", short)
+        self.assertIn("[5:", short)
+    
+    @patch('video_summary.st')
+    @patch('video_summary.logger')
+    @patch('video_summary.model')
+    @patch('video_summary.summarization_mode', "Auto")
+    @patch('video_summary.window_size', 8)
+    def test_long_transcript_is_split_over_windows(self, mock_model, mock_logger, mock_st):
+        """A transcript too long for one request is summarized in windows with their own speech."""
+        mock_model.bind.return_value.invoke.return_value = "Window"
+        mock_model.invoke.return_value = "Final summary"
+        frames = [{"index": i * 300, "timestamp": float(i * 10), "jpeg": b"jpeg"} for i in range(4)]
+        segments = [{"start": float(t), "end": float(t + 2), "text": "x" * 3000} for t in (1, 11, 21, 31)]
+        
+        result = describe_video(frames, transcript=segments)
+        
+        self.assertEqual(result, "Final summary")
+        prompts = [call.args[0] for call in mock_model.bind.return_value.invoke.call_args_list]
+        self.assertEqual(len(prompts), 4)
+        for prompt in prompts:
+            self.assertEqual(prompt.count("x" * 1500), 1)
+        self.assertTrue(any("[0:21]" in prompt for prompt in prompts))
+
+    
+    @patch('video_summary.st')
+    @patch('video_summary.logger')
+    @patch('video_summary.extract_audio')
+    def test_transcribe_video_distinguishes_no_audio_from_failure(self, mock_extract_audio, mock_logger, mock_st):
+        """No audio track gives an empty transcript, which can be cached; a failure gives None."""
+        mock_extract_audio.return_value = None
+        self.assertEqual(transcribe_video("video.mp4"), [])
+        
+        mock_extract_audio.side_effect = OSError("Invalid data found when processing input")
+        self.assertIsNone(transcribe_video("video.mp4"))
+        mock_st.warning.assert_called_once()
+    
+    @patch('video_summary.transcript_max_frames', 8)
+    @patch('video_summary.max_frames', 20)
+    def test_frame_budget_follows_transcript(self):
+        """Only an actual transcript reduces the frame budget and adds the speech model to the keys."""
+        self.assertEqual(frame_limit(has_transcript=True), 8)
+        self.assertEqual(frame_limit(has_transcript=False), 20)
+        self.assertEqual(frame_settings()["max_frames"], 20)
+        self.assertIsNone(summary_options()["speech_model"])
+        self.assertIsNotNone(summary_options(has_transcript=True)["speech_model"])
+
+
 if __name__ == '__main__':
     # Configure test runner
     unittest.main(verbosity=2, buffer=True)
\ No newline at end of file
@@ -0,0 +1,121 @@
+"""
+Audio track transcription for video summaries.
+
+The audio stream is decoded with PyAV to 16 kHz mono, split into chunks at
+quiet points, and the chunks are transcribed in parallel threads by a single
+faster-whisper model (Whisper on CTranslate2, int8 on the CPU). Segments keep
+their position in the video, so they can be aligned with frame timestamps.
+
+Both packages are optional; audio_available() tells whether they are
+installed. This module has no Streamlit dependency.
+"""
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+try:
+    import av
+except ImportError:  # Optional: only needed for transcription
+    av = None
+
+try:
+    from faster_whisper import WhisperModel
+except ImportError:  # Optional: only needed for transcription
+    WhisperModel = None
+
+SAMPLE_RATE = 16000
+SPEECH_MODELS = ["tiny", "base", "small", "medium"]
+
+
+def audio_available():
+    """Whether the optional packages for transcription are installed."""
+    return av is not None and WhisperModel is not None
+
+
+def extract_audio(video_path, sample_rate=SAMPLE_RATE):
+    """
+    Decode the first audio stream of a video to float32 mono samples at
+    sample_rate. Returns None if the video has no audio stream.
+    """
+    with av.open(video_path) as container:
+        if not container.streams.audio:
+            return None
+        resampler = av.AudioResampler(format="flt", layout="mono", rate=sample_rate)
+        chunks = []
+        for frame in container.decode(container.streams.audio[0]):
+            chunks.extend(resampled.to_ndarray().reshape(-1) for resampled in resampler.resample(frame))
+        # Flush samples buffered by the resampler
+        chunks.extend(resampled.to_ndarray().reshape(-1) for resampled in resampler.resample(None))
+    return np.concatenate(chunks) if chunks else np.zeros(0, dtype=np.float32)
+
+
+def split_audio(samples, chunk_seconds=30, sample_rate=SAMPLE_RATE, search_seconds=2.0):
+    """
+    Split samples into chunks of at most chunk_seconds, as (offset_seconds,
+    samples) pairs. Each cut is moved to the quietest 100 ms in the last
+    search_seconds of its chunk, so words are rarely split between chunks.
+    """
+    chunk = int(chunk_seconds * sample_rate)
+    search = min(int(search_seconds * sample_rate), chunk // 2)
+    window = max(1, sample_rate // 10)
+    chunks = []
+    start = 0
+    while len(samples) - start > chunk:
+        end = start + chunk
+        if search > window:
+            energy = np.cumsum(np.concatenate([[0.0], samples[end - search:end].astype(np.float64) ** 2]))
+            energy = energy[window:] - energy[:-window]
+            # Latest quietest point, so chunks stay as long as possible
+            quietest = len(energy) - 1 - int(np.argmin(energy[::-1]))
+            end = end - search + quietest + window // 2
+        chunks.append((start / sample_rate, samples[start:end]))
+        start = end
+    if start < len(samples):
+        chunks.append((start / sample_rate, samples[start:]))
+    return chunks
+
+
+def load_speech_model(size="base", workers=2):
+    """
+    faster-whisper model for the CPU. It serves workers transcriptions at a
+    time, splitting the CPU cores between them.
+    """
+    cpu_threads = max(1, (os.cpu_count() or 1) // workers)
+    return WhisperModel(size, device="cpu", compute_type="int8", cpu_threads=cpu_threads, num_workers=workers)
+
+
+def transcribe_chunk(model, chunk):
+    """Transcribe one (offset_seconds, samples) chunk into segments timed in video seconds."""
+    offset, samples = chunk
+    segments, _ = model.transcribe(samples, beam_size=1, vad_filter=True, condition_on_previous_text=False)
+    return [
+        {"start": offset + segment.start, "end": offset + segment.end, "text": segment.text.strip()}
+        for segment in segments
+        if segment.text.strip()
+    ]
+
+
+def transcribe_audio(samples, model, chunk_seconds=30, workers=2, sample_rate=SAMPLE_RATE, progress=None):
+    """
+    Transcribe samples in chunk_seconds chunks, workers at a time.
+
+    Returns a list of {"start", "end", "text"} segments in time order.
+    progress, if given, is called with (chunks done, total chunks).
+    """
+    chunks = split_audio(samples, chunk_seconds, sample_rate)
+    segments = []
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        for done, chunk_segments in enumerate(executor.map(lambda c: transcribe_chunk(model, c), chunks), start=1):
+            segments.extend(chunk_segments)
+            if progress:
+                progress(done, len(chunks))
+    return segments
+
+
+def segments_between(segments, start, end):
+    """
+    Segments whose midpoint lies in [start, end), so consecutive ranges split
+    the transcript without repeating a segment.
+    """
+    return [segment for segment in segments if start <= (segment["start"] + segment["end"]) / 2 < end]
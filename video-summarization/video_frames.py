@@ -0,0 +1,447 @@
+"""
+Frame sampling helpers used by video_summary.py.
+
+This module has no Streamlit dependency so the same code can run in the app
+and in worker processes. Functions report progress through optional
+callbacks and leave logging and UI updates to the caller.
+"""
+import heapq
+import math
+import multiprocessing
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import cv2
+import numpy as np
+
+DECODE_MODES = ["auto", "seek", "scan"]
+FRAME_MAX_EDGE = 1024  # frames are downscaled to this before they are encoded for the model
+CROP_MODES = ["none", "center", "letterbox"]
+HASH_SIZE = 16  # 256-bit dHash; 8x8 hashes cannot tell apart slides that only differ in their text
+
+
+def frame_signature(frame, size=(64, 36), bins=32):
+    """
+    Cheap content signature of a frame: a normalised grayscale histogram
+    computed on a heavily downscaled copy.
+    """
+    small = cv2.resize(frame, size, interpolation=cv2.INTER_AREA)
+    gray = cv2.cvtColor(small, cv2.COLOR_BGR2GRAY)
+    hist = cv2.calcHist([gray], [0], None, [bins], [0, 256])
+    return cv2.normalize(hist, hist, alpha=1.0, norm_type=cv2.NORM_L1).flatten()
+
+
+def signature_distance(a, b):
+    """Bhattacharyya distance between two signatures: 0 for identical, 1 for disjoint."""
+    return cv2.compareHist(a, b, cv2.HISTCMP_BHATTACHARYYA)
+
+
+def scene_keyframes(video, fps, frames_count, max_frames, threshold=0.3,
+                    analysis_fps=4.0, min_scene_seconds=1.0, progress=None):
+    """
+    Pick keyframes at scene changes in one sequential decode pass.
+
+    Signatures are computed on analysis_fps frames per second; the frames in
+    between are skipped with grab() and never converted. A frame becomes a
+    keyframe candidate when its signature has drifted at least threshold away
+    from the last keyframe, which catches hard cuts as well as gradual fades
+    and pans. The opening frame is always kept. If there are more candidates
+    than max_frames, the ones with the largest change are kept.
+
+    Args:
+        video: An opened cv2.VideoCapture positioned at the first frame
+        fps: Frames per second of the video
+        frames_count: Number of frames in the video
+        max_frames: Maximum number of keyframes to return
+        threshold: Minimum signature distance (0-1) that counts as a scene change
+        analysis_fps: Signatures computed per second of video
+        min_scene_seconds: Minimum time between two keyframes
+        progress: Optional callback receiving the number of frames processed
+
+    Returns:
+        List of (frame_index, frame) tuples in timestamp order.
+    """
+    candidates = scene_candidates(
+        video, fps, 0, frames_count, max_frames, threshold,
+        analysis_fps=analysis_fps, min_scene_seconds=min_scene_seconds, progress=progress
+    )
+    return sorted((index, frame) for _, index, frame in candidates)
+
+
+def scene_candidates(video, fps, start, stop, max_frames, threshold,
+                     analysis_fps=4.0, min_scene_seconds=1.0, keep_first=True, progress=None):
+    """
+    Scene-change candidates between frames start and stop, as (score, frame_index, frame).
+
+    The capture must be positioned at start. The first analysed frame is
+    used as the initial reference; it is only returned as a candidate when
+    keep_first is set (i.e. for the first segment of a video).
+    """
+    step = max(1, int(round(fps / analysis_fps)))
+    min_gap = max(1, int(fps * min_scene_seconds))
+    progress_every = max(step, (stop - start) // 100)
+
+    candidates = []  # min-heap of (score, frame_index, frame)
+    reference = None
+    last_keyframe = None
+
+    for index in range(start, stop):
+        if index % step:
+            if not video.grab():
+                break
+            continue
+
+        success, frame = video.read()
+        if not success or frame is None or frame.size == 0:
+            break
+
+        signature = frame_signature(frame)
+        if reference is None and not keep_first:
+            reference = signature
+            last_keyframe = index
+            continue
+
+        score = float("inf") if reference is None else signature_distance(reference, signature)
+        if score >= threshold and (last_keyframe is None or index - last_keyframe >= min_gap):
+            reference = signature
+            last_keyframe = index
+            if len(candidates) < max_frames:
+                heapq.heappush(candidates, (score, index, frame))
+            elif score > candidates[0][0]:
+                heapq.heapreplace(candidates, (score, index, frame))
+
+        if progress is not None and (index - start) % progress_every == 0:
+            progress(index)
+
+    return candidates
+
+
+def difference_hash(image, hash_size=HASH_SIZE):
+    """
+    Perceptual dHash of an image as a hash_size * hash_size bit integer.
+
+    Each bit records whether a pixel of a tiny grayscale copy is brighter
+    than its right-hand neighbour, so the hash survives compression noise
+    and small changes in brightness but not a change of content.
+    """
+    if image.ndim == 3:
+        image = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
+    small = cv2.resize(image, (hash_size + 1, hash_size), interpolation=cv2.INTER_AREA)
+    bits = small[:, 1:] > small[:, :-1]
+    return int.from_bytes(np.packbits(bits).tobytes(), "big")
+
+
+def jpeg_difference_hash(jpeg, hash_size=HASH_SIZE):
+    """dHash of JPEG bytes, decoded at 1/8 scale in grayscale, which is much cheaper than a full decode."""
+    image = cv2.imdecode(np.frombuffer(jpeg, dtype=np.uint8), cv2.IMREAD_REDUCED_GRAYSCALE_8)
+    return difference_hash(image, hash_size)
+
+
+def hamming_distance(a, b):
+    """Number of differing bits between two hashes."""
+    return bin(a ^ b).count("1")
+
+
+def near_duplicates(hashes, max_distance):
+    """
+    Indices of hashes within max_distance bits of the previous kept hash.
+
+    The first hash is always kept. Comparing against the last kept frame
+    rather than the immediately preceding one means a slow drift is
+    eventually kept instead of being dropped frame by frame.
+    """
+    duplicates = []
+    kept = None
+    for i, current in enumerate(hashes):
+        if kept is not None and hamming_distance(kept, current) <= max_distance:
+            duplicates.append(i)
+        else:
+            kept = current
+    return duplicates
+
+
+def drop_near_duplicates(frames, max_distance):
+    """
+    Remove frames (dicts with "jpeg" bytes) that are near-duplicates of the
+    previous kept frame. Adds a "dhash" entry to each frame and returns the
+    kept frames and the number removed.
+    """
+    for frame in frames:
+        frame.setdefault("dhash", jpeg_difference_hash(frame["jpeg"]))
+    duplicates = set(near_duplicates([frame["dhash"] for frame in frames], max_distance))
+    return [frame for i, frame in enumerate(frames) if i not in duplicates], len(duplicates)
+
+
+def measure_seek_cost(video, frames_count, samples=8, probes=(0.3, 0.5, 0.7)):
+    """
+    Estimate what one random seek costs, in units of sequentially grabbed frames.
+
+    A seek makes the decoder jump back to the previous keyframe and decode
+    forward to the target, so on average it costs about half a GOP of
+    decoding. Measuring it directly accounts for the real GOP length and the
+    codec's decode speed. Seeks are probed at a few positions, since a single
+    probe may land on a keyframe. Leaves the capture at the first frame.
+    """
+    video.set(cv2.CAP_PROP_POS_FRAMES, 0)
+    start = time.perf_counter()
+    grabbed = 0
+    for _ in range(samples):
+        if not video.grab():
+            break
+        grabbed += 1
+    grab_cost = (time.perf_counter() - start) / max(grabbed, 1)
+
+    start = time.perf_counter()
+    for fraction in probes:
+        video.set(cv2.CAP_PROP_POS_FRAMES, int(frames_count * fraction))
+        video.read()
+    seek_cost = (time.perf_counter() - start) / len(probes)
+
+    video.set(cv2.CAP_PROP_POS_FRAMES, 0)
+    if grab_cost <= 0:
+        return float("inf")
+    return seek_cost / grab_cost
+
+
+def choose_decode_mode(video, frames_count, step):
+    """
+    Pick "scan" when stepping through the gap sequentially is cheaper than a
+    seek, i.e. when the sampling step is short compared with the GOP, and
+    "seek" otherwise.
+    """
+    if step <= 1:
+        return "scan"
+    return "scan" if step <= measure_seek_cost(video, frames_count) else "seek"
+
+
+def plan_targets(frames_count, step, max_frames):
+    """
+    Frame indices to extract: every step-th frame, capped at max_frames.
+
+    This is the extraction budget; readers never go past the planned
+    targets, however many reads fail.
+    """
+    return list(range(0, frames_count, max(1, step)))[:max_frames]
+
+
+def read_targets(video, targets, mode="seek"):
+    """
+    Yield (frame_index, frame) for each of the ascending target indices.
+
+    In "seek" mode the capture is repositioned before each target frame. In
+    "scan" mode the video is read sequentially from the first target: frames
+    in between are only grabbed (demuxed and decoded, but never converted to
+    images) and only the targets are retrieved. frame is None when a target
+    could not be read or is empty; in "scan" mode reading stops at the end of
+    the stream.
+    """
+    if mode == "seek":
+        for index in targets:
+            video.set(cv2.CAP_PROP_POS_FRAMES, index)
+            success, frame = video.read()
+            yield index, frame if success and frame.size > 0 else None
+        return
+
+    position = 0
+    for index in targets:
+        if position == 0 and index > 0:
+            # Jump once to the start of this segment, then read sequentially
+            video.set(cv2.CAP_PROP_POS_FRAMES, index)
+            position = index
+        while position < index:
+            if not video.grab():
+                return
+            position += 1
+        success, frame = video.read()
+        if not success:
+            return
+        position += 1
+        yield index, frame if frame.size > 0 else None
+
+
+def preprocess_frame(frame, max_edge=FRAME_MAX_EDGE, crop="none"):
+    """
+    Prepare a frame for the model: optionally make it square, and downscale
+    it so its longest edge is at most max_edge.
+
+    crop="center" keeps the central square (a free slice, done before
+    resizing); crop="letterbox" pads the resized frame to a square with
+    black bars, so nothing is cut off. Frames are never upscaled.
+    """
+    height, width = frame.shape[:2]
+    if crop == "center" and height != width:
+        side = min(height, width)
+        top, left = (height - side) // 2, (width - side) // 2
+        frame = frame[top:top + side, left:left + side]
+        height = width = side
+
+    if max_edge and max(height, width) > max_edge:
+        scale = max_edge / max(height, width)
+        size = (max(1, round(width * scale)), max(1, round(height * scale)))
+        frame = cv2.resize(frame, size, interpolation=cv2.INTER_AREA)
+        width, height = size
+
+    if crop == "letterbox" and height != width:
+        side = max(height, width)
+        top, left = (side - height) // 2, (side - width) // 2
+        frame = cv2.copyMakeBorder(frame, top, side - height - top, left, side - width - left,
+                                   cv2.BORDER_CONSTANT, value=0)
+    return frame
+
+
+def encode_jpeg(frame, quality=90, max_edge=FRAME_MAX_EDGE, crop="none"):
+    """
+    Preprocess a frame (see preprocess_frame) and JPEG-encode it at the
+    given quality. Returns the bytes, or None if encoding failed.
+    """
+    frame = preprocess_frame(frame, max_edge, crop)
+    success, buffer = cv2.imencode(".jpg", frame, [cv2.IMWRITE_JPEG_QUALITY, quality])
+    return buffer.tobytes() if success else None
+
+
+def split_evenly(items, parts):
+    """Split a list into at most parts contiguous, non-empty chunks of similar size."""
+    parts = max(1, min(parts, len(items)))
+    size, remainder = divmod(len(items), parts)
+    chunks, start = [], 0
+    for part in range(parts):
+        end = start + size + (1 if part < remainder else 0)
+        chunks.append(items[start:end])
+        start = end
+    return [chunk for chunk in chunks if chunk]
+
+
+def extract_segment(video_path, targets, mode="seek", encode_options=None):
+    """
+    Worker: open an independent capture and return [(frame_index, jpeg_bytes)]
+    for the given targets. encode_options are keyword arguments for encode_jpeg.
+    """
+    video = cv2.VideoCapture(video_path)
+    try:
+        frames = []
+        for index, frame in read_targets(video, targets, mode):
+            if frame is None:
+                continue
+            jpeg = encode_jpeg(frame, **(encode_options or {}))
+            if jpeg is not None:
+                frames.append((index, jpeg))
+        return frames
+    finally:
+        video.release()
+
+
+def scene_segment(video_path, fps, start, stop, max_frames, threshold,
+                  analysis_fps=4.0, min_scene_seconds=1.0, encode_options=None):
+    """
+    Worker: scene-change candidates between frames start and stop, as
+    [(score, frame_index, jpeg_bytes)].
+    """
+    video = cv2.VideoCapture(video_path)
+    try:
+        if start > 0:
+            video.set(cv2.CAP_PROP_POS_FRAMES, start)
+        candidates = scene_candidates(
+            video, fps, start, stop, max_frames, threshold,
+            analysis_fps=analysis_fps, min_scene_seconds=min_scene_seconds, keep_first=(start == 0)
+        )
+        return [(score, index, encode_jpeg(frame, **(encode_options or {}))) for score, index, frame in candidates]
+    finally:
+        video.release()
+
+
+def process_pool(workers):
+    """Process pool for frame extraction workers."""
+    # Spawned workers only import the worker's module, never the Streamlit script
+    return ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn"))
+
+
+def _run_segments(worker, jobs, progress=None):
+    """Run worker(*job) for each job in a process pool and collect all results."""
+    results = []
+    if not jobs:
+        return results
+    with process_pool(len(jobs)) as pool:
+        futures = [pool.submit(worker, *job) for job in jobs]
+        for done, future in enumerate(as_completed(futures), start=1):
+            results.extend(future.result())
+            if progress is not None:
+                progress(done, len(futures))
+    return results
+
+
+def extract_targets_parallel(video_path, targets, mode, workers, progress=None, encode_options=None):
+    """
+    Extract the targets with one capture per process, each handling a
+    contiguous segment of the timeline.
+
+    Returns [(frame_index, jpeg_bytes)] in timestamp order. progress, if
+    given, is called with (segments_done, segments_total).
+    """
+    jobs = [(video_path, segment, mode, encode_options) for segment in split_evenly(targets, workers)]
+    return sorted(_run_segments(extract_segment, jobs, progress))
+
+
+def scene_keyframes_parallel(video_path, fps, frames_count, max_frames, threshold, workers,
+                             analysis_fps=4.0, min_scene_seconds=1.0, progress=None, encode_options=None):
+    """
+    Parallel version of scene_keyframes over contiguous segments of the video.
+
+    Each segment starts from its own reference frame, so a cut falling
+    exactly on a segment boundary may be missed. The strongest max_frames
+    candidates over all segments are kept. Returns [(frame_index, jpeg_bytes)]
+    in timestamp order.
+    """
+    step = max(1, int(round(fps / analysis_fps)))
+    # Align segment boundaries with the analysis grid of a sequential pass
+    length = math.ceil(math.ceil(frames_count / max(1, workers)) / step) * step
+    jobs = [
+        (video_path, fps, start, min(start + length, frames_count), max_frames, threshold,
+         analysis_fps, min_scene_seconds, encode_options)
+        for start in range(0, frames_count, max(step, length))
+    ]
+    candidates = _run_segments(scene_segment, jobs, progress)
+    best = heapq.nlargest(max_frames, candidates, key=lambda candidate: candidate[0])
+    return sorted((index, jpeg) for _, index, jpeg in best if jpeg is not None)
+
+
+def extract_video(video_path, interval_seconds=5, max_frames=20, sampling="interval", decode_mode="auto",
+                  scene_threshold=0.3, encode_options=None, max_duplicate_distance=None):
+    """
+    Worker: extract, encode and (optionally) deduplicate the frames of one
+    video in a single process, as batch jobs do.
+
+    Returns a dict with the frames ({"index", "timestamp", "jpeg"} dicts in
+    timestamp order), the number of duplicates removed and the seconds
+    spent. Raises ValueError if the video cannot be read.
+    """
+    start = time.perf_counter()
+    video = cv2.VideoCapture(video_path)
+    try:
+        if not video.isOpened():
+            raise ValueError(f"Could not open video file {video_path}")
+        fps = video.get(cv2.CAP_PROP_FPS)
+        frames_count = int(video.get(cv2.CAP_PROP_FRAME_COUNT))
+        if fps <= 0:
+            raise ValueError(f"Could not determine FPS of {video_path}")
+        fps = int(fps)
+
+        if sampling == "scene":
+            sampled = scene_keyframes(video, fps, frames_count, max_frames, threshold=scene_threshold)
+        else:
+            step = fps * interval_seconds
+            if decode_mode == "auto":
+                decode_mode = choose_decode_mode(video, frames_count, step)
+            sampled = read_targets(video, plan_targets(frames_count, step, max_frames), decode_mode)
+
+        frames = []
+        for index, frame in sampled:
+            jpeg = None if frame is None else encode_jpeg(frame, **(encode_options or {}))
+            if jpeg is not None:
+                frames.append({"index": index, "timestamp": index / fps, "jpeg": jpeg})
+    finally:
+        video.release()
+
+    duplicates_removed = 0
+    if max_duplicate_distance is not None:
+        frames, duplicates_removed = drop_near_duplicates(frames, max_duplicate_distance)
+    return {"frames": frames, "duplicates_removed": duplicates_removed, "seconds": time.perf_counter() - start}
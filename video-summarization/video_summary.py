@@ -1,13 +1,36 @@
 import os
+import hashlib
 import logging
+import math
+import threading
 import time
-import json
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import nullcontext
 from datetime import datetime
+from functools import partial
 
 import cv2
 import streamlit as st
 from langchain_ollama.llms import OllamaLLM
 
+from batch_scheduler import run_batch
+from processing_history import ProcessingHistory
+from summary_cache import SummaryCache
+from video_audio import (
+    SAMPLE_RATE,
+    SPEECH_MODELS,
+    audio_available,
+    extract_audio,
+    load_speech_model,
+    segments_between,
+    transcribe_audio,
+)
+from video_frames import (
+    CROP_MODES, DECODE_MODES, choose_decode_mode, drop_near_duplicates, encode_jpeg, extract_targets_parallel,
+    extract_video, plan_targets, read_targets, scene_keyframes, scene_keyframes_parallel
+)
+
 # Configure Streamlit page
 st.set_page_config(
     page_title="Video Summarization App",
@@ -19,6 +42,14 @@ st.set_page_config(
 videos_directory = 'videos/'
 frames_directory = 'frames/'
 logs_directory = 'logs/'
+cache_directory = 'cache/'
+history_database = 'processing_history.db'
+PARALLEL_MIN_SECONDS = 120  # shorter videos are not worth starting worker processes for
+DEFAULT_SECONDS_PER_FRAME = 2.0  # model time per frame until one has been measured in this session
+UPLOAD_CHUNK_BYTES = 8 * 1024 * 1024  # uploads are written to disk in chunks of this size
+TRANSCRIPT_MAX_CHARS = 8000  # transcript sent with a single-pass summary
+TRANSCRIPT_WINDOW_CHARS = 2000  # transcript sent with each map-reduce window
+TRANSCRIPT_LINE_SECONDS = 15  # transcript segments are merged into lines starting at most this far apart
 
 # Configure logging
 os.makedirs(logs_directory, exist_ok=True)
@@ -39,6 +70,51 @@ st.sidebar.title("⚙️ Settings")
 st.sidebar.subheader("Frame Extraction")
 interval_seconds = st.sidebar.slider("Frame Interval (seconds)", 1, 30, 5)
 max_frames = st.sidebar.slider("Max Frames", 5, 50, 20)
+sampling_modes = {"Fixed interval": "interval", "Scene changes": "scene"}
+sampling_mode = st.sidebar.selectbox(
+    "Sampling Mode",
+    list(sampling_modes),
+    help="Scene changes keeps one frame per shot, so static segments cost fewer frames than fast cuts"
+)
+scene_threshold = st.sidebar.slider(
+    "Scene Change Threshold", 0.1, 0.9, 0.3, 0.05,
+    help="How different a frame must be from the previous keyframe to start a new scene"
+)
+decode_mode = st.sidebar.selectbox(
+    "Decode Mode",
+    DECODE_MODES,
+    help="seek jumps to each frame; scan reads the video sequentially and only decodes the frames it needs; "
+         "auto measures which is cheaper for this video"
+)
+extraction_workers = st.sidebar.slider(
+    "Extraction Processes", 1, max(2, os.cpu_count() or 1), min(4, os.cpu_count() or 1),
+    help="Longer videos are split into this many segments that are decoded in parallel"
+)
+remove_duplicates = st.sidebar.checkbox(
+    "Remove Near-Duplicate Frames", value=True,
+    help="Drop frames that look the same as the previous kept frame (slides, static shots)"
+)
+duplicate_threshold = st.sidebar.slider(
+    "Duplicate Threshold (bits)", 0, 64, 10,
+    help="Frames whose 256-bit perceptual hash differs from the previous kept frame by at most this many bits are dropped"
+)
+save_frames_to_disk = st.sidebar.checkbox(
+    "Save Frames to Disk", value=False,
+    help="Keep a copy of each job's frames in its own folder under frames/"
+)
+
+# Frame preprocessing settings
+st.sidebar.subheader("Frame Preprocessing")
+max_frame_edge = st.sidebar.select_slider(
+    "Max Frame Edge (px)", [336, 448, 672, 896, 1024, 1344, 2048], value=1024,
+    help="Frames are downscaled to this before encoding; the model's vision encoder resizes larger frames anyway"
+)
+jpeg_quality = st.sidebar.slider("JPEG Quality", 40, 100, 90, 5)
+crop_mode = st.sidebar.selectbox(
+    "Crop", CROP_MODES,
+    help="center keeps the central square; letterbox pads to a square so nothing is cut off"
+)
+encode_options = {"max_edge": max_frame_edge, "quality": jpeg_quality, "crop": crop_mode}
 
 # Model settings
 st.sidebar.subheader("AI Model")
@@ -49,8 +125,45 @@ selected_model = st.sidebar.selectbox("Select Model", available_models, index=0)
 st.sidebar.subheader("Summary Options")
 summary_length = st.sidebar.radio("Summary Length", ["Brief", "Detailed", "Comprehensive"])
 include_timestamps = st.sidebar.checkbox("Include Timestamps", value=False)
+summarization_mode = st.sidebar.selectbox(
+    "Summarization Mode", ["Auto", "Single pass", "Map-reduce"],
+    help="Map-reduce summarizes windows of frames separately, then combines the window summaries; "
+         "Auto uses it when there are more frames than fit in one window"
+)
+window_size = st.sidebar.slider("Frames per Window", 2, 16, 8)
+use_cache = st.sidebar.checkbox(
+    "Use Cache", value=True,
+    help="Reuse frames and summaries of videos already processed with the same settings"
+)
+model_concurrency = st.sidebar.slider(
+    "Parallel Model Calls", 1, 8, 2,
+    help="Model requests in flight at the same time, across map-reduce windows and batch jobs; "
+         "match the server's OLLAMA_NUM_PARALLEL"
+)
+
+# Audio transcript settings
+st.sidebar.subheader("Audio Transcript")
+use_transcript = st.sidebar.checkbox(
+    "Transcribe Audio", value=False, disabled=not audio_available(),
+    help="Transcribe speech on the CPU and summarize it together with the frames" if audio_available()
+    else "Install faster-whisper to transcribe the audio track"
+)
+speech_model_size = st.sidebar.selectbox(
+    "Speech Model", SPEECH_MODELS, index=1,
+    help="Larger Whisper models are more accurate and slower"
+)
+transcript_max_frames = st.sidebar.slider(
+    "Max Frames with Transcript", 2, 50, 8,
+    help="With a transcript, far fewer frames are needed to follow talks and interviews"
+)
+transcription_workers = st.sidebar.slider(
+    "Parallel Transcription Chunks", 1, max(2, os.cpu_count() or 1), min(2, os.cpu_count() or 1),
+    help="30-second chunks of audio transcribed at the same time, sharing the CPU cores"
+)
 
 model = OllamaLLM(model=selected_model)
+summary_cache = SummaryCache(cache_directory)
+history_store = ProcessingHistory(history_database)
 
 # Log application startup
 logger.info("Video Summarization Application Started")
@@ -58,30 +171,8 @@ logger.info(f"Configured directories - Videos: {videos_directory}, Frames: {fram
 logger.info(f"Using model: {selected_model}")
 
 def save_processing_history(video_name, summary, processing_time, model_used):
-    """Save processing history to JSON file."""
-    history_file = "processing_history.json"
-    
-    entry = {
-        "timestamp": datetime.now().isoformat(),
-        "video_name": video_name,
-        "summary": summary,
-        "processing_time": processing_time,
-        "model_used": model_used
-    }
-    
-    if os.path.exists(history_file):
-        with open(history_file, 'r') as f:
-            history = json.load(f)
-    else:
-        history = []
-    
-    history.append(entry)
-    
-    # Keep only last 50 entries
-    history = history[-50:]
-    
-    with open(history_file, 'w') as f:
-        json.dump(history, f, indent=2)
+    """Append an entry to the processing history."""
+    history_store.add(video_name, summary, processing_time, model_used)
 
 def export_summary(summary, video_name, processing_time, model_used):
     """Create exportable summary report."""
@@ -102,40 +193,33 @@ Generated by Video Summarization App
 """
     return report
 
-def display_extracted_frames():
+def display_extracted_frames(frames):
     """Display thumbnails of extracted frames."""
-    if os.path.exists(frames_directory):
-        frame_files = sorted([f for f in os.listdir(frames_directory) if f.endswith('.jpg')])
+    if frames:
+        st.markdown("### 🖼️ Extracted Frames")
+        cols = st.columns(min(len(frames), 4))
         
-        if frame_files:
-            st.markdown("### 🖼️ Extracted Frames")
-            cols = st.columns(min(len(frame_files), 4))
-            
-            for i, frame_file in enumerate(frame_files[:8]):  # Show max 8 frames
-                with cols[i % 4]:
-                    frame_path = os.path.join(frames_directory, frame_file)
-                    st.image(frame_path, caption=f"Frame {i+1}", use_container_width=True)
+        for i, frame in enumerate(frames[:8]):  # Show max 8 frames
+            with cols[i % 4]:
+                st.image(frame["jpeg"], caption=f"Frame {i+1} ({frame['timestamp']:.0f}s)", use_container_width=True)
 
 def display_processing_history():
     """Display recent processing history in sidebar."""
     st.sidebar.subheader("📊 Recent Summaries")
-    if os.path.exists("processing_history.json"):
-        with open("processing_history.json", 'r') as f:
-            history = json.load(f)
-        
-        if history:
-            for entry in reversed(history[-5:]):  # Show last 5, most recent first
-                with st.sidebar.expander(f"{entry['video_name'][:15]}..."):
-                    st.write(f"**Date:** {entry['timestamp'][:10]}")
-                    st.write(f"**Time:** {entry['processing_time']:.1f}s")
-                    st.write(f"**Model:** {entry.get('model_used', 'N/A')}")
-                    st.write(f"**Summary:** {entry['summary'][:100]}...")
+    history = history_store.recent(5)
+    if history:
+        for entry in history:  # Most recent first
+            with st.sidebar.expander(f"{entry['video_name'][:15]}..."):
+                st.write(f"**Date:** {entry['timestamp'][:10]}")
+                st.write(f"**Time:** {entry['processing_time']:.1f}s")
+                st.write(f"**Model:** {entry['model_used']}")
+                st.write(f"**Summary:** {entry['summary'][:100]}...")
     else:
         st.sidebar.info("No processing history yet.")
 
-def get_summary_prompt(length, include_timestamps):
+def get_summary_prompt(length, include_timestamps,
+                       base_prompt="Analyze the video content from these frames and provide"):
     """Generate summary prompt based on user preferences."""
-    base_prompt = "Analyze the video content from these frames and provide"
     
     if length == "Brief":
         prompt = f"{base_prompt} a concise 2-3 sentence summary."
@@ -149,48 +233,334 @@ def get_summary_prompt(length, include_timestamps):
     
     return prompt
 
-def upload_video(file):
-    """Upload video file to videos directory."""
+def format_timestamp(seconds):
+    """Format a position in the video as m:ss."""
+    minutes, seconds = divmod(int(seconds), 60)
+    return f"{minutes}:{seconds:02d}"
+
+def format_transcript(segments, max_chars=TRANSCRIPT_MAX_CHARS):
+    """
+    Compact transcript text: segments merged into "[m:ss] text" lines that
+    start at most TRANSCRIPT_LINE_SECONDS apart. If the text is longer than
+    max_chars, evenly spaced lines are kept, so the whole range stays covered.
+    """
+    lines = []
+    line_start = None
+    for segment in segments:
+        if line_start is None or segment["start"] - line_start >= TRANSCRIPT_LINE_SECONDS:
+            lines.append(f"[{format_timestamp(segment['start'])}] {segment['text']}")
+            line_start = segment["start"]
+        else:
+            lines[-1] += f" {segment['text']}"
+    text = "\n".join(lines)
+    if len(text) > max_chars:
+        keep = max(1, len(lines) * max_chars // len(text))
+        step = len(lines) / keep
+        text = "\n".join(lines[int(i * step)] for i in range(keep))[:max_chars]
+    return text
+
+def get_window_prompt(start_seconds, end_seconds, transcript=""):
+    """
+    Prompt for the map stage: describe one window of consecutive frames,
+    with what is said during the window if there is a transcript.
+
+    It deliberately does not depend on the summary options, so window
+    summaries can be reused whatever final summary is requested.
+    """
+    prompt = (
+        f"These are consecutive frames from {format_timestamp(start_seconds)} to "
+        f"{format_timestamp(end_seconds)} of a video. Describe what happens in this segment: "
+        "the setting, people, objects, actions and any visible text. Be factual and concise."
+    )
+    if transcript:
+        prompt += f" Use this transcript of what is said during the segment as well:\n{transcript}"
+    return prompt
+
+def get_reduce_prompt(window_summaries, length, include_timestamps):
+    """Prompt for the reduce stage: combine window summaries into the final summary."""
+    segments = "\n\n".join(
+        f"[{format_timestamp(window['start'])} - {format_timestamp(window['end'])}] {window['summary']}"
+        for window in window_summaries
+    )
+    base_prompt = "Based on these descriptions of consecutive segments of a video, provide"
+    return f"{segments}\n\n{get_summary_prompt(length, include_timestamps, base_prompt=base_prompt)}"
+
+def transcript_chars(transcript):
+    """Approximate length of a transcript as prompt text."""
+    return sum(len(segment["text"]) + 1 for segment in transcript or [])
+
+def use_map_reduce(frames_count, transcript=None):
+    """
+    Whether describe_video should summarize in windows for this many frames
+    (and this transcript, which may not fit in a single request).
+    """
+    if summarization_mode == "Auto":
+        return frames_count > window_size or transcript_chars(transcript) > TRANSCRIPT_MAX_CHARS
+    return summarization_mode == "Map-reduce"
+
+def model_slot(model_slots=None):
+    """Hold one of the shared model_slots (a semaphore), if given, around a model call."""
+    return model_slots if model_slots is not None else nullcontext()
+
+def summarize_window(frames, transcript="", cache=None, model_slots=None):
+    """Map stage for one window of frames. Returns its summary and timing."""
+    start_time = time.time()
+    start, end = frames[0]["timestamp"], frames[-1]["timestamp"]
+    prompt = get_window_prompt(start, end, transcript)
+    key = cache.window_key(selected_model, prompt, frames) if cache else None
+    summary = cache.get_window(key) if cache else None
+    cached = summary is not None
+    if not cached:
+        with model_slot(model_slots):
+            summary = model.bind(images=[frame["jpeg"] for frame in frames]).invoke(prompt)
+        if cache:
+            cache.put_window(key, summary)
+    return {"start": start, "end": end, "summary": summary, "duration": time.time() - start_time, "cached": cached}
+
+def summarize_map_reduce(frames, cache=None, transcript=None, model_slots=None):
+    """
+    Summarize frames in windows of window_size frames, model_concurrency at
+    a time, then reduce the window summaries into the final summary. With
+    model_slots, every model call also holds one of the slots, so concurrent
+    jobs sharing them stay within model_concurrency requests in total.
+
+    Each model call sees a bounded number of images, so the cost grows
+    linearly with the number of frames instead of with one ever larger
+    request. With a cache, window summaries are reused across summary options.
+
+    With a transcript, each window also gets the speech from its first frame
+    to the next window's first frame, and windows are made smaller when
+    needed so that speech fits in TRANSCRIPT_WINDOW_CHARS.
+    """
+    size = window_size
+    if transcript:
+        needed_windows = math.ceil(transcript_chars(transcript) / TRANSCRIPT_WINDOW_CHARS)
+        size = max(1, min(window_size, math.ceil(len(frames) / needed_windows)))
+    windows = [frames[i:i + size] for i in range(0, len(frames), size)]
+    bounds = [0] + [window[0]["timestamp"] for window in windows[1:]] + [math.inf]
+    window_transcripts = [
+        format_transcript(segments_between(transcript or [], bounds[i], bounds[i + 1]), TRANSCRIPT_WINDOW_CHARS)
+        for i in range(len(windows))
+    ]
+    logger.info(f"Map-reduce over {len(windows)} windows of up to {size} frames, {model_concurrency} at a time")
+
+    map_start = time.time()
+    with ThreadPoolExecutor(max_workers=model_concurrency) as executor:
+        window_summaries = list(executor.map(
+            partial(summarize_window, cache=cache, model_slots=model_slots), windows, window_transcripts
+        ))
+    map_duration = time.time() - map_start
+    for i, window in enumerate(window_summaries, start=1):
+        logger.info(f"Window {i}/{len(windows)} ({format_timestamp(window['start'])}-"
+                    f"{format_timestamp(window['end'])}) summarized in {window['duration']:.2f}s"
+                    f"{' (cached)' if window['cached'] else ''}")
+
+    reduce_start = time.time()
+    with model_slot(model_slots):
+        summary = model.invoke(get_reduce_prompt(window_summaries, summary_length, include_timestamps))
+    reduce_duration = time.time() - reduce_start
+
+    logger.info(f"Map stage: {map_duration:.2f}s for {len(windows)} windows "
+                f"(sum of window times {sum(w['duration'] for w in window_summaries):.2f}s), "
+                f"reduce stage: {reduce_duration:.2f}s")
+    return summary
+
+def generate_summary(frames, cache=None, transcript=None, model_slots=None):
+    """
+    Summarize frames, and the transcript segments if given, with the model,
+    in one request or with map-reduce (see use_map_reduce). Model errors are
+    raised. This does not touch the UI, so batch jobs can call it from
+    worker threads; they share model_slots to bound the requests in flight.
+    """
+    if use_map_reduce(len(frames), transcript):
+        return summarize_map_reduce(frames, cache, transcript, model_slots)
+
+    model_with_images = model.bind(images=[frame["jpeg"] for frame in frames])
+    logger.info("Invoking AI model for video summarization")
+    model_start_time = time.time()
+    
+    # Use custom prompt based on user preferences
+    custom_prompt = get_summary_prompt(summary_length, include_timestamps)
+    if transcript:
+        base_prompt = "Analyze the video content from these frames and this transcript of its audio and provide"
+        custom_prompt = (f"Transcript:\n{format_transcript(transcript)}\n\n"
+                         f"{get_summary_prompt(summary_length, include_timestamps, base_prompt=base_prompt)}")
+    with model_slot(model_slots):
+        summary = model_with_images.invoke(custom_prompt)
+    
+    model_end_time = time.time()
+    logger.info(f"Model inference: {model_end_time - model_start_time:.2f}s")
+    return summary
+
+def upload_video(file, chunk_size=UPLOAD_CHUNK_BYTES):
+    """
+    Stream an uploaded video to its own file in the videos directory.
+
+    The upload is copied in chunk_size pieces and hashed on the way, so memory
+    use stays flat whatever the video size. The file is written under a
+    temporary name and renamed when complete. Returns the file path and the
+    SHA-256 of the contents.
+    """
     logger.info(f"Starting video upload for file: {file.name}")
     start_time = time.time()
     
     # Ensure videos directory exists
     os.makedirs(videos_directory, exist_ok=True)
     
-    file_path = videos_directory + file.name
+    file_path = videos_directory + new_job_id(file.name) + os.path.splitext(file.name)[1]
+    temp_path = file_path + ".part"
+    sha256 = hashlib.sha256()
     try:
-        with open(file_path, "wb") as f:
-            f.write(file.getbuffer())
+        file.seek(0)
+        with open(temp_path, "wb") as f:
+            for chunk in iter(partial(file.read, chunk_size), b""):
+                sha256.update(chunk)
+                f.write(chunk)
+        os.replace(temp_path, file_path)
         
         end_time = time.time()
         duration = end_time - start_time
         logger.info(f"Video upload completed successfully. Duration: {duration:.2f} seconds")
         st.success(f"Video uploaded: {file.name}")
-        return file_path
+        return file_path, sha256.hexdigest()
     except Exception as e:
         logger.error(f"Failed to upload video {file.name}: {str(e)}")
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
         raise
 
-def extract_frames(video_path, interval_seconds=5):
-    """Extract frames from video at specified intervals."""
-    logger.info(f"Starting frame extraction from video: {video_path}")
+def remove_upload(file_path):
+    """Delete a job's uploaded video once its frames are extracted."""
+    try:
+        os.remove(file_path)
+    except OSError as e:
+        logger.warning(f"Could not remove uploaded video {file_path}: {str(e)}")
+
+def deduplicate_frames(frames, max_distance):
+    """
+    Drop frames that are near-duplicates of the previous kept frame.
+
+    Returns the kept frames and the number removed. Each frame gets a
+    "dhash" entry with its perceptual hash.
+    """
+    kept, removed = drop_near_duplicates(frames, max_distance)
+    logger.info(f"Removed {removed} near-duplicate frames of {len(frames)} (threshold {max_distance} bits)")
+    return kept, removed
+
+def display_deduplication(frames_kept, frames_removed):
+    """Show how many frames deduplication removed and the model time that saves."""
+    seconds_per_frame = st.session_state.get("seconds_per_frame", DEFAULT_SECONDS_PER_FRAME)
+    col1, col2 = st.columns(2)
+    with col1:
+        st.metric("Duplicate Frames Removed", frames_removed, help=f"{frames_kept} frames left for analysis")
+    with col2:
+        st.metric(
+            "Est. Inference Time Saved", f"{frames_removed * seconds_per_frame:.1f}s",
+            help=f"At {seconds_per_frame:.1f}s of model time per frame, as last measured in this session"
+        )
+
+def frame_limit(has_transcript=False):
+    """Frames to extract: fewer when a transcript carries most of the content."""
+    return min(max_frames, transcript_max_frames) if has_transcript else max_frames
+
+@st.cache_resource
+def get_speech_model(size, workers):
+    """Speech model loaded once per process and shared by all sessions."""
+    logger.info(f"Loading speech model {size} for {workers} parallel chunks")
+    return load_speech_model(size, workers)
+
+def transcribe_video(video_path):
+    """
+    Transcribe the audio track of a video (see video_audio). Returns the
+    transcript segments, [] if the video has no audio track, or None if
+    transcription failed.
+    """
+    logger.info(f"Starting audio transcription of {video_path}")
     start_time = time.time()
+    try:
+        samples = extract_audio(video_path)
+        if samples is None or not len(samples):
+            logger.info("Video has no audio track")
+            st.info("No audio track found; summarizing frames only")
+            return []
+        decode_duration = time.time() - start_time
+        speech_model = get_speech_model(speech_model_size, transcription_workers)
+        progress_bar = st.progress(0)
+        segments = transcribe_audio(
+            samples, speech_model, workers=transcription_workers,
+            progress=lambda done, total: progress_bar.progress(done / total)
+        )
+        duration = time.time() - start_time
+        audio_seconds = len(samples) / SAMPLE_RATE
+        logger.info(f"Transcribed {audio_seconds:.0f}s of audio into {len(segments)} segments in {duration:.2f}s "
+                    f"(decoding {decode_duration:.2f}s, {audio_seconds / duration:.1f}x real time)")
+        return segments
+    except Exception as e:
+        logger.error(f"Audio transcription failed: {str(e)}")
+        st.warning(f"Could not transcribe the audio track: {str(e)}")
+        return None
+
+def frame_settings(has_transcript=False):
+    """Settings that determine which frames are extracted and how they are encoded."""
+    return {
+        "interval_seconds": interval_seconds,
+        "max_frames": frame_limit(has_transcript),
+        "sampling": sampling_modes[sampling_mode],
+        "scene_threshold": scene_threshold if sampling_modes[sampling_mode] == "scene" else None,
+        "encode_options": encode_options,
+        "duplicate_threshold": duplicate_threshold if remove_duplicates else None,
+    }
+
+def summary_options(has_transcript=False):
+    """Options that determine the final summary of a set of frames."""
+    return {
+        "summary_length": summary_length,
+        "include_timestamps": include_timestamps,
+        "summarization_mode": summarization_mode,
+        "window_size": window_size,
+        "speech_model": speech_model_size if has_transcript else None,
+    }
+
+def new_job_id(video_name):
+    """Unique id of one summarization job, used to name its frames folder."""
+    stem = os.path.splitext(os.path.basename(video_name))[0]
+    return f"{datetime.now().strftime('%Y%m%d_%H%M%S')}_{stem}_{uuid.uuid4().hex[:8]}"
+
+def save_frames(frames, directory):
+    """Write a job's frames to directory as frame_NNN.jpg files."""
+    os.makedirs(directory, exist_ok=True)
+    for frame_number, frame in enumerate(frames, start=1):
+        with open(os.path.join(directory, f"frame_{frame_number:03d}.jpg"), "wb") as f:
+            f.write(frame["jpeg"])
+    logger.info(f"Saved {len(frames)} frames to {directory}")
+
+def extract_frames(video_path, interval_seconds=5, sampling="interval", decode_mode="auto", frame_limit=None):
+    """
+    Extract frames from video as a list of {"index", "timestamp", "jpeg"}
+    dicts in timestamp order. Frames are downscaled and JPEG-encoded once,
+    in memory, ready to be passed to the model; nothing is written to disk,
+    so concurrent jobs cannot interfere with each other.
     
-    # Clear existing frames
-    if os.path.exists(frames_directory):
-        frame_files = os.listdir(frames_directory)
-        for file in frame_files:
-            os.remove(frames_directory + file)
-        logger.info(f"Cleared {len(frame_files)} existing frames")
-    else:
-        os.makedirs(frames_directory, exist_ok=True)
+    With sampling="interval" a frame is taken every interval_seconds, using
+    random seeks or a sequential scan depending on decode_mode (see
+    video_frames.read_targets). With sampling="scene" the video is decoded
+    once and a keyframe is taken at each scene change (see
+    video_frames.scene_keyframes). Either way at most frame_limit frames
+    (default max_frames) are extracted.
+
+    Videos of at least PARALLEL_MIN_SECONDS are split into extraction_workers
+    segments, each decoded by its own capture in a separate process.
+    """
+    logger.info(f"Starting frame extraction from video: {video_path}")
+    start_time = time.time()
+    frame_limit = frame_limit or max_frames
 
     video = cv2.VideoCapture(video_path)
     
     if not video.isOpened():
         logger.error(f"Could not open video file: {video_path}")
         st.error(f"Error: Could not open video file {video_path}")
-        return
+        return []
 
     fps = video.get(cv2.CAP_PROP_FPS)
     frames_count = int(video.get(cv2.CAP_PROP_FRAME_COUNT))
@@ -199,7 +569,7 @@ def extract_frames(video_path, interval_seconds=5):
         logger.error("Could not determine video FPS")
         st.error("Error: Could not determine video FPS")
         video.release()
-        return
+        return []
         
     fps = int(fps)
     video_duration = frames_count / fps
@@ -210,38 +580,65 @@ def extract_frames(video_path, interval_seconds=5):
     progress_bar = st.progress(0)
     status_text = st.empty()
     
-    current_frame = 0
-    frame_number = 1
-    frames_extracted = 0
-    max_possible_frames = min(frames_count // (fps * interval_seconds), max_frames)
-
-    while current_frame < frames_count and frames_extracted < max_frames:
-        # Update progress
-        progress = min(current_frame / frames_count, 1.0)
-        progress_bar.progress(progress)
-        status_text.text(f"Extracting frames... {frames_extracted}/{max_possible_frames}")
-        
-        video.set(cv2.CAP_PROP_POS_FRAMES, current_frame)
-        success, frame = video.read()
-
-        if not success:
-            logger.warning(f"Failed to read frame at position {current_frame}")
-            current_frame += fps * interval_seconds
-            continue
-
-        if frame is not None and frame.size > 0:
-            frame_path = frames_directory + f"frame_{frame_number:03d}.jpg"
-            cv2.imwrite(frame_path, frame)
-            frames_extracted += 1
-            logger.debug(f"Extracted frame {frame_number} at time {current_frame/fps:.2f}s")
-
-        current_frame += fps * interval_seconds
-        frame_number += 1
-        
-        # Safety break to avoid infinite loops
-        if frame_number > 100:  # Max 100 frames
-            logger.warning("Reached maximum frame limit (100), stopping extraction")
-            break
+    extracted = []
+    parallel = extraction_workers > 1 and video_duration >= PARALLEL_MIN_SECONDS
+
+    if sampling == "scene":
+        status_text.text("Detecting scene changes...")
+        if parallel:
+            video.release()
+            keyframes = scene_keyframes_parallel(
+                video_path, fps, frames_count, frame_limit, scene_threshold, extraction_workers,
+                progress=lambda done, total: progress_bar.progress(done / total),
+                encode_options=encode_options
+            )
+        else:
+            keyframes = scene_keyframes(
+                video, fps, frames_count, frame_limit,
+                threshold=scene_threshold,
+                progress=lambda done: progress_bar.progress(min(done / frames_count, 1.0))
+            )
+        for frame_index, frame in keyframes:
+            jpeg = frame if isinstance(frame, bytes) else encode_jpeg(frame, **encode_options)
+            if jpeg is not None:
+                extracted.append({"index": frame_index, "timestamp": frame_index / fps, "jpeg": jpeg})
+                logger.debug(f"Extracted keyframe {len(extracted)} at time {frame_index/fps:.2f}s")
+        logger.info(f"Scene detection kept {len(extracted)} keyframes (threshold {scene_threshold})")
+    else:
+        step = fps * interval_seconds
+        targets = plan_targets(frames_count, step, frame_limit)
+
+        if decode_mode == "auto":
+            decode_mode = choose_decode_mode(video, frames_count, step)
+            logger.info(f"Auto-selected {decode_mode} decoding for a {step}-frame step")
+
+        if parallel:
+            video.release()
+            status_text.text(f"Extracting {len(targets)} frames in {extraction_workers} processes...")
+            frames = extract_targets_parallel(
+                video_path, targets, decode_mode, extraction_workers,
+                progress=lambda done, total: progress_bar.progress(done / total),
+                encode_options=encode_options
+            )
+        else:
+            frames = read_targets(video, targets, decode_mode)
+
+        for current_frame, frame in frames:
+            # Update progress
+            progress = min(current_frame / frames_count, 1.0)
+            progress_bar.progress(progress)
+            status_text.text(f"Extracting frames... {len(extracted)}/{len(targets)}")
+
+            jpeg = frame if frame is None or isinstance(frame, bytes) else encode_jpeg(frame, **encode_options)
+            if jpeg is None:
+                logger.warning(f"Failed to read frame at position {current_frame}")
+                continue
+
+            extracted.append({"index": current_frame, "timestamp": current_frame / fps, "jpeg": jpeg})
+            logger.debug(f"Extracted frame {len(extracted)} at time {current_frame/fps:.2f}s")
+
+        if len(extracted) < len(targets):
+            logger.warning(f"Extracted {len(extracted)} of {len(targets)} planned frames")
 
     video.release()
     progress_bar.progress(1.0)
@@ -249,50 +646,44 @@ def extract_frames(video_path, interval_seconds=5):
     
     end_time = time.time()
     duration = end_time - start_time
-    logger.info(f"Frame extraction completed. Extracted {frames_extracted} frames in {duration:.2f} seconds")
-    st.success(f"Extracted {frames_extracted} frames from video")
+    logger.info(f"Frame extraction completed. Extracted {len(extracted)} frames in {duration:.2f} seconds")
+    if extracted:
+        payload_bytes = sum(len(frame["jpeg"]) for frame in extracted)
+        logger.info(f"Frame payload: {payload_bytes / len(extracted) / 1024:.1f} KB per frame "
+                    f"({encode_options['max_edge']}px max edge, quality {encode_options['quality']}, "
+                    f"crop {encode_options['crop']})")
+    st.success(f"Extracted {len(extracted)} frames from video")
+    return extracted
 
-def describe_video():
-    """Analyze extracted frames and generate video summary."""
+def describe_video(frames, cache=None, transcript=None):
+    """
+    Analyze extracted frames (see extract_frames) and generate video summary.
+    cache, if given, is used for window summaries, and transcript segments
+    (see transcribe_video) are summarized along with the frames.
+    """
     logger.info("Starting video content analysis")
     start_time = time.time()
     
-    if not os.path.exists(frames_directory):
-        logger.error("Frames directory not found")
-        st.error("No frames directory found")
-        return "Error: No frames extracted"
-        
-    frame_files = [f for f in os.listdir(frames_directory) if f.endswith('.jpg')]
-    
-    if not frame_files:
-        logger.error("No frame files found for analysis")
+    if not frames:
+        logger.error("No frames available for analysis")
         st.error("No frames found for analysis")
         return "Error: No frames to analyze"
     
-    images = []
-    for file in sorted(frame_files):  # Sort to ensure consistent ordering
-        images.append(os.path.join(frames_directory, file))
-
-    logger.info(f"Found {len(images)} frames for analysis")
-    st.info(f"Analyzing {len(images)} frames...")
+    # The Ollama client base64-encodes the JPEG bytes directly; no temporary files
+    payload_kb = sum(len(frame["jpeg"]) for frame in frames) / 1024
+    logger.info(f"Found {len(frames)} frames for analysis ({payload_kb:.0f} KB)")
+    st.info(f"Analyzing {len(frames)} frames...")
     
     try:
-        model_with_images = model.bind(images=images)
-        logger.info("Invoking AI model for video summarization")
-        model_start_time = time.time()
-        
-        # Use custom prompt based on user preferences
-        custom_prompt = get_summary_prompt(summary_length, include_timestamps)
-        summary = model_with_images.invoke(custom_prompt)
-        
-        model_end_time = time.time()
-        model_duration = model_end_time - model_start_time
+        summary = generate_summary(frames, cache, transcript)
         
         end_time = time.time()
         total_duration = end_time - start_time
         
-        logger.info(f"Video analysis completed successfully. Model inference: {model_duration:.2f}s, Total: {total_duration:.2f}s")
+        logger.info(f"Video analysis completed successfully. Total: {total_duration:.2f}s")
         logger.info(f"Generated summary length: {len(summary)} characters")
+        # Used to estimate the time saved by removing duplicate frames
+        st.session_state["seconds_per_frame"] = total_duration / len(frames)
         
         return summary
     except Exception as e:
@@ -302,6 +693,30 @@ def describe_video():
         st.error(f"Error during video analysis: {str(e)}")
         return f"Error: Could not analyze video - {str(e)}"
 
+def summarize_upload(frames, video_name, start_time, cached_summary=None, summary_key=None,
+                     transcript=None, cache=None, store_summary=False):
+    """
+    Summary of an uploaded video's frames, and the seconds since start_time.
+
+    A cached summary (see SummaryCache.get_summary) is returned as is.
+    Otherwise describe_video makes a new one with cache for its windows; it
+    is stored under summary_key if store_summary, and recorded in the
+    processing history. Served summaries are not recorded, so reruns (button
+    clicks, option changes, the same upload again) add no history rows.
+    """
+    if cached_summary is not None:
+        logger.info(f"Using cached summary for {video_name}")
+        st.info("Loaded the cached summary for this video and settings. Use 🔄 Regenerate for a new one.")
+        return cached_summary["summary"], time.time() - start_time
+    
+    summary = describe_video(frames, cache, transcript)
+    processing_time = time.time() - start_time
+    if summary and not summary.startswith("Error:"):
+        if store_summary:
+            summary_cache.put_summary(summary_key, summary, video_name=video_name)
+        save_processing_history(video_name, summary, processing_time, selected_model)
+    return summary, processing_time
+
 # Main Application UI
 st.title("📹 Video Summarization App")
 
@@ -337,10 +752,66 @@ with tab1:
             logger.info(f"Processing uploaded file: {uploaded_file.name} ({uploaded_file.size} bytes)")
             overall_start_time = time.time()
             
+            # Regenerate asks for a new summary of the same frames
+            regenerate = st.session_state.pop("regenerate", False)
+            
+            # The upload's hash is kept for the session, so reruns served from
+            # the cache do not write the video to disk again
+            sha_key = f"video_sha256_{uploaded_file.file_id}"
+            file_path = None
+            
             try:
-                file_path = upload_video(uploaded_file)
-                extract_frames(file_path, interval_seconds)
-                summary = describe_video()
+                if sha_key not in st.session_state:
+                    file_path, st.session_state[sha_key] = upload_video(uploaded_file)
+                
+                # The transcript decides the frame budget, so it comes first. Only
+                # a non-empty transcript reduces it: videos without audio, or whose
+                # transcription failed, get the full max_frames.
+                transcript = None
+                if use_transcript:
+                    transcript_key = SummaryCache.transcript_key(st.session_state[sha_key], {"model": speech_model_size})
+                    # Failures are retried on Regenerate or in a new session, not on every rerun
+                    failed_key = f"transcript_failed_{transcript_key}"
+                    transcript = summary_cache.get_transcript(transcript_key) if use_cache else None
+                    if transcript is None and (regenerate or not st.session_state.get(failed_key)):
+                        if file_path is None:
+                            file_path, st.session_state[sha_key] = upload_video(uploaded_file)
+                        transcript = transcribe_video(file_path)
+                        st.session_state[failed_key] = transcript is None
+                        if use_cache and transcript is not None:
+                            summary_cache.put_transcript(transcript_key, transcript)
+                    if transcript:
+                        with st.expander(f"🎙️ Transcript ({len(transcript)} segments)"):
+                            st.text(format_transcript(transcript, max_chars=math.inf))
+                has_transcript = bool(transcript)
+                
+                frames_key = SummaryCache.frames_key(st.session_state[sha_key], frame_settings(has_transcript))
+                summary_key = SummaryCache.summary_key(frames_key, selected_model, summary_options(has_transcript))
+                cached_summary = summary_cache.get_summary(summary_key) if use_cache and not regenerate else None
+                frames = summary_cache.get_frames(frames_key) if use_cache else None
+                
+                if frames is not None:
+                    logger.info(f"Using {len(frames)} cached frames for {uploaded_file.name}")
+                else:
+                    if file_path is None:
+                        file_path, st.session_state[sha_key] = upload_video(uploaded_file)
+                    frames = extract_frames(file_path, interval_seconds, sampling_modes[sampling_mode], decode_mode,
+                                            frame_limit(has_transcript))
+                    if remove_duplicates and frames:
+                        frames, frames_removed = deduplicate_frames(frames, duplicate_threshold)
+                        display_deduplication(len(frames), frames_removed)
+                    if use_cache and frames:
+                        summary_cache.put_frames(frames_key, frames)
+                    if save_frames_to_disk and frames:
+                        save_frames(frames, frames_directory + new_job_id(uploaded_file.name))
+                
+                # Without a transcript the keys carry no speech model, so a
+                # frames-only summary is cached as one
+                summary, processing_time = summarize_upload(
+                    frames, uploaded_file.name, overall_start_time, cached_summary, summary_key, transcript,
+                    cache=summary_cache if use_cache and not regenerate else None,
+                    store_summary=use_cache,
+                )
                 
                 if summary and not summary.startswith("Error:"):
                     logger.info("Video processing completed successfully")
@@ -349,12 +820,18 @@ with tab1:
                     st.markdown("## 📹 Video Summary")
                     
                     # Add summary statistics
-                    col1, col2 = st.columns(2)
-                    processing_time = time.time() - overall_start_time
+                    col1, col2, col3 = st.columns(3)
+                    payload_bytes = sum(len(frame["jpeg"]) for frame in frames)
                     with col1:
                         st.metric("Summary Length", f"{len(summary.split())} words")
                     with col2:
-                        st.metric("Processing Time", f"{processing_time:.1f}s")
+                        st.metric("End-to-End Latency", f"{processing_time:.1f}s",
+                                  help="From upload to finished summary")
+                    with col3:
+                        st.metric("Payload per Frame", f"{payload_bytes / len(frames) / 1024:.0f} KB",
+                                  help=f"{len(frames)} frames, {payload_bytes / 1024:.0f} KB of JPEG sent to the model")
+                    logger.info(f"End-to-end latency {processing_time:.2f}s, payload {payload_bytes / 1024:.0f} KB "
+                                f"({payload_bytes / len(frames) / 1024:.1f} KB per frame)")
                     
                     # Enhanced summary display
                     st.markdown("### Content Analysis")
@@ -379,13 +856,11 @@ with tab1:
                     
                     with col3:
                         if st.button("🔄 Regenerate"):
+                            st.session_state["regenerate"] = True
                             st.rerun()
                     
-                    # Save processing history
-                    save_processing_history(uploaded_file.name, summary, processing_time, selected_model)
-                    
                     # Display extracted frames
-                    display_extracted_frames()
+                    display_extracted_frames(frames)
                 else:
                     logger.error("Failed to generate video summary")
                     st.error("Failed to generate video summary")
@@ -395,6 +870,8 @@ with tab1:
                 st.error(f"An error occurred: {str(e)}")
                 st.info("Please try with a different video file")
             finally:
+                if file_path:
+                    remove_upload(file_path)
                 overall_end_time = time.time()
                 total_duration = overall_end_time - overall_start_time
                 logger.info(f"Total processing time: {total_duration:.2f} seconds")
@@ -411,89 +888,139 @@ with tab1:
         )
         
         if uploaded_files and st.button("Process All Videos"):
-            results = []
-            progress_bar = st.progress(0)
-            status_text = st.empty()
-            
-            for i, file in enumerate(uploaded_files):
-                status_text.text(f"Processing {file.name}... ({i+1}/{len(uploaded_files)})")
-                
+            jobs = []
+            for file in uploaded_files:
+                job = {"filename": file.name, "status": "queued"}
                 try:
-                    file_path = upload_video(file)
-                    extract_frames(file_path, interval_seconds)
-                    summary = describe_video()
-                    
-                    if summary and not summary.startswith("Error:"):
-                        results.append({
-                            'filename': file.name,
-                            'summary': summary,
-                            'status': 'Success'
-                        })
-                        # Save to history
-                        save_processing_history(file.name, summary, 0, selected_model)
-                    else:
-                        results.append({
-                            'filename': file.name,
-                            'summary': summary,
-                            'status': 'Failed'
-                        })
+                    job["path"], _ = upload_video(file)
                 except Exception as e:
-                    results.append({
-                        'filename': file.name,
-                        'summary': f"Error: {str(e)}",
-                        'status': 'Error'
-                    })
-                
-                progress_bar.progress((i + 1) / len(uploaded_files))
+                    job.update(status="failed", error=f"Upload failed: {str(e)}")
+                jobs.append(job)
+            
+            progress_bar = st.progress(0)
+            status_table = st.empty()
+            
+            def show_batch_status(job=None):
+                """Refresh the per-video status table and progress."""
+                if job is not None and job["status"] == "waiting for model" and save_frames_to_disk:
+                    save_frames(job["frames"], frames_directory + new_job_id(job["filename"]))
+                status_table.dataframe([
+                    {
+                        "Video": j["filename"],
+                        "Status": j["status"],
+                        "Frames": j.get("frames_count"),
+                        "Duplicates Removed": j.get("duplicates_removed"),
+                        "Extraction (s)": round(j["extract_seconds"], 1) if "extract_seconds" in j else None,
+                        "Summary (s)": round(j["summarize_seconds"], 1) if "summarize_seconds" in j else None,
+                    }
+                    for j in jobs
+                ], use_container_width=True)
+                finished = sum(1 for j in jobs if j["status"] in ("done", "failed"))
+                progress_bar.progress(finished / len(jobs))
             
-            status_text.text("Batch processing completed!")
+            extract = partial(
+                extract_video,
+                interval_seconds=interval_seconds,
+                max_frames=max_frames,
+                sampling=sampling_modes[sampling_mode],
+                decode_mode=decode_mode,
+                scene_threshold=scene_threshold,
+                encode_options=encode_options,
+                max_duplicate_distance=duplicate_threshold if remove_duplicates else None,
+            )
+            # One set of slots for every model call of the batch, so jobs
+            # running map-reduce at the same time cannot multiply the requests
+            model_slots = threading.BoundedSemaphore(model_concurrency)
+            summarize = partial(generate_summary, cache=summary_cache if use_cache else None,
+                                model_slots=model_slots)
+            logger.info(f"Starting batch of {len(jobs)} videos: {extraction_workers} extraction processes, "
+                        f"{model_concurrency} parallel model calls")
+            batch = run_batch(
+                [job for job in jobs if job["status"] == "queued"],
+                extract, summarize,
+                extraction_workers=extraction_workers,
+                inference_concurrency=model_concurrency,
+                on_update=show_batch_status,
+            )
+            show_batch_status()
+            for job in jobs:
+                if "path" in job:
+                    remove_upload(job["path"])
+            
+            for job in jobs:
+                if job["status"] == "done":
+                    processing_time = job["extract_seconds"] + job["summarize_seconds"]
+                    save_processing_history(job["filename"], job["summary"], processing_time, selected_model)
+                    logger.info(f"Batch job {job['filename']}: extraction {job['extract_seconds']:.2f}s, "
+                                f"summary {job['summarize_seconds']:.2f}s, finished after {job['finished_after']:.2f}s")
+                else:
+                    logger.error(f"Batch job {job['filename']} failed: {job.get('error')}")
+            logger.info(f"Batch completed in {batch['wall_seconds']:.2f}s: {batch['done']} done, "
+                        f"{batch['failed']} failed, {batch['videos_per_hour']:.1f} videos/hour")
             
             # Display batch results
             st.markdown("## Batch Processing Results")
-            for result in results:
-                status_emoji = "✅" if result['status'] == 'Success' else "❌"
-                with st.expander(f"{status_emoji} {result['filename']}"):
-                    st.write(f"**Status:** {result['status']}")
-                    st.write(f"**Summary:** {result['summary']}")
+            col1, col2, col3 = st.columns(3)
+            with col1:
+                st.metric("Videos Summarized", f"{batch['done']}/{len(jobs)}")
+            with col2:
+                st.metric("Batch Time", f"{batch['wall_seconds']:.1f}s")
+            with col3:
+                st.metric("Throughput", f"{batch['videos_per_hour']:.1f} videos/hour")
+            
+            for job in jobs:
+                status_emoji = "✅" if job["status"] == "done" else "❌"
+                with st.expander(f"{status_emoji} {job['filename']}"):
+                    st.write(f"**Status:** {job['status']}")
+                    if job["status"] == "done":
+                        st.write(f"**Extraction:** {job['extract_seconds']:.1f}s · "
+                                 f"**Summary:** {job['summarize_seconds']:.1f}s")
+                        st.write(f"**Summary:** {job['summary']}")
+                    else:
+                        st.write(f"**Error:** {job.get('error')}")
 
 with tab2:
     st.markdown("## 📊 Processing Analytics")
     
-    if os.path.exists("processing_history.json"):
-        with open("processing_history.json", 'r') as f:
-            history = json.load(f)
+    totals = history_store.totals()
+    
+    if totals["count"]:
+        col1, col2 = st.columns(2)
         
-        if history:
-            # Create analytics
-            processing_times = [entry['processing_time'] for entry in history]
-            dates = [entry['timestamp'][:10] for entry in history]
-            models_used = [entry.get('model_used', 'Unknown') for entry in history]
-            
-            col1, col2 = st.columns(2)
-            
-            with col1:
-                st.metric("Total Videos Processed", len(history))
-                st.metric("Average Processing Time", f"{sum(processing_times)/len(processing_times):.1f}s")
-            
-            with col2:
-                st.metric("Fastest Processing", f"{min(processing_times):.1f}s")
-                st.metric("Slowest Processing", f"{max(processing_times):.1f}s")
-            
-            # Display recent processing history
-            st.subheader("Recent Processing History")
-            for entry in reversed(history[-10:]):  # Show last 10
-                with st.expander(f"{entry['video_name']} - {entry['timestamp'][:10]}"):
-                    col1, col2 = st.columns(2)
-                    with col1:
-                        st.write(f"**Processing Time:** {entry['processing_time']:.1f}s")
-                        st.write(f"**Model Used:** {entry.get('model_used', 'N/A')}")
-                    with col2:
-                        st.write(f"**Date:** {entry['timestamp']}")
-                    st.write(f"**Summary:** {entry['summary']}")
-        else:
-            st.info("No processing history available yet.")
+        with col1:
+            st.metric("Total Videos Processed", totals["count"])
+            st.metric("Average Processing Time", f"{totals['avg_time']:.1f}s")
+        
+        with col2:
+            st.metric("Fastest Processing", f"{totals['min_time']:.1f}s")
+            st.metric("Slowest Processing", f"{totals['max_time']:.1f}s")
+        
+        # Processing time per model
+        st.subheader("Processing Time by Model")
+        st.dataframe([
+            {
+                "Model": stats["model_used"],
+                "Videos": stats["count"],
+                "Min (s)": round(stats["min_time"], 1),
+                "Avg (s)": round(stats["avg_time"], 1),
+                "Max (s)": round(stats["max_time"], 1),
+            }
+            for stats in history_store.model_stats()
+        ], hide_index=True, use_container_width=True)
+        
+        # Display recent processing history
+        st.subheader("Recent Processing History")
+        for entry in history_store.recent(10):  # Show last 10
+            with st.expander(f"{entry['video_name']} - {entry['timestamp'][:10]}"):
+                col1, col2 = st.columns(2)
+                with col1:
+                    st.write(f"**Processing Time:** {entry['processing_time']:.1f}s")
+                    st.write(f"**Model Used:** {entry['model_used']}")
+                with col2:
+                    st.write(f"**Date:** {entry['timestamp']}")
+                st.write(f"**Summary:** {entry['summary']}")
     else:
-        st.info("No processing history file found.")
+        st.info("No processing history available yet.")
 
 with tab3:
     st.markdown("## 🔄 Batch Processing")